@@ -0,0 +1,513 @@
+"""
+Record / replay benchmark for the agent graph.
+
+A live run of ``agent_graph`` hits Oracle (Aries), Elasticsearch (Lamas),
+the network share, Chroma and the LLM endpoint, so timings change with every
+backend hiccup and routing or parallelism changes can't be compared offline.
+
+  record  runs each query live once and saves every data-source call
+          (src/agents/tools.py fetchers, Lamas, the VID share lookup) and
+          every LLM / embedding HTTP exchange (via
+          http_pool.set_transport_wrapper) with its duration to
+          <fixtures>/<query>.pkl
+  replay  runs the graph against those fixtures: calls are answered from
+          the recording after an injected delay — the recorded duration
+          times --latency-scale, or a fixed --llm-latency / --tool-latency
+
+Calls are matched by a hash of their arguments / request body; when a prompt
+changed (e.g. after a prompt edit) the next unused recording of the same
+source is used instead, and the report counts those fallbacks.
+
+For every run it reports, from LangGraph debug events:
+
+  per-node wall time and the share of it spent waiting on recorded I/O
+  critical path       the longest task of each superstep, summed — the
+                      wall time with zero framework overhead
+  parallelism         total node time / critical path
+  headroom            how much of the critical path would disappear if every
+                      node issued its I/O calls concurrently (upper bound)
+
+Fixtures are pickles of this process's own recordings — only replay files
+you recorded. Usage (from the repo root):
+    python -m benchmarks.graph_replay record --query "Why is lot 4V56656R failing at op 6262?"
+    python -m benchmarks.graph_replay replay --repeats 5 --latency-scale 0.5 --json replay.json
+"""
+import argparse
+import asyncio
+import copy
+import functools
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+
+from benchmarks.model_tiering import DEFAULT_QUERIES, _percentile, _state
+from src.agents import agent_graph
+from src.llm.http_pool import set_transport_wrapper
+from src.llm.response_cache import bypass_cache
+from src.llm.usage import track_usage
+
+DEFAULT_FIXTURES = os.path.join("benchmarks", "fixtures")
+
+# (module, function) of every blocking data source the nodes call
+_DATA_SOURCES = (
+    ("src.agents.tools", "retrieve_from_knowledge_base"),
+    ("src.agents.tools", "retrieve_lot_unit_info"),
+    ("src.agents.tools", "list_recent_lots"),
+    ("src.agents.tools", "query_unit_test_aries"),
+    ("src.agents.tools", "run_defect_traceback"),
+    ("src.agents.tools", "align_and_preprocess_images"),
+    ("src.agents.nodes.aries_data_agent", "_query_lamas"),
+    ("src.agents.nodes.stains_detective_agent", "find_uploads_dir"),
+)
+
+# Response headers that describe the original wire encoding, not the stored body
+_WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def _digest(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _args_key(name: str, args: tuple, kwargs: dict) -> str:
+    return _digest(name, json.dumps([args, kwargs], sort_keys=True, default=str))
+
+
+def _current_node() -> str:
+    """Graph node running the current call (LangGraph's config context var), '-' outside one."""
+    try:
+        from langgraph.config import get_config
+        return get_config().get("metadata", {}).get("langgraph_node", "-")
+    except Exception:
+        return "-"
+
+
+class _Latency:
+    def __init__(self, scale: float, llm_s: Optional[float], tool_s: Optional[float]):
+        self.scale = scale
+        self.llm_s = llm_s
+        self.tool_s = tool_s
+
+    def delay(self, call: dict) -> float:
+        fixed = self.llm_s if call["kind"] == "llm" else self.tool_s
+        return fixed if fixed is not None else call["duration_s"] * self.scale
+
+
+class _Tape:
+    """The calls of one run: appended while recording, consumed while replaying."""
+
+    def __init__(self, calls: Optional[list] = None, library: Optional[dict] = None,
+                 latency: Optional[_Latency] = None):
+        self.calls = calls if calls is not None else []
+        self.library = library or {}
+        self.latency = latency
+        self.spans: list[dict] = []
+        self.matches = {"exact": 0, "shared": 0, "fallback": 0, "missing": 0}
+        self.t0 = time.perf_counter()
+        self._used: set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def replaying(self) -> bool:
+        return self.latency is not None
+
+    def record(self, call: dict) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def span(self, kind: str, name: str, node: str, started: float) -> None:
+        with self._lock:
+            self.spans.append({"kind": kind, "name": name, "node": node,
+                               "start": started - self.t0, "end": time.perf_counter() - self.t0})
+
+    def take(self, kind: str, name: str, key: str) -> dict:
+        """The recorded call for (*kind*, *name*, *key*): exact match first, then any
+        fixture's exact match, then the next unused call of the same source."""
+        with self._lock:
+            fallback = None
+            for i, call in enumerate(self.calls):
+                if i in self._used or call["kind"] != kind or call["name"] != name:
+                    continue
+                if call["key"] == key:
+                    self._used.add(i)
+                    self.matches["exact"] += 1
+                    return call
+                if fallback is None:
+                    fallback = i
+            if key in self.library:
+                self.matches["shared"] += 1
+                return self.library[key]
+            if fallback is not None:
+                self._used.add(fallback)
+                self.matches["fallback"] += 1
+                return self.calls[fallback]
+            self.matches["missing"] += 1
+        raise LookupError(f"No recorded {kind} call left for {name}")
+
+
+_tape: Optional[_Tape] = None
+
+
+# ---------------------------------------------------------------------------
+# Data sources
+# ---------------------------------------------------------------------------
+
+def _source_wrapper(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        tape, node, started = _tape, _current_node(), time.perf_counter()
+        key = _args_key(name, args, kwargs)
+        try:
+            if tape.replaying:
+                call = tape.take("tool", name, key)
+                time.sleep(tape.latency.delay(call))
+                if call["error"]:
+                    raise RuntimeError(call["error"])
+                return copy.deepcopy(call["result"])
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                tape.record({"kind": "tool", "name": name, "key": key, "result": None,
+                             "error": f"{type(e).__name__}: {e}", "duration_s": time.perf_counter() - started})
+                raise
+            tape.record({"kind": "tool", "name": name, "key": key, "result": copy.deepcopy(result),
+                         "error": None, "duration_s": time.perf_counter() - started})
+            return result
+        finally:
+            tape.span("tool", name, node, started)
+
+    return wrapper
+
+
+@contextmanager
+def _patched_sources():
+    """Swap every data source for its recording / replaying wrapper, wherever it was imported."""
+    import importlib
+
+    swaps = []
+    for module_name, name in _DATA_SOURCES:
+        original = getattr(importlib.import_module(module_name), name)
+        wrapper = _source_wrapper(name, original)
+        for module in list(sys.modules.values()):
+            if not getattr(module, "__name__", "").startswith("src."):
+                continue
+            for attr, value in list(vars(module).items()):
+                if value is original:
+                    setattr(module, attr, wrapper)
+                    swaps.append((module, attr, original))
+    try:
+        yield
+    finally:
+        for module, attr, original in swaps:
+            setattr(module, attr, original)
+
+
+# ---------------------------------------------------------------------------
+# LLM / embedding HTTP traffic
+# ---------------------------------------------------------------------------
+
+def _request_key(request: httpx.Request) -> str:
+    return _digest(request.method, request.url.path, request.content)
+
+
+def _recorded_response(request: httpx.Request, call: dict) -> httpx.Response:
+    return httpx.Response(call["status"], headers=call["headers"], content=call["body"], request=request)
+
+
+def _record_response(request: httpx.Request, response: httpx.Response, body: bytes, started: float) -> dict:
+    call = {
+        "kind": "llm",
+        "name": request.url.path,
+        "key": _request_key(request),
+        "status": response.status_code,
+        "headers": [(k, v) for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS],
+        "body": body,
+        "duration_s": time.perf_counter() - started,
+    }
+    _tape.record(call)
+    return call
+
+
+class _Transport(httpx.BaseTransport):
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        node, started = _current_node(), time.perf_counter()
+        try:
+            if _tape.replaying:
+                call = _tape.take("llm", request.url.path, _request_key(request))
+                time.sleep(_tape.latency.delay(call))
+            else:
+                response = self._inner.handle_request(request)
+                try:
+                    call = _record_response(request, response, response.read(), started)
+                finally:
+                    response.close()
+            return _recorded_response(request, call)
+        finally:
+            _tape.span("llm", request.url.path, node, started)
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class _AsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        node, started = _current_node(), time.perf_counter()
+        try:
+            if _tape.replaying:
+                call = _tape.take("llm", request.url.path, _request_key(request))
+                await asyncio.sleep(_tape.latency.delay(call))
+            else:
+                response = await self._inner.handle_async_request(request)
+                try:
+                    call = _record_response(request, response, await response.aread(), started)
+                finally:
+                    await response.aclose()
+            return _recorded_response(request, call)
+        finally:
+            _tape.span("llm", request.url.path, node, started)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def _wrap_transport(inner, is_async: bool):
+    return _AsyncTransport(inner) if is_async else _Transport(inner)
+
+
+# ---------------------------------------------------------------------------
+# Running and timing the graph
+# ---------------------------------------------------------------------------
+
+async def _run_graph(tape: _Tape, query: str, max_iterations: int) -> dict:
+    """Run *query* on *tape*; returns the final state, the graph tasks and the wall time."""
+    global _tape
+    _tape = tape
+    tasks: dict = {}
+    final: dict = {}
+    with bypass_cache(), track_usage():
+        tape.t0 = time.perf_counter()
+        async for mode, chunk in agent_graph.astream(_state(query, max_iterations), stream_mode=["debug", "values"]):
+            now = time.perf_counter() - tape.t0
+            if mode == "values":
+                final = chunk
+                continue
+            payload = chunk.get("payload") or {}
+            if chunk.get("type") == "task":
+                tasks[payload["id"]] = {"node": payload["name"], "step": chunk["step"], "start": now, "end": None}
+            elif chunk.get("type") == "task_result" and payload.get("id") in tasks:
+                tasks[payload["id"]]["end"] = now
+        wall = time.perf_counter() - tape.t0
+    for task in tasks.values():
+        if task["end"] is None:
+            task["end"] = wall
+    return {"state": final, "tasks": list(tasks.values()), "wall_s": wall}
+
+
+def _union(intervals: list) -> float:
+    total, end = 0.0, float("-inf")
+    for start, stop in sorted(intervals):
+        if stop > end:
+            total += stop - max(start, end)
+            end = stop
+    return total
+
+
+def _analyse(tasks: list, spans: list, wall: float) -> dict:
+    """Per-node times, critical path, parallelism and concurrency headroom of one run."""
+    steps: dict = {}
+    for task in tasks:
+        io = [
+            (max(s["start"], task["start"]), min(s["end"], task["end"]))
+            for s in spans
+            if s["node"] == task["node"] and s["end"] > task["start"] and s["start"] < task["end"]
+        ]
+        task["wall_s"] = task["end"] - task["start"]
+        task["io_s"] = _union(io)
+        task["io_calls"] = len(io)
+        # Lower bound with every I/O call of the node in flight at once
+        task["floor_s"] = task["wall_s"] - task["io_s"] + max((stop - start for start, stop in io), default=0.0)
+        steps.setdefault(task["step"], []).append(task)
+
+    critical, headroom = [], 0.0
+    for step in sorted(steps):
+        longest = max(steps[step], key=lambda t: t["wall_s"])
+        critical.append({"step": step, "node": longest["node"], "s": round(longest["wall_s"], 3)})
+        headroom += max(0.0, longest["wall_s"] - max(t["floor_s"] for t in steps[step]))
+    critical_s = sum(c["s"] for c in critical)
+    work_s = sum(t["wall_s"] for t in tasks)
+    return {
+        "wall_s": round(wall, 3),
+        "critical_path_s": round(critical_s, 3),
+        "critical_path": critical,
+        "work_s": round(work_s, 3),
+        "parallelism": round(work_s / critical_s, 2) if critical_s else None,
+        "overhead_s": round(max(0.0, wall - critical_s), 3),
+        "headroom_s": round(headroom, 3),
+        "nodes": [
+            {key: (round(t[key], 3) if isinstance(t[key], float) else t[key])
+             for key in ("step", "node", "wall_s", "io_s", "io_calls")}
+            for t in sorted(tasks, key=lambda t: (t["step"], t["start"]))
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Modes
+# ---------------------------------------------------------------------------
+
+def _fixture_path(fixtures: str, query: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", query.lower()).strip("_")[:48]
+    return os.path.join(fixtures, f"{slug}_{_digest(query)[:8]}.pkl")
+
+
+async def record(queries: list, fixtures: str, max_iterations: int) -> None:
+    os.makedirs(fixtures, exist_ok=True)
+    for query in queries:
+        tape = _Tape()
+        run = await _run_graph(tape, query, max_iterations)
+        path = _fixture_path(fixtures, query)
+        with open(path, "wb") as f:
+            pickle.dump({
+                "query": query,
+                "max_iterations": max_iterations,
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "answer": run["state"].get("final_answer", ""),
+                "calls": tape.calls,
+            }, f)
+        report = _analyse(run["tasks"], tape.spans, run["wall_s"])
+        n_llm = sum(1 for c in tape.calls if c["kind"] == "llm")
+        print(f"  recorded {len(tape.calls) - n_llm} source + {n_llm} LLM calls, "
+              f"{report['wall_s']:.2f}s live → {path}")
+
+
+def _load_fixtures(fixtures: str) -> list:
+    loaded = []
+    for path in sorted(glob.glob(os.path.join(fixtures, "*.pkl"))):
+        with open(path, "rb") as f:
+            loaded.append(pickle.load(f))
+    return loaded
+
+
+def _summarise(runs: list) -> dict:
+    walls = [r["wall_s"] for r in runs]
+    by_node: dict = {}
+    for r in runs:
+        for n in r["nodes"]:
+            entry = by_node.setdefault(n["node"], {"tasks": 0, "wall_s": 0.0, "io_s": 0.0, "io_calls": 0})
+            entry["tasks"] += 1
+            entry["wall_s"] += n["wall_s"]
+            entry["io_s"] += n["io_s"]
+            entry["io_calls"] += n["io_calls"]
+    for entry in by_node.values():
+        entry["mean_wall_s"] = round(entry["wall_s"] / entry["tasks"], 3)
+        entry["io_share"] = round(entry["io_s"] / entry["wall_s"], 3) if entry["wall_s"] else 0.0
+        entry["wall_s"] = round(entry["wall_s"], 3)
+        entry["io_s"] = round(entry["io_s"], 3)
+    return {
+        "runs": len(runs),
+        "p50_s": round(statistics.median(walls), 3),
+        "p95_s": round(_percentile(walls, 95), 3),
+        "mean_critical_path_s": round(statistics.fmean(r["critical_path_s"] for r in runs), 3),
+        "mean_parallelism": round(statistics.fmean(r["parallelism"] or 1.0 for r in runs), 2),
+        "mean_overhead_s": round(statistics.fmean(r["overhead_s"] for r in runs), 3),
+        "mean_headroom_s": round(statistics.fmean(r["headroom_s"] for r in runs), 3),
+        "critical_path": runs[-1]["critical_path"],
+        "by_node": by_node,
+        "matches": {k: sum(r["matches"][k] for r in runs) for k in runs[-1]["matches"]},
+    }
+
+
+async def replay(fixtures: str, repeats: int, latency: _Latency) -> dict:
+    loaded = _load_fixtures(fixtures)
+    if not loaded:
+        raise SystemExit(f"No fixtures in {fixtures} — run the 'record' mode first.")
+    # One-off calls (e.g. the intent router's prototype embeddings) live in
+    # whichever fixture was recorded first; every replay may reuse them
+    library = {c["key"]: c for fixture in loaded for c in fixture["calls"]}
+    results = {}
+    for fixture in loaded:
+        runs = []
+        for r in range(repeats):
+            tape = _Tape(fixture["calls"], library, latency)
+            run = await _run_graph(tape, fixture["query"], fixture["max_iterations"])
+            report = _analyse(run["tasks"], tape.spans, run["wall_s"])
+            report["matches"] = dict(tape.matches)
+            runs.append(report)
+            print(f"  run {r + 1}/{repeats} {report['wall_s']:6.2f}s  "
+                  f"(critical path {report['critical_path_s']:.2f}s)  {fixture['query'][:60]}")
+        results[fixture["query"]] = _summarise(runs)
+    return results
+
+
+def _print_summary(results: dict) -> None:
+    for query, res in results.items():
+        print(f"\n=== {query[:90]} ===")
+        print(f"wall p50 {res['p50_s']:.2f}s  p95 {res['p95_s']:.2f}s  |  critical path {res['mean_critical_path_s']:.2f}s"
+              f"  overhead {res['mean_overhead_s']:.2f}s  |  parallelism {res['mean_parallelism']:.2f}x"
+              f"  headroom {res['mean_headroom_s']:.2f}s")
+        print("critical path: " + " → ".join(f"{c['node']} ({c['s']:.2f}s)" for c in res["critical_path"]))
+        print(f"{'node':<24} {'tasks':>6} {'mean wall':>10} {'I/O share':>10} {'I/O calls':>10}")
+        for node, entry in sorted(res["by_node"].items(), key=lambda kv: -kv[1]["wall_s"]):
+            print(f"{node:<24} {entry['tasks']:>6} {entry['mean_wall_s']:>9.2f}s {entry['io_share']:>9.0%} "
+                  f"{entry['io_calls']:>10}")
+        m = res["matches"]
+        if m["fallback"] or m["missing"]:
+            print(f"NOTE: {m['fallback']} call(s) replayed by order, {m['missing']} missing — "
+                  f"prompts changed since recording; re-record for exact replays.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Fixture directory")
+    parser.add_argument("--query", action="append", help="record: query to run (repeatable; defaults to a built-in mix)")
+    parser.add_argument("--max-iterations", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3, help="replay: runs per fixture")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="replay: multiply recorded call durations (0 = no injected latency)")
+    parser.add_argument("--llm-latency", type=float, help="replay: fixed seconds per LLM / embedding call")
+    parser.add_argument("--tool-latency", type=float, help="replay: fixed seconds per data-source call")
+    parser.add_argument("--json", help="replay: write full results to this file")
+    args = parser.parse_args()
+
+    set_transport_wrapper(_wrap_transport)
+    with _patched_sources():
+        if args.mode == "record":
+            print(f"Recording into {args.fixtures}")
+            asyncio.run(record(args.query or DEFAULT_QUERIES, args.fixtures, args.max_iterations))
+            return
+        latency = _Latency(args.latency_scale, args.llm_latency, args.tool_latency)
+        fixed = {kind: "recorded" if s is None else f"{s}s" for kind, s in (("llm", args.llm_latency), ("tool", args.tool_latency))}
+        print(f"Replaying {args.fixtures} (latency scale {args.latency_scale}, "
+              f"llm {fixed['llm']}, tool {fixed['tool']})")
+        results = asyncio.run(replay(args.fixtures, args.repeats, latency))
+
+    _print_summary(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nFull results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+End-to-end latency benchmark: per-node model tiering vs a single model.
+
+Runs the same queries through the agent graph twice:
+  single  — every node on OPENAI_MODEL
+  tiered  — the NODE_MODELS mapping from src/config.py (set FAST_MODEL and/or
+            <NODE>_MODEL in .env first)
+
+and reports end-to-end p50 / p95 / mean latency, plus per-node LLM latency,
+tokens and estimated cost from the usage tracker. The LLM response cache is
+bypassed so every run hits the endpoint.
+
+Usage (from the repo root):
+    python -m benchmarks.model_tiering
+    python -m benchmarks.model_tiering --repeats 5 --query "hello" --json results.json
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+from src.agents import agent_graph
+from src.config import NODE_MODELS, OPENAI_MODEL
+from src.llm.response_cache import bypass_cache
+from src.llm.usage import track_usage
+
+DEFAULT_QUERIES = [
+    # chit-chat → orchestrator + general
+    "Hi, what can you help me with?",
+    # routing + KB analysis + report
+    "What is the SOP for handling a tester alarm on the HXV handlers?",
+    "Why would bin 7 fallout increase after a probe card change?",
+]
+
+
+def _state(query: str, max_iterations: int) -> dict:
+    return {
+        "messages": [],
+        "user_query": query,
+        "request_id": uuid.uuid4().hex,
+        "channel": None,
+        "entities": None,
+        "scratchpad": "",
+        "findings": [],
+        "findings_summary": "",
+        "compacted_count": 0,
+        "sub_query": "",
+        "retrieved_docs": [],
+        "image_urls": [],
+        "citations": [],
+        "next_action": "",
+        "parallel_actions": [],
+        "final_answer": "",
+        "iteration": 0,
+        "iterations_saved": 0,
+        "max_iterations": max_iterations,
+        "deadline": None,
+        "traceback_uploads_dir": None,
+        "traceback_output_dir": None,
+    }
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_tier(name: str, mapping: dict, queries: list, repeats: int, max_iterations: int) -> dict:
+    """Run every query *repeats* times with NODE_MODELS temporarily set to *mapping*."""
+    saved = dict(NODE_MODELS)
+    NODE_MODELS.update(mapping)
+    latencies: list = []
+    by_node: dict = {}
+    try:
+        for r in range(repeats):
+            for query in queries:
+                with bypass_cache(), track_usage() as tracker:
+                    started = time.perf_counter()
+                    agent_graph.invoke(_state(query, max_iterations))
+                    elapsed = time.perf_counter() - started
+                latencies.append(elapsed)
+                for node, agg in tracker.summary()["by_node"].items():
+                    entry = by_node.setdefault(node, {"calls": 0, "latency_s": 0.0, "prompt_tokens": 0,
+                                                      "completion_tokens": 0, "cost_usd": 0.0})
+                    for key in entry:
+                        entry[key] += agg[key]
+                print(f"  [{name}] run {r + 1}/{repeats} {elapsed:6.2f}s  {query[:60]}")
+    finally:
+        NODE_MODELS.clear()
+        NODE_MODELS.update(saved)
+
+    for entry in by_node.values():
+        entry["mean_latency_s"] = round(entry["latency_s"] / entry["calls"], 3) if entry["calls"] else 0.0
+        entry["latency_s"] = round(entry["latency_s"], 3)
+        entry["cost_usd"] = round(entry["cost_usd"], 6)
+    return {
+        "models": mapping,
+        "runs": len(latencies),
+        "p50_s": round(statistics.median(latencies), 3),
+        "p95_s": round(_percentile(latencies, 95), 3),
+        "mean_s": round(statistics.fmean(latencies), 3),
+        "by_node": by_node,
+    }
+
+
+def _print_summary(results: dict) -> None:
+    print("\n=== End-to-end latency ===")
+    print(f"{'tier':<8} {'runs':>5} {'p50':>8} {'p95':>8} {'mean':>8}")
+    for name, res in results.items():
+        print(f"{name:<8} {res['runs']:>5} {res['p50_s']:>7.2f}s {res['p95_s']:>7.2f}s {res['mean_s']:>7.2f}s")
+
+    nodes = sorted({n for res in results.values() for n in res["by_node"]})
+    print("\n=== Mean LLM latency per node call (s) / total cost (USD) ===")
+    print(f"{'node':<24}" + "".join(f"{name:>22}" for name in results))
+    for node in nodes:
+        row = f"{node:<24}"
+        for res in results.values():
+            entry = res["by_node"].get(node)
+            row += f"{entry['mean_latency_s']:>12.2f} / {entry['cost_usd']:.4f}" if entry else f"{'-':>22}"
+        print(row)
+
+    if "single" in results and "tiered" in results:
+        base, tiered = results["single"]["p50_s"], results["tiered"]["p50_s"]
+        if base:
+            print(f"\np50 change with tiering: {100 * (tiered - base) / base:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", help="Query to run (repeatable; defaults to a built-in mix)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-iterations", type=int, default=5)
+    parser.add_argument("--json", help="Write full results to this file")
+    args = parser.parse_args()
+
+    queries = args.query or DEFAULT_QUERIES
+    tiers = {
+        "single": {node: OPENAI_MODEL for node in NODE_MODELS},
+        "tiered": dict(NODE_MODELS),
+    }
+    if tiers["single"] == tiers["tiered"]:
+        print("NOTE: NODE_MODELS maps every node to OPENAI_MODEL — set FAST_MODEL to compare tiers.")
+
+    results = {}
+    for name, mapping in tiers.items():
+        print(f"\nRunning tier '{name}': {json.dumps(mapping)}")
+        results[name] = run_tier(name, mapping, queries, args.repeats, args.max_iterations)
+
+    _print_summary(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nFull results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Request-level deadline budget for the agent graph.
+
+A single /agentic-chat request can otherwise run for minutes: Lamas waits up
+to 120 s, Aries up to 180 s, VLM calls are unbounded, and all of it repeats
+per iteration. Each request now carries an absolute deadline (epoch seconds):
+
+  - ``deadline`` in AgentState, set per turn from the request's ``timeout_s``
+    (default REQUEST_BUDGET_S; 0 disables the budget)
+  - the same deadline, minus the reporting reserve, in the tool-deadline
+    context variable (``request_deadline()`` → src/tools/base_tool.py), so
+    tools called deep inside a node — BaseTool.execute, the aries source
+    pool — see it without extra arguments; a resumed session run gets a
+    fresh one here
+
+REPORT_RESERVE_S of the budget is held back for the reporting node.
+``remaining()`` is what is left for investigation work, and:
+
+  - the orchestrator routes straight to reporting once it is exhausted, so
+    the answer is built from whatever evidence exists
+  - sources whose typical cost (``_EXPECTED_S``) won't fit are skipped
+  - BaseTool.execute caps its timeout at the remaining budget and runs
+    ``_run`` on a worker thread so the timeout is actually enforced
+  - async nodes bound their LLM calls with ``bounded()``
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Optional, TypeVar
+
+from ..config import REPORT_RESERVE_S
+from ..tools.base_tool import time_left, tool_deadline
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Typical seconds a source needs — it is skipped when less than this is left
+_EXPECTED_S = {
+    "lot_unit_xml": 2.0,
+    "lamas": 5.0,
+    "aries": 10.0,
+    "recent_lots": 5.0,
+    "traceback": 60.0,
+    "alignment": 20.0,
+}
+
+
+def new_deadline(timeout_s: Optional[float]) -> Optional[float]:
+    """Absolute deadline *timeout_s* from now, or None for no budget."""
+    return time.time() + timeout_s if timeout_s and timeout_s > 0 else None
+
+
+@contextmanager
+def request_deadline(deadline: Optional[float]):
+    """Make the request *deadline* (minus the reporting reserve) visible to tools in this block."""
+    with tool_deadline(deadline - REPORT_RESERVE_S if deadline else None):
+        yield
+
+
+@contextmanager
+def deadline_scope(state: dict):
+    """``request_deadline`` for the state's deadline, unless one is already active."""
+    if time_left() is not None or not state.get("deadline"):
+        yield
+        return
+    with request_deadline(state["deadline"]):
+        yield
+
+
+def remaining(state: Optional[dict] = None) -> Optional[float]:
+    """Seconds left for investigation work (reserve excluded), or None when unbounded."""
+    left = time_left()
+    if left is not None:
+        return left
+    deadline = (state or {}).get("deadline")
+    if not deadline:
+        return None
+    return deadline - REPORT_RESERVE_S - time.time()
+
+
+def exhausted(state: Optional[dict] = None) -> bool:
+    left = remaining(state)
+    return left is not None and left <= 0
+
+
+def fits(source: str, state: Optional[dict] = None) -> bool:
+    """Whether *source* is expected to finish inside the remaining budget."""
+    left = remaining(state)
+    if left is None or left >= _EXPECTED_S.get(source, 0.0):
+        return True
+    log.info("Budget: skipping %s — %.1fs left, needs ~%.0fs", source, max(left, 0.0), _EXPECTED_S[source])
+    return False
+
+
+def skipped_note(source: str, state: Optional[dict] = None) -> str:
+    left = max(remaining(state) or 0.0, 0.0)
+    return f"[{source}] Skipped — only {left:.0f}s left in the request time budget."
+
+
+async def bounded(awaitable: Awaitable[T], state: dict) -> T:
+    """Await *awaitable*, raising TimeoutError once the budget runs out."""
+    left = remaining(state)
+    if left is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, timeout=max(left, 0.0))
@@ -0,0 +1,173 @@
+"""
+Rolling cost statistics for cost- and latency-aware routing.
+
+The routing model used to pick between specialists knowing nothing about
+what they cost: stains_detective can take minutes, aries_data may sit on a
+slow Oracle query, issue_agent is usually sub-second. This module keeps a
+rolling window of the last AGENT_COST_WINDOW runs:
+
+  agents   every specialist node (``timed_node`` wraps them in graph.py);
+           a run succeeds when it records a finding backed by real data
+           (the node's ``evidence`` flag — source errors, empty retrievals,
+           skipped or failed runs leave it False)
+  sources  the aries_data sources (lot/unit XML, Lamas, Aries, recent
+           lots); a source call succeeds when it returns data, not an error
+
+``routing_costs()`` renders p50 / p95 latency and success rate per agent,
+plus the degraded sources, for the orchestrator's dynamic prompt. Agents
+with no runs yet show their typical cost (``_TYPICAL_S``). A source is
+degraded while its circuit breaker is not closed (tools/resilience.py) or
+when most of its recent calls failed. ``cost_stats()`` is exported on
+/metrics.
+"""
+import functools
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from ..config import AGENT_COST_WINDOW, COST_AWARE_ROUTING
+from ..tools.resilience import degraded_tools
+
+# Typical seconds per run before any history exists
+_TYPICAL_S = {
+    "issue_agent": 3.0,
+    "sop_agent": 3.0,
+    "aries_data": 20.0,
+    "stains_detective": 180.0,
+}
+
+# Breaker key prefix / source name → what the routing model should read
+_SOURCE_LABELS = {
+    "elastic_alarm": "Lamas alarms (aries_data)",
+    "unit_test_aries": "Aries Oracle (aries_data)",
+    "lamas": "Lamas alarms (aries_data)",
+    "aries": "Aries Oracle (aries_data)",
+    "lot_unit_xml": "lot/unit XML share (aries_data, issue_agent)",
+    "recent_lots": "recent lot listing (aries_data)",
+}
+
+# A source whose success rate over at least _MIN_SAMPLES recent calls is below this is degraded
+_MIN_SUCCESS = 0.5
+_MIN_SAMPLES = 3
+
+
+class _Window:
+    """The last AGENT_COST_WINDOW (seconds, succeeded) samples."""
+
+    def __init__(self):
+        self._samples: deque = deque(maxlen=AGENT_COST_WINDOW)
+
+    def add(self, seconds: float, ok: bool) -> None:
+        self._samples.append((seconds, ok))
+
+    def stats(self) -> dict:
+        samples = list(self._samples)
+        if not samples:
+            return {"runs": 0}
+        latencies = sorted(s for s, _ in samples)
+        return {
+            "runs": len(samples),
+            "p50_s": round(statistics.median(latencies), 2),
+            "p95_s": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 2),
+            "success_rate": round(sum(1 for _, ok in samples if ok) / len(samples), 3),
+        }
+
+
+_lock = threading.Lock()
+_agents: dict[str, _Window] = {}
+_sources: dict[str, _Window] = {}
+
+
+def _record(windows: dict, name: str, seconds: float, ok: bool) -> None:
+    with _lock:
+        window = windows.get(name)
+        if window is None:
+            window = windows[name] = _Window()
+        window.add(seconds, ok)
+
+
+def record_agent(agent: str, seconds: float, ok: bool) -> None:
+    _record(_agents, agent, seconds, ok)
+
+
+def record_source(source: str, seconds: float, ok: bool) -> None:
+    _record(_sources, source, seconds, ok)
+
+
+def _succeeded(update: Optional[dict]) -> bool:
+    return any(f.get("evidence") for f in (update or {}).get("findings") or [])
+
+
+def timed_node(agent: str, func: Callable, afunc: Callable) -> tuple[Callable, Callable]:
+    """(sync, async) node implementations that record each run's latency and outcome."""
+    @functools.wraps(func)
+    def sync_node(state):
+        started, update = time.perf_counter(), None
+        try:
+            update = func(state)
+            return update
+        finally:
+            record_agent(agent, time.perf_counter() - started, _succeeded(update))
+
+    @functools.wraps(afunc)
+    async def async_node(state):
+        started, update = time.perf_counter(), None
+        try:
+            update = await afunc(state)
+            return update
+        finally:
+            record_agent(agent, time.perf_counter() - started, _succeeded(update))
+
+    return sync_node, async_node
+
+
+def degraded_sources() -> list[str]:
+    """Sources with an open / half-open breaker or a mostly failing recent window."""
+    degraded = []
+    for key in degraded_tools():
+        label = _SOURCE_LABELS.get(key.split(":")[0], key)
+        site = key.partition(":")[2]
+        degraded.append(f"{label} {site}".strip())
+    with _lock:
+        sources = {source: window.stats() for source, window in _sources.items()}
+    for source, stats in sources.items():
+        if stats["runs"] >= _MIN_SAMPLES and stats["success_rate"] < _MIN_SUCCESS:
+            label = _SOURCE_LABELS.get(source, source)
+            degraded.append(f"{label} ({stats['success_rate']:.0%} of recent calls succeeded)")
+    return degraded
+
+
+def routing_costs() -> str:
+    """Prompt block with recent cost per specialist and the degraded sources; empty when disabled."""
+    if not COST_AWARE_ROUTING:
+        return ""
+    with _lock:
+        agents = {agent: window.stats() for agent, window in _agents.items()}
+    lines = ["AGENT COSTS (recent runs — p50 / p95 latency, success rate):"]
+    for agent, typical in _TYPICAL_S.items():
+        stats = agents.get(agent) or {"runs": 0}
+        if stats["runs"]:
+            lines.append(
+                f"  {agent:<17} {stats['p50_s']:.1f}s / {stats['p95_s']:.1f}s, "
+                f"{stats['success_rate']:.0%} useful ({stats['runs']} runs)"
+            )
+        else:
+            lines.append(f"  {agent:<17} ~{typical:.0f}s typical (no recent runs)")
+    degraded = degraded_sources()
+    lines.append("DEGRADED SOURCES: " + ("; ".join(degraded) if degraded else "none"))
+    return "\n".join(lines)
+
+
+def cost_stats() -> dict:
+    with _lock:
+        agents = {agent: window.stats() for agent, window in _agents.items()}
+        sources = {source: window.stats() for source, window in _sources.items()}
+    return {
+        "enabled": COST_AWARE_ROUTING,
+        "window": AGENT_COST_WINDOW,
+        "agents": agents,
+        "sources": sources,
+        "degraded": degraded_sources(),
+    }
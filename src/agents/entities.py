@@ -0,0 +1,151 @@
+"""
+Entity extraction for agent questions.
+
+The lot / operation / tester / VID patterns used to be copied into the
+orchestrator, issue_agent, aries_data and stains_detective nodes, each
+re-parsing the same strings and keeping only the first match. They live
+here now, and the ``entities`` graph node (nodes/entity_extraction.py) runs
+``extract_entities`` once per turn on the user question, storing an
+``Entities`` index in ``state["entities"]``:
+
+  lots        lot IDs after "lot"/"lots" — "lots 4V56656R, 4V56657S and 4V56658T"
+  operations  3-5 digit operations after "op"/"operation(s)"
+  testers     HXV tester IDs
+  vids        unit VIDs (U6P22X1603318) — the stains detective's lookup key
+  hours_back  lookback window — "last 3 days", "past 6h", "yesterday"
+  site        Lamas site index (0=VN, 1=CD, 2=KM, 3=PG) when a site is named
+
+Nodes call ``query_entities(state)``, which adds whatever their own
+``sub_query`` names (the orchestrator may focus it on IDs found in earlier
+findings) in front of the stored index.
+"""
+import re
+from typing import Optional, TypedDict
+
+# Lots looked up per question — a pasted lot list must not fan out unbounded
+MAX_LOTS = 10
+
+# Lot ID: 7-9 alphanumerics containing a digit (e.g. 4V56656R), after "lot"/"lots"
+_LOT_ID = r"(?=[A-Z]*\d)[A-Z0-9]{2}[A-Z0-9]{5,7}"
+_LOT_RE = re.compile(rf"\blots?\s*[:#]?\s*({_LOT_ID}(?:\s*(?:,|/|&|\band\b)\s*{_LOT_ID})*)\b", re.IGNORECASE)
+_LOT_ID_RE = re.compile(rf"\b{_LOT_ID}\b", re.IGNORECASE)
+# Operation: "op"/"operation(s)" followed by one or more 3-5 digit numbers
+_OP_RE = re.compile(r"\bop(?:eration)?s?\s*[:#]?\s*(\d{3,5}(?:\s*(?:,|/|&|\band\b)\s*\d{3,5})*)\b", re.IGNORECASE)
+_TESTER_RE = re.compile(r"\b(HXV\d{2,4})\b", re.IGNORECASE)
+# Unit VID / lot number used by the stains detective: U6P22X1603318, U6UQ657500716
+VID_RE = re.compile(r"\b([A-Z][A-Z0-9]{9,19})\b")
+
+# Time window: "last 3d" / "past 12 hrs" with a prefix, or a bare number only
+# with a spelled-out unit ("48 hours") — "2d drawing" is not a window
+_WINDOW_RE = re.compile(
+    r"\b(?:last|past|previous|within|over)\s+(\d+(?:\.\d+)?)\s*(weeks?|wks?|days?|d|hours?|hrs?|h)\b",
+    re.IGNORECASE,
+)
+_BARE_WINDOW_RE = re.compile(r"\b(\d+(?:\.\d+)?)\s*(weeks?|days?|hours?)\b", re.IGNORECASE)
+_UNIT_HOURS = {"w": 168.0, "d": 24.0, "h": 1.0}
+_RELATIVE_WINDOWS = (
+    (re.compile(r"\b(?:this|last|past) week\b", re.IGNORECASE), 168.0),
+    (re.compile(r"\byesterday\b", re.IGNORECASE), 48.0),
+    (re.compile(r"\btoday\b|\blast (?:24h|day)\b", re.IGNORECASE), 24.0),
+)
+
+# Lamas site indices (ElasticAlarmTool.SITE_CONFIG); bare codes only next to "site"
+_SITES = (
+    (0, re.compile(r"\b(?:vietnam|vnat)\b|\bsite\s+vn\b|\bvn\s+site\b", re.IGNORECASE)),
+    (1, re.compile(r"\bchengdu\b|\bsite\s+cd\b|\bcd\s+site\b", re.IGNORECASE)),
+    (2, re.compile(r"\bkulim\b|\bsite\s+km\b|\bkm\s+site\b", re.IGNORECASE)),
+    (3, re.compile(r"\bpenang\b|\bsite\s+pg\b|\bpg\s+site\b", re.IGNORECASE)),
+)
+
+
+class Entities(TypedDict):
+    lots: list[str]
+    operations: list[str]
+    testers: list[str]
+    vids: list[str]
+    hours_back: Optional[float]
+    site: Optional[int]
+
+
+def _unique(items) -> list:
+    return list(dict.fromkeys(items))
+
+
+def _hours_back(text: str) -> Optional[float]:
+    m = _WINDOW_RE.search(text) or _BARE_WINDOW_RE.search(text)
+    if m:
+        return float(m.group(1)) * _UNIT_HOURS[m.group(2)[0].lower()]
+    for pattern, hours in _RELATIVE_WINDOWS:
+        if pattern.search(text):
+            return hours
+    return None
+
+
+def _site(text: str) -> Optional[int]:
+    for index, pattern in _SITES:
+        if pattern.search(text):
+            return index
+    return None
+
+
+def extract_entities(text: str) -> Entities:
+    """Every lot, operation, tester and VID in *text*, plus the time window and site."""
+    lots = [
+        lot.upper()
+        for group in _LOT_RE.finditer(text)
+        for lot in _LOT_ID_RE.findall(group.group(1))
+    ]
+    operations = [op for group in _OP_RE.finditer(text) for op in re.findall(r"\d{3,5}", group.group(1))]
+    return {
+        "lots": _unique(lots),
+        "operations": _unique(operations),
+        "testers": _unique(t.upper() for t in _TESTER_RE.findall(text)),
+        "vids": _unique(VID_RE.findall(text)),
+        "hours_back": _hours_back(text),
+        "site": _site(text),
+    }
+
+
+def merge_entities(first: Entities, second: Entities) -> Entities:
+    """*first*'s entities followed by *second*'s; scalars come from *first* when set."""
+    merged = {key: _unique(first[key] + second[key]) for key in ("lots", "operations", "testers", "vids")}
+    for key in ("hours_back", "site"):
+        merged[key] = first[key] if first[key] is not None else second[key]
+    return merged
+
+
+def question_entities(state: dict) -> Entities:
+    """The entity index of the user question (extracted now when the stage has not run)."""
+    return state.get("entities") or extract_entities(state["user_query"])
+
+
+def query_entities(state: dict) -> Entities:
+    """Entities for a specialist: its sub_query's own entities first, then the question's."""
+    entities = question_entities(state)
+    sub_query = state.get("sub_query") or ""
+    if not sub_query or sub_query == state["user_query"]:
+        return entities
+    return merge_entities(extract_entities(sub_query), entities)
+
+
+def lot_operations(entities: Entities) -> list[tuple[str, Optional[str]]]:
+    """(lot, operation) pairs for the first MAX_LOTS lots — paired in order when the
+    counts match, otherwise every lot with the first operation (None when none was named)."""
+    lots, operations = entities["lots"][:MAX_LOTS], entities["operations"]
+    if operations and len(operations) == len(entities["lots"]):
+        return list(zip(lots, operations))
+    return [(lot, operations[0] if operations else None) for lot in lots]
+
+
+def describe_entities(entities: Entities) -> str:
+    """One-line summary for prompts and logs; empty when nothing was found."""
+    parts = [
+        f"{label}: {', '.join(entities[key])}"
+        for key, label in (("lots", "lots"), ("operations", "operations"), ("testers", "testers"), ("vids", "VIDs"))
+        if entities[key]
+    ]
+    if entities["hours_back"] is not None:
+        parts.append(f"window: last {entities['hours_back']:g}h")
+    if entities["site"] is not None:
+        parts.append(f"site: {('VN', 'CD', 'KM', 'PG')[entities['site']]}")
+    return "; ".join(parts)
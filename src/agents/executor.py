@@ -0,0 +1,58 @@
+"""
+Bounded executor for blocking I/O on the async request path.
+
+Async graph nodes must never block the event loop. Chroma queries, Oracle /
+Elasticsearch lookups, network-share reads and the Stains Detective pipeline
+are synchronous, so the async nodes hand them to ``run_blocking()``, which
+runs them on a shared thread pool of BLOCKING_IO_WORKERS threads.
+
+The caller's context variables (usage tracker, cache bypass, rate-limit lane)
+are copied into the worker thread, so per-request accounting still works.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from ..config import BLOCKING_IO_WORKERS
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+_lock = threading.Lock()
+_stats = {"submitted": 0, "completed": 0, "in_flight": 0, "peak_in_flight": 0}
+
+
+def _tracked(func: Callable[..., T]) -> T:
+    with _lock:
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    try:
+        return func()
+    finally:
+        with _lock:
+            _stats["in_flight"] -= 1
+            _stats["completed"] += 1
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the bounded executor and await its result."""
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    with _lock:
+        _stats["submitted"] += 1
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _tracked, call)
+
+
+def executor_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    stats["max_workers"] = BLOCKING_IO_WORKERS
+    stats["queued"] = max(0, stats["submitted"] - stats["completed"] - stats["in_flight"])
+    return stats
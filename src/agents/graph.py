@@ -2,7 +2,7 @@
 LangGraph graph assembly.
 
 Graph structure:
-  START → orchestrator
+  START → entities → orchestrator
   orchestrator → issue_agent | sop_agent | stains_detective | aries_data | general | reporting   (conditional)
   issue_agent        → orchestrator
   sop_agent          → orchestrator
@@ -11,12 +11,37 @@ Graph structure:
   general            → END
   reporting          → END
 
-The orchestrator loops until it decides "reporting" or max_iterations is hit.
+The entities node parses the question's lots, operations, testers, VIDs,
+time window and site once per turn (agents/entities.py). The orchestrator
+loops until it decides "reporting" or max_iterations is hit.
+
+Parallel fan-out: when the orchestrator sets ``parallel_actions``, ``_route``
+returns one ``Send`` per specialist (each with its own sub_query) and LangGraph
+runs them in the same superstep. Their updates merge through the AgentState
+reducers, and the orchestrator runs once after all branches finish.
+
+Specialist nodes are wrapped with ``timed_node`` (agents/costs.py), which
+keeps the rolling latency / success statistics the orchestrator routes on.
+
+Every node is registered with both a sync and an async implementation, so
+``agent_graph.invoke`` keeps working for scripts while the API serves
+requests through ``ainvoke`` / ``astream`` without blocking the event loop.
 """
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
 
 from .nodes import (
+    aaries_data_agent_node,
+    aentity_extraction_node,
+    ageneral_agent_node,
+    aissue_agent_node,
+    aorchestrator_node,
+    areporting_node,
     aries_data_agent_node,
+    asop_agent_node,
+    astains_detective_node,
+    entity_extraction_node,
     general_agent_node,
     issue_agent_node,
     orchestrator_node,
@@ -24,31 +49,51 @@ from .nodes import (
     sop_agent_node,
     stains_detective_node,
 )
+from .budget import exhausted
+from .costs import timed_node
 from .state import AgentState
 
 
-def _route(state: AgentState) -> str:
+def _route(state: AgentState) -> str | list[Send]:
     """Routing function called after every orchestrator step."""
     # Hard stop if we've hit the iteration ceiling
     if state.get("iteration", 0) >= state.get("max_iterations", 3):
         return "reporting"
-    return state.get("next_action", "reporting")
+    # ...or once the request time budget is used up
+    if exhausted(state):
+        return "reporting"
+    action = state.get("next_action", "reporting")
+    parallel = state.get("parallel_actions") or []
+    if not parallel:
+        return action
+    # Fan out — every branch sees the same state with its own sub_query
+    return [Send(action, dict(state))] + [
+        Send(task["agent"], {**state, "sub_query": task["sub_query"]}) for task in parallel
+    ]
 
 
-def build_graph() -> StateGraph:
+def build_graph(checkpointer=None):
+    """Compile the agent graph; pass a LangGraph checkpointer for persistent sessions."""
     graph = StateGraph(AgentState)
 
-    # Register nodes
-    graph.add_node("orchestrator", orchestrator_node)
-    graph.add_node("issue_agent", issue_agent_node)
-    graph.add_node("sop_agent", sop_agent_node)
-    graph.add_node("stains_detective", stains_detective_node)
-    graph.add_node("aries_data", aries_data_agent_node)
-    graph.add_node("general", general_agent_node)
-    graph.add_node("reporting", reporting_node)
+    # Register nodes (sync for invoke/stream, async for ainvoke/astream)
+    graph.add_node("entities", RunnableLambda(entity_extraction_node, afunc=aentity_extraction_node))
+    graph.add_node("orchestrator", RunnableLambda(orchestrator_node, afunc=aorchestrator_node))
+    for name, func, afunc in (
+        ("issue_agent", issue_agent_node, aissue_agent_node),
+        ("sop_agent", sop_agent_node, asop_agent_node),
+        ("stains_detective", stains_detective_node, astains_detective_node),
+        ("aries_data", aries_data_agent_node, aaries_data_agent_node),
+    ):
+        # Specialists record their latency and outcome for cost-aware routing
+        sync_node, async_node = timed_node(name, func, afunc)
+        graph.add_node(name, RunnableLambda(sync_node, afunc=async_node))
+    graph.add_node("general", RunnableLambda(general_agent_node, afunc=ageneral_agent_node))
+    graph.add_node("reporting", RunnableLambda(reporting_node, afunc=areporting_node))
 
-    # Entry point
-    graph.add_edge(START, "orchestrator")
+    # Entry point — parse the question's entities once, then start routing
+    graph.add_edge(START, "entities")
+    graph.add_edge("entities", "orchestrator")
 
     # Conditional routing from orchestrator
     graph.add_conditional_edges(
@@ -74,7 +119,7 @@ def build_graph() -> StateGraph:
     graph.add_edge("general", END)
     graph.add_edge("reporting", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
 # Module-level compiled graph — imported by main.py
@@ -0,0 +1,222 @@
+"""
+Background jobs for long-running agent investigations.
+
+A Stains Detective traceback or a multi-lot investigation can take minutes,
+longer than proxies keep an HTTP request open, and the request holds a
+server worker the whole time. ``POST /agentic-chat/jobs`` instead hands the
+run to ``submit_job()`` and returns a job ID at once:
+
+  queued     waiting for one of AGENT_JOB_WORKERS run slots (at most
+             AGENT_JOB_MAX_PENDING jobs may be queued or running)
+  running    the graph is executing; ``progress`` collects node events and
+             traceback steps as they happen
+  done       ``result`` holds the same payload /agentic-chat returns
+  failed     ``error`` says why
+  cancelled  ``cancel_job()`` stopped it (blocking calls already on a worker
+             thread finish in the background, their results are dropped)
+
+While a job runs, ``job_progress(source)`` returns a callback that appends
+to that job's progress — the stains node passes it to run_traceback as its
+``progress_callback``. Outside a job it returns None. Finished jobs are kept
+AGENT_JOB_TTL_S seconds for polling; ``job_stats()`` is exported on /metrics.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from ..config import AGENT_JOB_MAX_PENDING, AGENT_JOB_TTL_S, AGENT_JOB_WORKERS
+
+log = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_ACTIVE = (QUEUED, RUNNING)
+
+# Progress events kept per job (oldest dropped first)
+_MAX_EVENTS = 200
+
+
+class JobQueueFull(RuntimeError):
+    """Raised by submit_job when AGENT_JOB_MAX_PENDING jobs are already queued or running."""
+
+
+class Job:
+    def __init__(self, query: str, session_id: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.session_id = session_id
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.events: list[dict] = []
+        self.dropped_events = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def progress(self, event: dict) -> None:
+        """Record a progress event; safe to call from worker threads."""
+        event = {"at": round(time.time() - self.created, 2), **event}
+        with self._lock:
+            self.events.append(event)
+            if len(self.events) > _MAX_EVENTS:
+                del self.events[0]
+                self.dropped_events += 1
+
+    def to_dict(self, since: int = 0) -> dict:
+        """JSON-safe view; *since* skips progress events the client has already seen."""
+        with self._lock:
+            total = self.dropped_events + len(self.events)
+            events = self.events[max(since - self.dropped_events, 0):]
+        end = self.finished or time.time()
+        payload = {
+            "job_id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "created_at": self.created,
+            "queued_s": round((self.started or end) - self.created, 2),
+            "running_s": round(end - self.started, 2) if self.started else None,
+            "progress": events,
+            "progress_total": total,
+        }
+        if self.session_id:
+            payload["session_id"] = self.session_id
+        if self.status == DONE:
+            payload["result"] = self.result
+        elif self.error:
+            payload["error"] = self.error
+        return payload
+
+
+_current: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("agent_job", default=None)
+
+_lock = threading.Lock()
+_jobs: dict[str, Job] = {}
+_stats = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, CANCELLED: 0, "peak_running": 0}
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _prune(now: float) -> None:
+    """Forget finished jobs older than AGENT_JOB_TTL_S. Caller holds _lock."""
+    for job_id in [
+        job_id for job_id, job in _jobs.items()
+        if job.status not in _ACTIVE and now - (job.finished or now) > AGENT_JOB_TTL_S
+    ]:
+        del _jobs[job_id]
+
+
+def _counts() -> dict:
+    """Jobs per status. Caller holds _lock."""
+    counts = {QUEUED: 0, RUNNING: 0}
+    for job in _jobs.values():
+        if job.status in counts:
+            counts[job.status] += 1
+    return counts
+
+
+def _finish(job: Job, status: str, error: Optional[str] = None) -> None:
+    with _lock:
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        _stats[status] += 1
+
+
+async def _run(job: Job, run: Callable[[Job], Awaitable[dict]]) -> None:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(AGENT_JOB_WORKERS)
+    try:
+        async with _slots:
+            with _lock:
+                job.status = RUNNING
+                job.started = time.time()
+                _stats["peak_running"] = max(_stats["peak_running"], _counts()[RUNNING])
+            log.info("Job %s: running (queued %.1fs)", job.id, job.started - job.created)
+            _current.set(job)
+            result = await run(job)
+        job.result = result
+        _finish(job, DONE)
+        log.info("Job %s: done in %.1fs", job.id, job.finished - job.started)
+    except asyncio.CancelledError:
+        _finish(job, CANCELLED, "Cancelled")
+        log.info("Job %s: cancelled", job.id)
+    except Exception as e:
+        log.exception("Job %s failed", job.id)
+        _finish(job, FAILED, f"{type(e).__name__}: {e}")
+
+
+def submit_job(query: str, run: Callable[[Job], Awaitable[dict]], session_id: Optional[str] = None) -> Job:
+    """Start ``run(job)`` in the background and return the queued Job.
+
+    Must be called on the event loop. Raises JobQueueFull when the queue is full.
+    """
+    with _lock:
+        _prune(time.time())
+        if sum(_counts().values()) >= AGENT_JOB_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise JobQueueFull(f"{AGENT_JOB_MAX_PENDING} agent jobs already queued or running — retry later")
+        job = Job(query, session_id)
+        _jobs[job.id] = job
+        _stats["submitted"] += 1
+    job.task = asyncio.get_running_loop().create_task(_run(job, run), name=f"agent-job-{job.id}")
+    log.info("Job %s: queued — %r", job.id, query[:80])
+    return job
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _lock:
+        _prune(time.time())
+        return _jobs.get(job_id)
+
+
+async def cancel_job(job_id: str, wait_s: float = 2.0) -> Optional[Job]:
+    """Cancel a queued or running job, waiting up to *wait_s* for it to stop; None when it does not exist."""
+    job = get_job(job_id)
+    if job is not None and job.status in _ACTIVE and job.task is not None:
+        job.task.cancel()
+        await asyncio.wait({job.task}, timeout=wait_s)
+    return job
+
+
+async def cancel_all_jobs() -> None:
+    """Cancel every unfinished job and wait for them to stop (server shutdown)."""
+    with _lock:
+        tasks = [job.task for job in _jobs.values() if job.status in _ACTIVE and job.task is not None]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def job_progress(source: str) -> Optional[Callable[[int, int, str], None]]:
+    """A ``(step, total, message)`` progress callback for the running job, or None outside a job."""
+    job = _current.get()
+    if job is None:
+        return None
+
+    def _report(step: int, total: int, message: str) -> None:
+        job.progress({"node": source, "step": step, "total": total, "message": message})
+
+    return _report
+
+
+def job_stats() -> dict:
+    with _lock:
+        _prune(time.time())
+        stats = dict(_stats)
+        stats.update(_counts())
+        stats["retained"] = len(_jobs)
+    stats["workers"] = AGENT_JOB_WORKERS
+    stats["max_pending"] = AGENT_JOB_MAX_PENDING
+    return stats
@@ -3,35 +3,184 @@ LangChain model factory for the agent layer.
 
 Separate from src/llm/service.py (which is kept for VLM ingestion).
 This factory returns BaseChatModel instances that LangGraph nodes use.
+
+Instances are cached per (model, temperature) and all of them share the
+process-wide pooled httpx clients from src/llm/http_pool.py, so node calls
+reuse keep-alive connections instead of paying a TLS handshake each time.
+Both ``invoke`` and ``ainvoke`` go through the pool.
+
+When LLM_CACHE_ENABLED is set, every model is also wired to the exact-match
+SQLite response cache (src/llm/response_cache.py).
+
+Each caller passes its node name and gets the model configured for it in
+NODE_MODELS (config.py), so routing and chit-chat can run on a fast tier
+while analysis stays on OPENAI_MODEL.
+
+Every model carries a usage callback that reports prompt / completion /
+cached tokens and latency per graph node to src/llm/usage.py.
 """
+import json
+import threading
+import time
+from typing import Any, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.load import dumps, loads
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
-import ssl
-import httpx
 
 from ..config import (
-    OPENAI_API_KEY, OPENAI_MODEL, OPENAI_ENDPOINT, OPENAI_API_VERSION,
+    OPENAI_API_KEY, OPENAI_MODEL, OPENAI_ENDPOINT, OPENAI_API_VERSION, NODE_MODELS,
 )
+from ..llm.http_pool import get_async_http_client, get_http_client
+from ..llm.response_cache import ResponseCache, get_response_cache, make_key
+from ..llm.usage import record_llm_call
 
-def get_chat_model(temperature: float = 0.5):
-    """
-    Returns a LangChain BaseChatModel for the configured provider.
+_models: dict = {}
+_models_lock = threading.Lock()
 
-    Note: structured_output (used by the orchestrator) requires a model
-    that supports function/tool calling. GPT-4o/Azure do.
+
+class _SQLiteResponseCache(BaseCache):
+    """LangChain BaseCache adapter over the shared SQLite ResponseCache.
+
+    LangChain passes the serialised message list as *prompt* and the model
+    parameters (model, temperature, bound tools / schema) as *llm_string*.
     """
+
+    def __init__(self, cache: ResponseCache):
+        self._cache = cache
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        value = self._cache.get(make_key(llm_string, None, prompt))
+        if value is None:
+            return None
+        try:
+            generations = [loads(gen) for gen in json.loads(value)]
+        except Exception:
+            return None
+        # A cache hit bills nothing — zero the usage so accounting doesn't double count
+        for gen in generations:
+            message = getattr(gen, "message", None)
+            if message is not None and getattr(message, "usage_metadata", None):
+                message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        tokens = 0
+        for gen in return_val:
+            usage = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+            tokens += usage.get("total_tokens", 0)
+        self._cache.put(
+            make_key(llm_string, None, prompt),
+            json.dumps([dumps(gen) for gen in return_val]),
+            tokens,
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self._cache.clear()
+
+
+class _UsageCallbackHandler(BaseCallbackHandler):
+    """Reports token usage and latency of each chat-model call, tagged with the
+    LangGraph node it ran in (``langgraph_node`` callback metadata)."""
+
+    run_inline = True
+
+    def __init__(self, model: str):
+        self._model = model
+        self._runs: dict[UUID, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID,
+                            metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node", "unknown")
+        with self._lock:
+            self._runs[run_id] = (node, time.perf_counter())
+
+    def _pop(self, run_id: UUID) -> tuple[str, float]:
+        with self._lock:
+            node, start = self._runs.pop(run_id, ("unknown", time.perf_counter()))
+        return node, time.perf_counter() - start
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        node, latency = self._pop(run_id)
+        prompt = completion = cached = 0
+        for generations in response.generations:
+            for gen in generations:
+                usage = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+                cached += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        if not prompt and not completion:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt = token_usage.get("prompt_tokens", 0)
+            completion = token_usage.get("completion_tokens", 0)
+        record_llm_call(node, self._model, prompt, completion, cached, latency)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        node, latency = self._pop(run_id)
+        record_llm_call(node, self._model, latency_s=latency, error=True)
+
+
+def _model_kwargs(model: str) -> dict:
+    kwargs = {
+        "http_client": get_http_client(),
+        "http_async_client": get_async_http_client(),
+        "callbacks": [_UsageCallbackHandler(model)],
+    }
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        kwargs["cache"] = _SQLiteResponseCache(response_cache)
+    return kwargs
+
+
+def _build_chat_model(model: str, temperature: float):
     if OPENAI_API_VERSION:
-        ssl_context = ssl.create_default_context()
         return AzureChatOpenAI(
             azure_endpoint=OPENAI_ENDPOINT,
-            azure_deployment=OPENAI_MODEL,
+            azure_deployment=model,
             api_key=OPENAI_API_KEY,
             api_version=OPENAI_API_VERSION,
             temperature=temperature,
-            http_client=httpx.Client(verify=ssl_context),
+            **_model_kwargs(model),
         )
     return ChatOpenAI(
         api_key=OPENAI_API_KEY,
-        model=OPENAI_MODEL,
+        model=model,
         base_url=OPENAI_ENDPOINT or None,
         temperature=temperature,
+        **_model_kwargs(model),
     )
+
+
+def model_for_node(node: Optional[str]) -> str:
+    """Model / deployment name configured for *node* (OPENAI_MODEL if unknown)."""
+    if node is None:
+        return OPENAI_MODEL
+    return NODE_MODELS.get(node) or OPENAI_MODEL
+
+
+def get_chat_model(temperature: float = 0.5, node: Optional[str] = None):
+    """
+    Returns a LangChain BaseChatModel for the configured provider.
+
+    *node* selects the model tier from NODE_MODELS; without it the default
+    OPENAI_MODEL is used.
+
+    One instance is kept per temperature/model configuration for the life
+    of the process — callers must not mutate the returned model.
+
+    Note: structured_output (used by the orchestrator) requires a model
+    that supports function/tool calling. GPT-4o/4o-mini/Azure do.
+    """
+    model_name = model_for_node(node)
+    key = (model_name, float(temperature))
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = _build_chat_model(model_name, float(temperature))
+                _models[key] = model
+    return model
@@ -1,12 +1,14 @@
-from .orchestrator import orchestrator_node
-from .issue_agent import issue_agent_node
-from .sop_agent import sop_agent_node
-from .reporting import reporting_node
-from .stains_detective_agent import stains_detective_node
-from .general_agent import general_agent_node
-from .aries_data_agent import aries_data_agent_node
+from .entity_extraction import aentity_extraction_node, entity_extraction_node
+from .orchestrator import aorchestrator_node, orchestrator_node
+from .issue_agent import aissue_agent_node, issue_agent_node
+from .sop_agent import asop_agent_node, sop_agent_node
+from .reporting import areporting_node, reporting_node
+from .stains_detective_agent import astains_detective_node, stains_detective_node
+from .general_agent import ageneral_agent_node, general_agent_node
+from .aries_data_agent import aaries_data_agent_node, aries_data_agent_node
 
 __all__ = [
+    "entity_extraction_node",
     "orchestrator_node",
     "issue_agent_node",
     "sop_agent_node",
@@ -14,4 +16,12 @@ __all__ = [
     "stains_detective_node",
     "general_agent_node",
     "aries_data_agent_node",
+    "aentity_extraction_node",
+    "aorchestrator_node",
+    "aissue_agent_node",
+    "asop_agent_node",
+    "areporting_node",
+    "astains_detective_node",
+    "ageneral_agent_node",
+    "aaries_data_agent_node",
 ]
@@ -8,51 +8,61 @@ Data flow:
   1. Lot/Unit XML  — fetch from network share, extract tester ID
   2. Lamas (ES)    — query equipment alarms for the tester extracted from step 1
   3. Aries Oracle  — query unit test results (bins, yield, tester performance)
+
+Lots, operations, testers, the lookback window and the Lamas site come
+from the entity index (agents/entities.py). A multi-lot question fetches
+the XML of every lot, queries Aries once for all lots (``v0.lot IN ...``)
+and Lamas once per tester.
+
+The sources run concurrently under a shared deadline (DATA_SOURCE_DEADLINE_S):
+Aries and the XML fetches start together, and Lamas starts immediately for
+the testers named in the question (otherwise as soon as an XML yields one).
+Worst-case latency is the slowest source, not the sum, and a source that
+misses the deadline is reported as omitted while the rest are analysed.
+Every fetch records its latency and outcome for cost-aware routing
+(agents/costs.py).
 """
+import contextvars
 import logging
 import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 
+from ...config import DATA_SOURCE_DEADLINE_S, DATA_SOURCE_WORKERS, TOOL_CACHE_LAMAS_TTL
+from ...tools.cache import cached_tool_call
+from ..budget import bounded, deadline_scope, fits, remaining, skipped_note
+from ..costs import record_source
+from ..entities import lot_operations, query_entities
+from ..executor import run_blocking
 from ..llm import get_chat_model
+from ..prompts import build_messages, record_cache_usage
+from ..scratchpad import record_finding, scratchpad_view
 from ..state import AgentState
 from ..tools import retrieve_lot_unit_info, list_recent_lots, query_unit_test_aries
 
 log = logging.getLogger(__name__)
 
-# ---- Query parameter parsers ----
-
-_LOT_RE = re.compile(r"\blot\s+([A-Z0-9]{2}[A-Z0-9]{5,7})\b", re.IGNORECASE)
-_OP_RE = re.compile(r"\bop(?:eration)?\s*(\d{3,5})\b", re.IGNORECASE)
-_TESTER_RE = re.compile(r"\b(HXV\d{2,4})\b", re.IGNORECASE)
-
-
-def _parse_lot_op(text: str) -> tuple[Optional[str], Optional[str]]:
-    lot_m = _LOT_RE.search(text)
-    op_m = _OP_RE.search(text)
-    return (
-        lot_m.group(1).upper() if lot_m else None,
-        op_m.group(1) if op_m else None,
-    )
-
-
-def _parse_tester(text: str) -> Optional[str]:
-    m = _TESTER_RE.search(text)
-    return m.group(1).upper() if m else None
-
-
-def _parse_hours_back(query: str) -> float:
-    """Extract a lookback window in hours. Defaults to 12."""
-    m = re.search(r"(\d+(?:\.\d+)?)\s*(?:day|days)", query, re.IGNORECASE)
-    if m:
-        return float(m.group(1)) * 24
-    m = re.search(r"(\d+)\s*(?:hour|hours|hr|hrs|h)\b", query, re.IGNORECASE)
-    if m:
-        return float(m.group(1))
-    return 12.0
-
+# Source fetches that miss the deadline keep running here (their results
+# still land in the tool cache) without holding up the node
+_source_pool = ThreadPoolExecutor(max_workers=DATA_SOURCE_WORKERS, thread_name_prefix="aries-source")
+
+_SYSTEM_PROMPT = (
+    "You are a Production Data Analysis Agent specialising in semiconductor test data.\n\n"
+    "You will be given the original question, the search query used, previous "
+    "investigation notes, and the production data that was collected.\n"
+    "Analyse the data and produce a concise summary covering:\n"
+    "1. Lot/unit test results — pass/fail per step, bin patterns, yield\n"
+    "2. Aries Oracle unit test data — good/bad distribution, interface/functional bins, tester performance\n"
+    "3. Equipment alarms or anomalies from Lamas (if available)\n"
+    "4. Correlations between alarms, test failures, and bin patterns\n"
+    "5. Recommendations for follow-up investigation\n"
+    "Be precise — cite specific numbers, lot IDs, and timestamps from the data."
+)
 
 # ---- Lamas / Elasticsearch helper ----
 
@@ -66,7 +76,20 @@ def _query_lamas(
 
     When *tester_id* is given, filters to that specific tester.
     When omitted, returns the most recent alarms across **all** testers.
+
+    Results are shared through the tool cache for TOOL_CACHE_LAMAS_TTL seconds.
     """
+    return cached_tool_call(
+        "lamas",
+        {"tester_id": (tester_id or "").upper(), "hours_back": hours_back,
+         "site_name": site_name, "sample_count": sample_count},
+        lambda: _fetch_lamas(tester_id, hours_back, site_name, sample_count),
+        ttl=TOOL_CACHE_LAMAS_TTL,
+        cacheable=lambda text: not text.startswith(("Lamas unavailable", "Lamas query failed")),
+    )
+
+
+def _fetch_lamas(tester_id: Optional[str], hours_back: float, site_name: int, sample_count: int) -> str:
     try:
         from ...tools.elastic_alarm_tool import ElasticAlarmTool
         from ...tools.base_tool import ToolConfig
@@ -122,159 +145,319 @@ def _query_lamas(
 
 # ---- Main agent node ----
 
-def aries_data_agent_node(state: AgentState) -> dict:
-    sub_query = state.get("sub_query") or state["user_query"]
-    iteration = state.get("iteration", 1)
+def _source_ok(result) -> bool:
+    if isinstance(result, dict):
+        return not result.get("error")
+    return not str(result).startswith(("Lamas unavailable", "Lamas query failed"))
 
-    findings: list[str] = []
-    tester_id = _parse_tester(sub_query) or _parse_tester(state["user_query"])
 
-    # --- 1. Lot/Unit XML from network share ---
-    lot_id, operation = _parse_lot_op(sub_query)
-    if not lot_id:
-        lot_id, operation = _parse_lot_op(state["user_query"])
-
-    if lot_id and operation:
-        log.info("Data Agent — fetching lot/unit XML: lot=%s op=%s", lot_id, operation)
-        lu = retrieve_lot_unit_info(lot_id, operation)
-        if lu["lot_summary"] or lu["unit_summary"]:
-            parts = []
-            if lu["lot_summary"]:
-                parts.append(f"=== Lot Info ===\n{lu['lot_summary']}")
-            if lu["unit_summary"]:
-                parts.append(f"=== Unit Info ===\n{lu['unit_summary']}")
-            findings.append("\n\n".join(parts))
-
-            # Extract tester from lot XML if not already in the query
-            if not tester_id and lu.get("tester_id"):
-                tester_id = lu["tester_id"]
-                log.info("Data Agent — extracted tester %s from lot XML", tester_id)
-
-        if lu["error"]:
-            findings.append(f"[Lot/Unit XML] {lu['error']}")
-    elif lot_id:
-        findings.append(f"[Lot/Unit XML] Lot {lot_id} detected but no operation number — cannot look up XML.")
+def _timed(source: str, fn, *args, **kwargs):
+    started, result = time.perf_counter(), None
+    try:
+        result = fn(*args, **kwargs)
+        return result
+    finally:
+        record_source(source, time.perf_counter() - started, result is not None and _source_ok(result))
 
-    # --- 2. Lamas / Elasticsearch alarms ---
-    hours_back = _parse_hours_back(sub_query)
-    log.info("Data Agent — querying Lamas: tester=%s, hours_back=%.0f", tester_id or "all", hours_back)
-    lamas_result = _query_lamas(tester_id, hours_back=max(hours_back, 12.0))
-    findings.append(lamas_result)
 
-    # --- 3. Aries Oracle DB — unit test results ---
-    if lot_id:
-        op_filter = f"{operation[:1]}%" if operation else None
-        tester_filter = f"%{tester_id}%" if tester_id else None
+def _submit(source: str, fn, *args, **kwargs) -> Future:
+    """Run a blocking source fetch on the source pool with the caller's context vars."""
+    ctx = contextvars.copy_context()
+    return _source_pool.submit(ctx.run, _timed, source, fn, *args, **kwargs)
+
+
+def _result_by(future: Future, deadline: float, source: str):
+    """The future's result, or None once the shared deadline has passed."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FuturesTimeout:
+        log.warning("Data Agent — %s missed the collection deadline, continuing without it", source)
+        return None
+
+
+def _timed_out(source: str) -> str:
+    # "unavailable" up front so _analysis_messages does not count it as real data
+    return f"[{source}] Unavailable — no result within the data-collection deadline."
+
+
+def _format_lot_unit(lu: dict) -> list[str]:
+    findings = []
+    if lu["lot_summary"] or lu["unit_summary"]:
+        parts = []
+        if lu["lot_summary"]:
+            parts.append(f"=== Lot Info ===\n{lu['lot_summary']}")
+        if lu["unit_summary"]:
+            parts.append(f"=== Unit Info ===\n{lu['unit_summary']}")
+        findings.append("\n\n".join(parts))
+    if lu["error"]:
+        findings.append(f"[Lot/Unit XML] {lu['error']}")
+    return findings
+
+
+def _format_aries(aries: dict, lots: list[str]) -> str:
+    if aries["error"]:
+        return f"[Aries Oracle] {aries['error']}"
+    if not aries["records"]:
+        return f"[Aries Oracle] No unit test records found for lot {', '.join(lots)}."
+    lines = [f"=== Aries Unit Test Data ({aries['count']} rows) ==="]
+    # Show column headers from first record
+    cols = list(aries["records"][0].keys())
+    lines.append("  Columns: " + ", ".join(cols))
+    # Summarise: bin distribution
+    bin_counts: dict[str, int] = {}
+    for rec in aries["records"]:
+        gb = rec.get("GOODBAD", "?")
+        bin_counts[gb] = bin_counts.get(gb, 0) + 1
+    lines.append(f"  Good/Bad distribution: {bin_counts}")
+    if len(lots) > 1:
+        per_lot: dict[str, dict[str, int]] = {}
+        for rec in aries["records"]:
+            counts = per_lot.setdefault(str(rec.get("LOT", "?")), {})
+            gb = rec.get("GOODBAD", "?")
+            counts[gb] = counts.get(gb, 0) + 1
+        for lot in lots:
+            lines.append(f"  {lot}: {per_lot.get(lot, 'no rows')}")
+    # Show first few rows for context
+    sample_size = min(20, len(aries["records"]))
+    lines.append(f"  First {sample_size} rows:")
+    for rec in aries["records"][:sample_size]:
+        row_str = ", ".join(f"{k}={v}" for k, v in rec.items())
+        lines.append(f"    {row_str}")
+    return "\n".join(lines)
+
+
+def _format_recent(recent: dict) -> Optional[str]:
+    if recent["lots"]:
+        lot_lines = [f"=== Recent Lots (top {len(recent['lots'])}) ==="]
+        for entry in recent["lots"]:
+            header = f"  {entry['lot_id']} op {entry['operation']} (modified {entry['modified']})"
+            if entry.get("tester_id"):
+                header += f" tester={entry['tester_id']}"
+            lot_lines.append(header)
+            if entry["summary"]:
+                first_line = entry["summary"].split("\n")[0]
+                lot_lines.append(f"    {first_line}")
+        return "\n".join(lot_lines)
+    if recent["error"]:
+        return f"[Recent Lots] {recent['error']}"
+    return None
+
+
+def _collect(state: AgentState) -> dict:
+    """Blocking I/O: gather lot/unit XML, Lamas alarms, Aries rows and recent lots.
+
+    Independent sources are fetched concurrently under one shared deadline
+    (DATA_SOURCE_DEADLINE_S, or less when the request budget is tighter); a
+    source that misses it is reported as omitted and the others are still
+    returned. Sources that won't fit in the request budget are skipped.
+    """
+    with deadline_scope(state):
+        return _collect_sources(state)
+
+
+def _collect_sources(state: AgentState) -> dict:
+    sub_query = state.get("sub_query") or state["user_query"]
+    budget_left = remaining(state)
+    window = DATA_SOURCE_DEADLINE_S if budget_left is None else max(0.0, min(DATA_SOURCE_DEADLINE_S, budget_left))
+    deadline = time.monotonic() + window
+
+    findings: list[str] = []
+    entities = query_entities(state)
+    pairs = lot_operations(entities)
+    lots = [lot for lot, _ in pairs]
+    operations = entities["operations"]
+    testers = list(entities["testers"])
+    hours_back = max(entities["hours_back"] or 12.0, 12.0)
+    site = entities["site"] if entities["site"] is not None else 0
+
+    # --- Start every source that is ready to run ---
+    xml_fs: dict[tuple, Future] = {}
+    lamas_fs: dict[Optional[str], Future] = {}
+    aries_f = recent_f = None
+    skipped: list[str] = []
+    with_op = [(lot, op) for lot, op in pairs if op]
+    if with_op and fits("lot_unit_xml", state):
+        for lot, op in with_op:
+            log.info("Data Agent — fetching lot/unit XML: lot=%s op=%s", lot, op)
+            xml_fs[(lot, op)] = _submit("lot_unit_xml", retrieve_lot_unit_info, lot, op)
+    elif with_op:
+        skipped.append(skipped_note("Lot/Unit XML", state))
+    if lots and not fits("aries", state):
+        skipped.append(skipped_note("Aries Oracle", state))
+    elif lots:
+        # The lot IDs already scope the query; the operation / tester filters only
+        # apply when the question names a single one of them
+        prefixes = {op[:1] for op in operations}
+        op_filter = f"{prefixes.pop()}%" if len(prefixes) == 1 else None
+        tester_filter = f"%{testers[0]}%" if len(testers) == 1 else None
         log.info(
-            "Data Agent — querying Aries Oracle: lot=%s op=%s tester=%s",
-            lot_id, op_filter, tester_filter,
+            "Data Agent — querying Aries Oracle: lots=%s op=%s tester=%s",
+            ",".join(lots), op_filter, tester_filter,
         )
-        aries = query_unit_test_aries(
-            lot=lot_id,
+        # Several lots go out as one batched query
+        aries_f = _submit(
+            "aries",
+            query_unit_test_aries,
+            lot=lots[0] if len(lots) == 1 else None,
+            lots=lots if len(lots) > 1 else None,
             operation=op_filter,
             tester_id=tester_filter,
-            row_limit=5000,
+            row_limit=min(5000 * len(lots), 50000),
         )
-        if aries["error"]:
-            findings.append(f"[Aries Oracle] {aries['error']}")
-        elif aries["records"]:
-            lines = [f"=== Aries Unit Test Data ({aries['count']} rows) ==="]
-            # Show column headers from first record
-            cols = list(aries["records"][0].keys())
-            lines.append("  Columns: " + ", ".join(cols))
-            # Summarise: bin distribution
-            bin_counts: dict[str, int] = {}
-            for rec in aries["records"]:
-                gb = rec.get("GOODBAD", "?")
-                bin_counts[gb] = bin_counts.get(gb, 0) + 1
-            lines.append(f"  Good/Bad distribution: {bin_counts}")
-            # Show first few rows for context
-            sample_size = min(20, len(aries["records"]))
-            lines.append(f"  First {sample_size} rows:")
-            for rec in aries["records"][:sample_size]:
-                row_str = ", ".join(f"{k}={v}" for k, v in rec.items())
-                lines.append(f"    {row_str}")
-            findings.append("\n".join(lines))
+
+    # Lamas needs the tester — wait for the lot XML only when it is the one source of it
+    run_lamas = fits("lamas", state)
+
+    def _start_lamas(tester: Optional[str]) -> None:
+        log.info("Data Agent — querying Lamas: tester=%s, hours_back=%.0f, site=%d", tester or "all", hours_back, site)
+        lamas_fs[tester] = _submit("lamas", _query_lamas, tester, hours_back=hours_back, site_name=site)
+
+    if not run_lamas:
+        skipped.append(skipped_note("Lamas", state))
+    elif testers:
+        for tester in testers:
+            _start_lamas(tester)
+    elif not xml_fs:
+        _start_lamas(None)
+    if not lots and not testers:
+        if fits("recent_lots", state):
+            log.info("Data Agent — no specific IDs detected, listing recent lots")
+            recent_f = _submit("recent_lots", list_recent_lots, n=10)
         else:
-            findings.append(f"[Aries Oracle] No unit test records found for lot {lot_id}.")
+            skipped.append(skipped_note("Recent Lots", state))
+
+    # --- 1. Lot/Unit XML from network share ---
+    for (lot, op), xml_f in xml_fs.items():
+        lu = _result_by(xml_f, deadline, f"lot/unit XML {lot}")
+        if lu is None:
+            findings.append(_timed_out(f"Lot/Unit XML {lot}" if len(xml_fs) > 1 else "Lot/Unit XML"))
+            continue
+        findings.extend(_format_lot_unit(lu))
+        # Extract tester from lot XML if not already in the query
+        xml_tester = lu.get("tester_id")
+        if xml_tester and xml_tester not in testers:
+            testers.append(xml_tester)
+            log.info("Data Agent — extracted tester %s from lot XML of %s", xml_tester, lot)
+            if run_lamas and xml_tester not in lamas_fs:
+                _start_lamas(xml_tester)
+    if xml_fs and run_lamas and not lamas_fs:
+        _start_lamas(None)
+    for lot, op in pairs:
+        if not op:
+            findings.append(f"[Lot/Unit XML] Skipped lot {lot} — no operation number to look up its XML.")
+
+    # --- 2. Lamas / Elasticsearch alarms ---
+    for tester, lamas_f in lamas_fs.items():
+        lamas_result = _result_by(lamas_f, deadline, f"Lamas {tester or 'all testers'}")
+        findings.append(lamas_result if lamas_result is not None else _timed_out("Lamas"))
+
+    # --- 3. Aries Oracle DB — unit test results ---
+    if aries_f is not None:
+        aries = _result_by(aries_f, deadline, "Aries Oracle")
+        findings.append(_format_aries(aries, lots) if aries is not None else _timed_out("Aries Oracle"))
 
     # --- 4. Broad query (no specific IDs) — list recent lots ---
-    if not lot_id and not tester_id:
-        log.info("Data Agent — no specific IDs detected, listing recent lots")
-
-        recent = list_recent_lots(n=10)
-        if recent["lots"]:
-            lot_lines = [f"=== Recent Lots (top {len(recent['lots'])}) ==="]
-            for entry in recent["lots"]:
-                header = f"  {entry['lot_id']} op {entry['operation']} (modified {entry['modified']})"
-                if entry.get("tester_id"):
-                    header += f" tester={entry['tester_id']}"
-                lot_lines.append(header)
-                if entry["summary"]:
-                    first_line = entry["summary"].split("\n")[0]
-                    lot_lines.append(f"    {first_line}")
-            findings.append("\n".join(lot_lines))
-        elif recent["error"]:
-            findings.append(f"[Recent Lots] {recent['error']}")
+    if recent_f is not None:
+        recent = _result_by(recent_f, deadline, "recent lots")
+        recent_text = _format_recent(recent) if recent is not None else _timed_out("Recent Lots")
+        if recent_text:
+            findings.append(recent_text)
 
-    # --- Combine and analyse ---
-    combined = "\n\n".join(findings) if findings else "No data sources returned results."
-    has_real_data = findings and not all(
-        "failed" in f.lower()[:40] or "unavailable" in f.lower()[:40] or "not found" in f.lower()[:40]
+    findings.extend(skipped)
+    return {
+        "sub_query": sub_query,
+        "findings": findings,
+        "lots": lots,
+        "operations": operations,
+        "testers": testers,
+    }
+
+
+def _has_real_data(findings: list[str]) -> bool:
+    """Whether at least one source note is data rather than an error, timeout or skip."""
+    return any(
+        not any(marker in f.lower()[:40] for marker in ("failed", "unavailable", "not found", "skipped"))
         for f in findings
     )
 
-    if has_real_data:
-        analysis_prompt = (
-            "You are a Production Data Analysis Agent specialising in semiconductor test data.\n\n"
-            f"ORIGINAL QUESTION: {state['user_query']}\n"
-            f"SEARCH QUERY USED: {sub_query}\n\n"
-            f"PREVIOUS INVESTIGATION NOTES:\n{state.get('scratchpad', 'None')}\n\n"
-            "PRODUCTION DATA:\n"
-            f"{combined}\n\n"
-            "Analyse the data and produce a concise summary covering:\n"
-            "1. Lot/unit test results — pass/fail per step, bin patterns, yield\n"
-            "2. Aries Oracle unit test data — good/bad distribution, interface/functional bins, tester performance\n"
-            "3. Equipment alarms or anomalies from Lamas (if available)\n"
-            "4. Correlations between alarms, test failures, and bin patterns\n"
-            "5. Recommendations for follow-up investigation\n"
-            "Be precise — cite specific numbers, lot IDs, and timestamps from the data."
-        )
-        model = get_chat_model(temperature=0.3)
-        try:
-            response = model.invoke([HumanMessage(content=analysis_prompt)])
-            finding = response.content
-        except Exception as e:
-            finding = f"LLM analysis failed: {e}\n\nRaw data:\n{combined}"
-    else:
-        finding = combined
 
-    # --- Append to scratchpad ---
-    current = state.get("scratchpad", "")
-    sources = []
-    if lot_id:
-        sources.append(f"lot={lot_id}")
-    if operation:
-        sources.append(f"op={operation}")
-    if tester_id:
-        sources.append(f"tester={tester_id}")
-    source_str = ", ".join(sources) if sources else "general query"
+def _analysis_messages(state: AgentState, collected: dict) -> tuple[Optional[list], str]:
+    """Return (analysis prompt or None when no source returned real data, combined raw data)."""
+    findings = collected["findings"]
+    combined = "\n\n".join(findings) if findings else "No data sources returned results."
+    if not _has_real_data(findings):
+        return None, combined
+
+    analysis_prompt = (
+        f"ORIGINAL QUESTION: {state['user_query']}\n"
+        f"SEARCH QUERY USED: {collected['sub_query']}\n\n"
+        f"PREVIOUS INVESTIGATION NOTES:\n{scratchpad_view(state) or 'None'}\n\n"
+        "PRODUCTION DATA:\n"
+        f"{combined}\n"
+    )
+    return build_messages(_SYSTEM_PROMPT, analysis_prompt), combined
+
 
-    new_scratchpad = (
-        current
-        + f"\n\n--- [Aries Data Agent — Step {iteration}] ---\n"
-        + f"(Sources: {source_str})\n"
-        + finding
+def _finding_text(collected: dict, finding: str) -> str:
+    # One "lot=<id>" per lot — the orchestrator's lot shortcut looks for them
+    sources = (
+        [f"lot={lot}" for lot in collected["lots"]]
+        + [f"op={op}" for op in collected["operations"]]
+        + [f"tester={tester}" for tester in collected["testers"]]
     )
+    source_str = ", ".join(sources) if sources else "general query"
+    return f"(Sources: {source_str})\n{finding}"
+
 
+def _update(recorded: dict, finding: str) -> dict:
     return {
-        "scratchpad": new_scratchpad,
-        "retrieved_docs": state.get("retrieved_docs", []),
-        "image_urls": state.get("image_urls", []),
-        "citations": state.get("citations", []),
+        **recorded,
         "messages": [
             AIMessage(
                 content=f"[Aries Data Agent] {finding[:300]}{'...' if len(finding) > 300 else ''}"
             )
         ],
     }
+
+
+def aries_data_agent_node(state: AgentState) -> dict:
+    collected = _collect(state)
+
+    # --- Combine and analyse ---
+    messages, combined = _analysis_messages(state, collected)
+    if messages is None:
+        finding = combined
+    else:
+        model = get_chat_model(temperature=0.3, node="aries_data")
+        try:
+            response = model.invoke(messages)
+            record_cache_usage("aries_data", response)
+            finding = response.content
+        except Exception as e:
+            finding = f"LLM analysis failed: {e}\n\nRaw data:\n{combined}"
+
+    # --- Append to scratchpad ---
+    text = _finding_text(collected, finding)
+    recorded = record_finding(state, "Aries Data Agent", text, evidence=messages is not None)
+    return _update(recorded, finding)
+
+
+async def aaries_data_agent_node(state: AgentState) -> dict:
+    """Async variant of ``aries_data_agent_node`` — data sources run on the blocking-I/O executor."""
+    collected = await run_blocking(_collect, state)
+
+    messages, combined = _analysis_messages(state, collected)
+    if messages is None:
+        finding = combined
+    else:
+        model = get_chat_model(temperature=0.3, node="aries_data")
+        try:
+            response = await bounded(model.ainvoke(messages), state)
+            record_cache_usage("aries_data", response)
+            finding = response.content
+        except Exception as e:
+            finding = f"LLM analysis failed: {e}\n\nRaw data:\n{combined}"
+
+    text = _finding_text(collected, finding)
+    recorded = record_finding(state, "Aries Data Agent", text, evidence=messages is not None)
+    return _update(recorded, finding)
@@ -0,0 +1,26 @@
+"""
+Entity extraction node — the first step of every turn.
+
+Parses the user question once (agents/entities.py) into the structured
+``entities`` index that the orchestrator, the sufficiency check and the
+specialists read, instead of each of them re-running the regexes.
+"""
+import logging
+
+from ..entities import describe_entities, extract_entities
+from ..state import AgentState
+
+log = logging.getLogger(__name__)
+
+
+def entity_extraction_node(state: AgentState) -> dict:
+    entities = extract_entities(state["user_query"])
+    summary = describe_entities(entities)
+    if summary:
+        log.info("Entities — %s", summary)
+    return {"entities": entities}
+
+
+async def aentity_extraction_node(state: AgentState) -> dict:
+    """Async variant — pure regex work, so it simply runs inline."""
+    return entity_extraction_node(state)
@@ -4,44 +4,59 @@ General / chitchat agent node.
 Handles greetings, capability questions, and conversational queries
 that do not require a knowledge-base lookup.
 """
-from pathlib import Path
-
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 
 from ..llm import get_chat_model
+from ..prompts import GUARDRAILS_BLOCK, build_messages, record_cache_usage
 from ..state import AgentState
 
-_COMPLIANCE_PATH = Path(__file__).resolve().parent.parent / "compliance.md"
-_COMPLIANCE_RULES = _COMPLIANCE_PATH.read_text(encoding="utf-8")
+# Static prefix — identical on every call so the provider's prompt cache can reuse it
+_SYSTEM_PROMPT = (
+    "You are SkyBot, an AI assistant specialising in semiconductor manufacturing.\n\n"
+    f"{GUARDRAILS_BLOCK}\n"
+    "The user sent a conversational message (greeting, capability question, etc.).\n"
+    "Respond in a friendly, professional tone. If relevant, briefly describe your "
+    "capabilities:\n"
+    "  - Investigating manufacturing defects and root-cause analysis\n"
+    "  - Looking up SOPs, BKMs, checklists, and work instructions\n"
+    "  - Tracing defect origins across process inspection images\n"
+    "  - Answering questions based on your semiconductor knowledge base\n\n"
+    "Keep the response concise. Do NOT make up technical information."
+)
 
 
-def general_agent_node(state: AgentState) -> dict:
-    user_query = state["user_query"]
+_FALLBACK_ANSWER = "Hello! I'm SkyBot, your semiconductor manufacturing assistant. How can I help you today?"
 
-    prompt = (
-        "You are SkyBot, an AI assistant specialising in semiconductor manufacturing.\n\n"
-        "=== COMPLIANCE GUARDRAILS ===\n"
-        f"{_COMPLIANCE_RULES}\n"
-        "=== END GUARDRAILS ===\n\n"
-        "The user sent a conversational message (greeting, capability question, etc.).\n"
-        "Respond in a friendly, professional tone. If relevant, briefly describe your "
-        "capabilities:\n"
-        "  - Investigating manufacturing defects and root-cause analysis\n"
-        "  - Looking up SOPs, BKMs, checklists, and work instructions\n"
-        "  - Tracing defect origins across process inspection images\n"
-        "  - Answering questions based on your semiconductor knowledge base\n\n"
-        "Keep the response concise. Do NOT make up technical information.\n\n"
-        f"USER MESSAGE:\n{user_query}"
-    )
-
-    model = get_chat_model(temperature=0.7)
-    try:
-        response = model.invoke([HumanMessage(content=prompt)])
-        answer = response.content
-    except Exception as e:
-        answer = f"Hello! I'm SkyBot, your semiconductor manufacturing assistant. How can I help you today?"
 
+def _update(answer: str) -> dict:
     return {
         "final_answer": answer,
         "messages": [AIMessage(content=answer)],
     }
+
+
+def general_agent_node(state: AgentState) -> dict:
+    user_query = state["user_query"]
+
+    model = get_chat_model(temperature=0.7, node="general")
+    try:
+        response = model.invoke(build_messages(_SYSTEM_PROMPT, f"USER MESSAGE:\n{user_query}"))
+        record_cache_usage("general", response)
+        answer = response.content
+    except Exception:
+        answer = _FALLBACK_ANSWER
+
+    return _update(answer)
+
+
+async def ageneral_agent_node(state: AgentState) -> dict:
+    """Async variant of ``general_agent_node``."""
+    model = get_chat_model(temperature=0.7, node="general")
+    try:
+        response = await model.ainvoke(build_messages(_SYSTEM_PROMPT, f"USER MESSAGE:\n{state['user_query']}"))
+        record_cache_usage("general", response)
+        answer = response.content
+    except Exception:
+        answer = _FALLBACK_ANSWER
+
+    return _update(answer)
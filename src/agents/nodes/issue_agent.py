@@ -4,107 +4,137 @@ Issue Investigation Agent node.
 Searches the knowledge base for evidence related to a manufacturing issue,
 analyses what it finds, and appends structured findings to the scratchpad.
 
-When a lot ID + operation are detected in the query, also fetches lot/unit
-XML data from the network share for richer context.
+When lot IDs + operations are named in the question (the entity index,
+see agents/entities.py), also fetches the lot/unit XML of each lot from the
+network share for richer context.
 """
 import logging
-import re
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 
+from ..budget import bounded, deadline_scope, fits
+from ..entities import lot_operations, query_entities
+from ..executor import run_blocking
 from ..llm import get_chat_model
+from ..prefetch import kb_retrieval
+from ..prompts import build_messages, record_cache_usage
+from ..scratchpad import record_finding, scratchpad_view
 from ..state import AgentState
-from ..tools import retrieve_from_knowledge_base, retrieve_lot_unit_info
+from ..tools import retrieve_lot_unit_info
 
 log = logging.getLogger(__name__)
 
-# Pattern: "lot" keyword followed by lot ID (e.g. lot 4V56656R, lot AB1234567)
-_LOT_RE = re.compile(r"\blot\s+([A-Z0-9]{2}[A-Z0-9]{5,7})\b", re.IGNORECASE)
-# Pattern: "op" or "operation" followed by 3-5 digit number
-_OP_RE = re.compile(r"\bop(?:eration)?\s*(\d{3,5})\b", re.IGNORECASE)
+_SYSTEM_PROMPT = (
+    "You are an Issue Investigation Agent specialising in semiconductor manufacturing.\n\n"
+    "You will be given the original question, the search query used, previous "
+    "investigation notes, and retrieved documents and/or lot/unit data.\n"
+    "Analyse the retrieved documents and produce a concise technical summary covering:\n"
+    "1. Likely root causes or contributing factors\n"
+    "2. Relevant data points (process parameters, measurements, lot IDs)\n"
+    "3. Recommended next investigation steps\n"
+    "Be precise and cite page numbers where possible."
+)
 
 
-def _extract_lot_op(text: str) -> tuple:
-    """Try to extract a lot ID and operation from free text."""
-    lot_match = _LOT_RE.search(text)
-    op_match = _OP_RE.search(text)
-    return (
-        lot_match.group(1).upper() if lot_match else None,
-        op_match.group(1) if op_match else None,
-    )
-
-
-def issue_agent_node(state: AgentState) -> dict:
+def _gather(state: AgentState) -> tuple[str, dict, str]:
+    """Blocking I/O: knowledge-base search plus lot/unit XML for each lot+op mentioned."""
     sub_query = state.get("sub_query") or state["user_query"]
-    channel = state.get("channel")
-    iteration = state.get("iteration", 1)
-
-    # 1. Retrieve relevant documents from knowledge base
-    retrieval = retrieve_from_knowledge_base(sub_query, channel=channel, n_results=5)
 
-    # 2. Try to fetch lot/unit info if a lot+operation pair is detected
-    lot_unit_ctx = ""
-    lot_id, operation = _extract_lot_op(sub_query)
-    if not lot_id:
-        lot_id, operation = _extract_lot_op(state["user_query"])
+    # 1. Retrieve relevant documents from knowledge base (prefetched when it matches)
+    retrieval = kb_retrieval(state, sub_query)
 
-    if lot_id and operation:
+    # 2. Fetch lot/unit info for every lot+operation pair in the question
+    pairs = [(lot, op) for lot, op in lot_operations(query_entities(state)) if op]
+    parts = []
+    for lot_id, operation in pairs:
+        if not fits("lot_unit_xml", state):
+            break
         log.info("Issue Agent — detected lot=%s op=%s, fetching XML", lot_id, operation)
-        lu = retrieve_lot_unit_info(lot_id, operation)
-        if not lu["error"]:
-            parts = []
-            if lu["lot_summary"]:
-                parts.append(f"=== Lot Info ===\n{lu['lot_summary']}")
-            if lu["unit_summary"]:
-                parts.append(f"=== Unit Info ===\n{lu['unit_summary']}")
-            lot_unit_ctx = "\n\n".join(parts)
-        else:
+        with deadline_scope(state):
+            lu = retrieve_lot_unit_info(lot_id, operation)
+        if lu["error"]:
             log.info("Lot/unit lookup: %s", lu["error"])
+            continue
+        label = f" — {lot_id} op {operation}" if len(pairs) > 1 else ""
+        if lu["lot_summary"]:
+            parts.append(f"=== Lot Info{label} ===\n{lu['lot_summary']}")
+        if lu["unit_summary"]:
+            parts.append(f"=== Unit Info{label} ===\n{lu['unit_summary']}")
+    return sub_query, retrieval, "\n\n".join(parts)
 
-    # 3. Build context and analyse
+
+def _analysis_messages(state: AgentState, sub_query: str, retrieval: dict, lot_unit_ctx: str):
+    """Analysis prompt, or None when nothing relevant was retrieved."""
     kb_context = retrieval["context"].strip()
-    has_context = bool(kb_context) or bool(lot_unit_ctx)
+    if not kb_context and not lot_unit_ctx:
+        return None
+
+    context_block = ""
+    if kb_context:
+        context_block += f"RETRIEVED DOCUMENTS:\n{kb_context}\n\n"
+    if lot_unit_ctx:
+        context_block += f"LOT/UNIT DATA:\n{lot_unit_ctx}\n\n"
+
+    analysis_prompt = (
+        f"ORIGINAL QUESTION: {state['user_query']}\n"
+        f"SEARCH QUERY USED: {sub_query}\n\n"
+        f"PREVIOUS INVESTIGATION NOTES:\n{scratchpad_view(state) or 'None'}\n\n"
+        f"{context_block}"
+    )
+    return build_messages(_SYSTEM_PROMPT, analysis_prompt)
 
-    if not has_context:
-        finding = "No relevant documents or lot data found for this issue query."
-    else:
-        context_block = ""
-        if kb_context:
-            context_block += f"RETRIEVED DOCUMENTS:\n{kb_context}\n\n"
-        if lot_unit_ctx:
-            context_block += f"LOT/UNIT DATA:\n{lot_unit_ctx}\n\n"
-
-        analysis_prompt = (
-            "You are an Issue Investigation Agent specialising in semiconductor manufacturing.\n\n"
-            f"ORIGINAL QUESTION: {state['user_query']}\n"
-            f"SEARCH QUERY USED: {sub_query}\n\n"
-            f"PREVIOUS INVESTIGATION NOTES:\n{state.get('scratchpad', 'None')}\n\n"
-            f"{context_block}"
-            "Analyse the retrieved documents and produce a concise technical summary covering:\n"
-            "1. Likely root causes or contributing factors\n"
-            "2. Relevant data points (process parameters, measurements, lot IDs)\n"
-            "3. Recommended next investigation steps\n"
-            "Be precise and cite page numbers where possible."
-        )
-        model = get_chat_model(temperature=0.3)
-        try:
-            response = model.invoke([HumanMessage(content=analysis_prompt)])
-            finding = response.content
-        except Exception as e:
-            finding = f"Analysis failed: {e}"
 
-    # 4. Append to shared scratchpad
-    current = state.get("scratchpad", "")
-    new_scratchpad = (current + f"\n\n--- [Issue Agent — Step {iteration}] ---\n" + finding)
+_NO_CONTEXT = "No relevant documents or lot data found for this issue query."
 
+
+def _update(state: AgentState, recorded: dict, finding: str, retrieval: dict) -> dict:
     return {
-        "scratchpad": new_scratchpad,
-        "retrieved_docs": state.get("retrieved_docs", []) + retrieval["docs"],
-        "image_urls": list(
-            dict.fromkeys(state.get("image_urls", []) + retrieval["images"])
-        ),
-        "citations": state.get("citations", []) + retrieval["citations"],
+        **recorded,
+        "retrieved_docs": retrieval["docs"],
+        "image_urls": retrieval["images"],
+        "citations": retrieval["citations"],
         "messages": [
             AIMessage(content=f"[Issue Agent] {finding[:300]}{'...' if len(finding) > 300 else ''}")
         ],
     }
+
+
+def issue_agent_node(state: AgentState) -> dict:
+    sub_query, retrieval, lot_unit_ctx = _gather(state)
+
+    # 3. Build context and analyse
+    messages = _analysis_messages(state, sub_query, retrieval, lot_unit_ctx)
+    evidence = messages is not None
+    if messages is None:
+        finding = _NO_CONTEXT
+    else:
+        model = get_chat_model(temperature=0.3, node="issue_agent")
+        try:
+            response = model.invoke(messages)
+            record_cache_usage("issue_agent", response)
+            finding = response.content
+        except Exception as e:
+            finding, evidence = f"Analysis failed: {e}", False
+
+    # 4. Append to shared scratchpad
+    return _update(state, record_finding(state, "Issue Agent", finding, evidence), finding, retrieval)
+
+
+async def aissue_agent_node(state: AgentState) -> dict:
+    """Async variant of ``issue_agent_node`` — retrieval runs on the blocking-I/O executor."""
+    sub_query, retrieval, lot_unit_ctx = await run_blocking(_gather, state)
+
+    messages = _analysis_messages(state, sub_query, retrieval, lot_unit_ctx)
+    evidence = messages is not None
+    if messages is None:
+        finding = _NO_CONTEXT
+    else:
+        model = get_chat_model(temperature=0.3, node="issue_agent")
+        try:
+            response = await bounded(model.ainvoke(messages), state)
+            record_cache_usage("issue_agent", response)
+            finding = response.content
+        except Exception as e:
+            finding, evidence = f"Analysis failed: {e}", False
+
+    return _update(state, record_finding(state, "Issue Agent", finding, evidence), finding, retrieval)
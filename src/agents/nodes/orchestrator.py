@@ -4,63 +4,138 @@ Orchestrator node — the ReAct "Reason" step.
 Uses structured output to decide which specialist agent to invoke next,
 or whether enough information has been gathered to produce a final report.
 
-Deterministic shortcuts (bypass the LLM call for unambiguous routing):
-  - VID pattern detected  → stains_detective
-  - Lot ID + operation    → aries_data  (live DB query comes before KB search)
+Deterministic shortcuts (bypass the LLM call for unambiguous routing), on
+the entity index parsed by the entities node:
+  - VID detected          → stains_detective
+  - Lot ID(s) not fetched → aries_data, with issue_agent searching the KB for
+                            the same question in parallel (PARALLEL_FANOUT)
+
+When the request time budget (agents/budget.py) is used up, the orchestrator
+goes straight to reporting with the evidence gathered so far.
+
+Once findings exist, a heuristic sufficiency check (agents/sufficiency.py)
+routes straight to reporting when they already cover the question.
+
+Otherwise the first hop is classified by the local embedding router
+(agents/router.py); a confident prediction skips the routing LLM call.
+Meanwhile the knowledge-base search for the raw question is started
+speculatively (agents/prefetch.py) for issue_agent / sop_agent to pick up.
+
+The routing prompt carries each specialist's recent latency and success
+rate and the currently degraded data sources (agents/costs.py), so the
+model takes the cheaper of several adequate paths.
+
+A decision may list extra independent specialists in ``parallel``; the graph
+dispatches them together with ``next_action`` via LangGraph ``Send`` and the
+orchestrator runs again once every branch has finished. That join point is
+also where the scratchpad view is compacted.
 """
 import logging
-import re
-from pathlib import Path
 from typing import Literal, Optional
 
-from langchain_core.messages import AIMessage, HumanMessage
-from pydantic import BaseModel
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel, Field
 
+from ...config import PARALLEL_FANOUT, SUFFICIENCY_CHECK
+from ..budget import bounded, exhausted
+from ..costs import routing_costs
+from ..entities import describe_entities, question_entities
+from ..executor import run_blocking
 from ..llm import get_chat_model
+from ..prefetch import start_prefetch
+from ..prompts import GUARDRAILS_BLOCK, build_messages, record_cache_usage
+from ..router import predict_first_hop, record_llm_route
+from ..scratchpad import acompact_findings, compact_findings, scratchpad_view
 from ..state import AgentState
-from .stains_detective_agent import extract_vid
-
-_COMPLIANCE_PATH = Path(__file__).resolve().parent.parent / "compliance.md"
-_COMPLIANCE_RULES = _COMPLIANCE_PATH.read_text(encoding="utf-8")
+from ..sufficiency import check_sufficiency, record_early_exit
 
 logger = logging.getLogger(__name__)
 
-# Lot ID pattern: 1-2 letters/digits + 5-7 alphanumerics (e.g. 4V56656R)
-_LOT_RE = re.compile(r"\blot\s+([A-Z0-9]{2}[A-Z0-9]{5,7})\b", re.IGNORECASE)
-# Operation pattern: "op" or "operation" followed by 3-5 digits
-_OP_RE = re.compile(r"\bop(?:eration)?\s+(\d{3,5})\b", re.IGNORECASE)
 
+# Specialists that only read shared state and can safely run side by side
+PARALLEL_AGENTS = ("issue_agent", "sop_agent", "aries_data")
 
-def _extract_lot_op(text: str) -> tuple[Optional[str], Optional[str]]:
-    """Try to extract a lot ID and operation from text like 'lot 4V56656R op 5274'."""
-    lot_m = _LOT_RE.search(text)
-    op_m = _OP_RE.search(text)
-    return (
-        lot_m.group(1).upper() if lot_m else None,
-        op_m.group(1) if op_m else None,
-    )
+
+class ParallelTask(BaseModel):
+    agent: Literal["issue_agent", "sop_agent", "aries_data"]
+    sub_query: str  # focused search query for this agent
 
 
 class OrchestratorDecision(BaseModel):
     reasoning: str
     next_action: Literal["issue_agent", "sop_agent", "stains_detective", "aries_data", "general", "reporting"]
     sub_query: str  # focused search query for the chosen agent
+    parallel: list[ParallelTask] = Field(
+        default_factory=list,
+        description="Other independent specialists to run at the same time as next_action",
+    )
 
 
-def orchestrator_node(state: AgentState) -> dict:
-    """
-    Reads the current investigation state and decides which specialist to call.
-    """
+# Static prefix — identical on every call so the provider's prompt cache can reuse it.
+# Keep ALL per-request content out of this string (see agents/prompts.py).
+_SYSTEM_PROMPT = (
+    "You are the orchestrator of a semiconductor manufacturing AI system.\n\n"
+    f"{GUARDRAILS_BLOCK}\n"
+    "Available actions:\n"
+    "  • aries_data        — use FIRST when the question references a specific lot ID, "
+    "operation number, tester name, or asks for live production data (yield, bins, "
+    "test results, lot status, tester performance). Also use when the user asks "
+    "to list current/recent lots, show recent alarms, or get an overview of "
+    "production activity WITHOUT specifying IDs — the agent can scan recent lots "
+    "and query all tester alarms. This agent queries the Aries manufacturing "
+    "database and fetches lot/unit XML data from the network share. "
+    "Include lot IDs, operations, time ranges, and tester IDs in sub_query "
+    "when available; leave sub_query as the original question for broad scans.\n"
+    "  • issue_agent       — use to search the **knowledge base documents** for known "
+    "issues, failure patterns, equipment alarms, RCA reports, and historical analysis. "
+    "Best used AFTER aries_data has provided lot-specific context so the search is "
+    "more targeted. Do NOT use for fetching live data.\n"
+    "  • sop_agent         — use when the question asks for a procedure, SOP, BKM, "
+    "checklist, work instruction, or manual reference.\n"
+    "  • stains_detective  — use when the question asks to trace back defect origins "
+    "across process images, align process images, run a defect traceback pipeline, "
+    "or analyse stains / particle origins across inspection steps. "
+    "Include any file-system path mentioned by the user verbatim in sub_query.\n"
+    "  • general           — use for greetings, chitchat, capability questions "
+    "(e.g. 'hello', 'what can you do?', 'who are you?'), or any conversational "
+    "query that does not require knowledge-base lookup.\n"
+    "  • reporting         — use when the scratchpad already contains enough "
+    "information to give a complete, accurate answer to the user.\n\n"
+    "ROUTING RULES:\n"
+    "1. For lot-specific queries: aries_data FIRST, then issue_agent if KB context is needed.\n"
+    "2. Do NOT repeat the same agent if its findings are already in the scratchpad.\n"
+    "3. If the scratchpad has data but no KB context and the question needs both, use issue_agent.\n"
+    "4. If the scratchpad already has sufficient data + KB context, go to reporting.\n"
+    "5. When two lookups are independent (e.g. live lot data AND a KB search for the "
+    "same issue, or a KB search AND an SOP lookup), put one in next_action and the "
+    "other in parallel with its own sub_query — they run concurrently. Only "
+    "issue_agent, sop_agent and aries_data may run in parallel; leave parallel "
+    "empty otherwise.\n"
+    "6. COST: when several actions could answer the question equally well, pick the "
+    "one with the lower latency and higher success rate under AGENT COSTS. Avoid "
+    "an agent whose sources are listed under DEGRADED SOURCES unless the question "
+    "cannot be answered without it, and mention the degradation in reasoning. "
+    "A cheap parallel branch adds no wall time next to an expensive one.\n\n"
+    "Provide a concise sub_query (≤ 20 words) for the chosen agent.\n"
+    "The user question, investigation notes and iteration count follow in the next message."
+)
+
+
+def _shortcut(state: AgentState) -> Optional[dict]:
+    """Deterministic routing that needs no LLM call, or None."""
     iteration = state.get("iteration", 0)
     max_iter = state.get("max_iterations", 3)
-    scratchpad = state.get("scratchpad", "").strip() or "No findings yet."
+    # Full log for "has this agent already run?" checks
+    scratchpad = state.get("scratchpad", "")
     user_query = state["user_query"]
+    entities = question_entities(state)
 
     # ------------------------------------------------------------------
     # Deterministic shortcut 1: VID → stains_detective
     # ------------------------------------------------------------------
-    vid = extract_vid(user_query)
-    if vid and "[Stains Detective" not in scratchpad:
+    # VID-specific, so a session follow-up about a new VID still runs its traceback
+    vid = entities["vids"][0] if entities["vids"] else None
+    if vid and f"vid={vid}" not in scratchpad:
         logger.info(
             "Orchestrator [iter %d/%d] → stains_detective (VID %s detected, direct route)",
             iteration + 1, max_iter, vid,
@@ -68,6 +143,7 @@ def orchestrator_node(state: AgentState) -> dict:
         return {
             "next_action": "stains_detective",
             "sub_query": user_query,
+            "parallel_actions": [],
             "iteration": iteration + 1,
             "messages": [
                 AIMessage(content=f"[Orchestrator → stains_detective] VID {vid} detected — routing to defect traceback.")
@@ -75,88 +151,168 @@ def orchestrator_node(state: AgentState) -> dict:
         }
 
     # ------------------------------------------------------------------
-    # Deterministic shortcut 2: lot ID + operation → aries_data first
+    # Deterministic shortcut 2: lot ID(s) → aries_data, with the KB search
+    # for the same question running alongside it
     # ------------------------------------------------------------------
-    lot_id, operation = _extract_lot_op(user_query)
-    if lot_id and "[Aries Data Agent" not in scratchpad:
-        op_str = f" op {operation}" if operation else ""
+    # Lot-specific, so a session follow-up about a new lot still fetches its data
+    pending = [lot for lot in entities["lots"] if f"lot={lot}" not in scratchpad]
+    if pending:
+        lot_str = ", ".join(pending)
+        op_str = f" op {', '.join(entities['operations'])}" if entities["operations"] else ""
+        parallel = []
+        if PARALLEL_FANOUT and "[Issue Agent" not in scratchpad:
+            parallel = [{"agent": "issue_agent", "sub_query": user_query}]
+        also = " + issue_agent" if parallel else ""
+        detail = (
+            "fetching live production data and searching the KB in parallel."
+            if parallel else "fetching live production data first."
+        )
         logger.info(
-            "Orchestrator [iter %d/%d] → aries_data (lot %s%s detected, direct route)",
-            iteration + 1, max_iter, lot_id, op_str,
+            "Orchestrator [iter %d/%d] → aries_data%s (lot %s%s detected, direct route)",
+            iteration + 1, max_iter, also, lot_str, op_str,
         )
         return {
             "next_action": "aries_data",
             "sub_query": user_query,
+            "parallel_actions": parallel,
             "iteration": iteration + 1,
             "messages": [
-                AIMessage(content=f"[Orchestrator → aries_data] Lot {lot_id}{op_str} detected — fetching live production data first.")
+                AIMessage(content=f"[Orchestrator → aries_data{also}] Lot {lot_str}{op_str} detected — {detail}")
             ],
         }
+    return None
 
-    # ------------------------------------------------------------------
-    # LLM-based routing
-    # ------------------------------------------------------------------
-    prompt = (
-        "You are the orchestrator of a semiconductor manufacturing AI system.\n\n"
-        "=== COMPLIANCE GUARDRAILS ===\n"
-        f"{_COMPLIANCE_RULES}\n"
-        "=== END GUARDRAILS ===\n\n"
-        f"USER QUESTION:\n{user_query}\n\n"
-        f"INVESTIGATION NOTES SO FAR (scratchpad):\n{scratchpad}\n\n"
-        f"CURRENT ITERATION: {iteration} of {max_iter} allowed\n\n"
-        "Choose the next action:\n"
-        "  • aries_data        — use FIRST when the question references a specific lot ID, "
-        "operation number, tester name, or asks for live production data (yield, bins, "
-        "test results, lot status, tester performance). Also use when the user asks "
-        "to list current/recent lots, show recent alarms, or get an overview of "
-        "production activity WITHOUT specifying IDs — the agent can scan recent lots "
-        "and query all tester alarms. This agent queries the Aries manufacturing "
-        "database and fetches lot/unit XML data from the network share. "
-        "Include lot IDs, operations, time ranges, and tester IDs in sub_query "
-        "when available; leave sub_query as the original question for broad scans.\n"
-        "  • issue_agent       — use to search the **knowledge base documents** for known "
-        "issues, failure patterns, equipment alarms, RCA reports, and historical analysis. "
-        "Best used AFTER aries_data has provided lot-specific context so the search is "
-        "more targeted. Do NOT use for fetching live data.\n"
-        "  • sop_agent         — use when the question asks for a procedure, SOP, BKM, "
-        "checklist, work instruction, or manual reference.\n"
-        "  • stains_detective  — use when the question asks to trace back defect origins "
-        "across process images, align process images, run a defect traceback pipeline, "
-        "or analyse stains / particle origins across inspection steps. "
-        "Include any file-system path mentioned by the user verbatim in sub_query.\n"
-        "  • general           — use for greetings, chitchat, capability questions "
-        "(e.g. 'hello', 'what can you do?', 'who are you?'), or any conversational "
-        "query that does not require knowledge-base lookup.\n"
-        "  • reporting         — use when the scratchpad already contains enough "
-        "information to give a complete, accurate answer to the user.\n\n"
-        "ROUTING RULES:\n"
-        "1. For lot-specific queries: aries_data FIRST, then issue_agent if KB context is needed.\n"
-        "2. Do NOT repeat the same agent if its findings are already in the scratchpad.\n"
-        "3. If the scratchpad has data but no KB context and the question needs both, use issue_agent.\n"
-        "4. If the scratchpad already has sufficient data + KB context, go to reporting.\n\n"
-        "Provide a concise sub_query (≤ 20 words) for the chosen agent."
+
+def _budget_exit(state: AgentState) -> Optional[dict]:
+    """Route to reporting once the request time budget is used up, or None."""
+    if not exhausted(state):
+        return None
+    logger.warning(
+        "Orchestrator [iter %d/%d] → reporting (request time budget exhausted)",
+        state.get("iteration", 0) + 1, state.get("max_iterations", 3),
     )
+    return {
+        "next_action": "reporting",
+        "sub_query": state["user_query"],
+        "parallel_actions": [],
+        "iteration": state.get("iteration", 0) + 1,
+        "messages": [
+            AIMessage(content="[Orchestrator → reporting] Time budget exhausted — reporting with the evidence gathered so far.")
+        ],
+    }
 
-    logger.debug("Orchestrator prompt:\n%s", prompt)
 
-    model = get_chat_model(temperature=0).with_structured_output(OrchestratorDecision)
+def _early_exit(state: AgentState) -> Optional[dict]:
+    """Route to reporting when the findings already cover the question, or None."""
+    if not SUFFICIENCY_CHECK or not state.get("findings"):
+        return None
+    user_query = state["user_query"]
+    verdict = check_sufficiency(state, question_entities(state))
+    if not verdict["sufficient"]:
+        logger.debug("Sufficiency check: %s", verdict["reason"])
+        return None
 
-    try:
-        decision: OrchestratorDecision = model.invoke([HumanMessage(content=prompt)])
-    except Exception as e:
-        logger.error("Structured output failed: %s — falling back to reporting", e)
-        return {
-            "next_action": "reporting",
-            "sub_query": user_query,
-            "iteration": iteration + 1,
-            "messages": [AIMessage(content="[Orchestrator] Falling back to reporting.")],
-        }
+    iteration = state.get("iteration", 0)
+    max_iter = state.get("max_iterations", 3)
+    saved = max(0, max_iter - iteration - 1)
+    record_early_exit(saved)
+    logger.info(
+        "Orchestrator [iter %d/%d] → reporting (early exit: %s; up to %d iteration(s) saved)",
+        iteration + 1, max_iter, verdict["reason"], saved,
+    )
+    return {
+        "next_action": "reporting",
+        "sub_query": user_query,
+        "parallel_actions": [],
+        "iteration": iteration + 1,
+        "iterations_saved": saved,
+        "messages": [
+            AIMessage(content=f"[Orchestrator → reporting] Early exit — {verdict['reason']}.")
+        ],
+    }
 
+
+def _routing_messages(state: AgentState) -> list:
+    """Prompt for LLM-based routing; the notes are the bounded scratchpad view."""
+    notes = scratchpad_view(state) or "No findings yet."
+    entities = describe_entities(question_entities(state)) or "none"
+    costs = routing_costs()
+    costs = f"{costs}\n\n" if costs else ""
+    dynamic = (
+        f"USER QUESTION:\n{state['user_query']}\n\n"
+        f"ENTITIES IN THE QUESTION: {entities}\n\n"
+        f"{costs}"
+        f"INVESTIGATION NOTES SO FAR (scratchpad):\n{notes}\n\n"
+        f"CURRENT ITERATION: {state.get('iteration', 0)} of {state.get('max_iterations', 3)} allowed\n\n"
+        "Choose the next action."
+    )
+    logger.debug("Orchestrator prompt (dynamic part):\n%s", dynamic)
+    return build_messages(_SYSTEM_PROMPT, dynamic)
+
+
+def _routing_model():
+    return get_chat_model(temperature=0, node="orchestrator").with_structured_output(
+        OrchestratorDecision, include_raw=True
+    )
+
+
+def _parse_decision(result: dict) -> OrchestratorDecision:
+    record_cache_usage("orchestrator", result.get("raw"))
+    decision: OrchestratorDecision = result.get("parsed")
+    if decision is None:
+        raise ValueError(result.get("parsing_error") or "no structured output returned")
+    return decision
+
+
+def _fallback(state: AgentState, error: Exception) -> dict:
+    logger.error("Structured output failed: %s — falling back to reporting", error)
+    return {
+        "next_action": "reporting",
+        "sub_query": state["user_query"],
+        "parallel_actions": [],
+        "iteration": state.get("iteration", 0) + 1,
+        "messages": [AIMessage(content="[Orchestrator] Falling back to reporting.")],
+    }
+
+
+def _router_update(state: AgentState, prediction: dict) -> dict:
+    action = prediction["action"]
+    return {
+        "next_action": action,
+        "sub_query": state["user_query"],
+        "parallel_actions": [],
+        "iteration": state.get("iteration", 0) + 1,
+        "messages": [
+            AIMessage(
+                content=f"[Orchestrator → {action}] Local intent router "
+                        f"(similarity {prediction['similarity']:.2f})."
+            )
+        ],
+    }
+
+
+def _parallel_tasks(decision: OrchestratorDecision) -> list:
+    """Extra specialists to dispatch with next_action — deduplicated, and only
+    when next_action itself is one of the parallel-safe specialists."""
+    if not PARALLEL_FANOUT or decision.next_action not in PARALLEL_AGENTS:
+        return []
+    tasks, seen = [], {decision.next_action}
+    for task in decision.parallel:
+        if task.agent not in seen:
+            seen.add(task.agent)
+            tasks.append(task.model_dump())
+    return tasks
+
+
+def _decision_update(state: AgentState, decision: OrchestratorDecision) -> dict:
+    iteration = state.get("iteration", 0)
+    parallel = _parallel_tasks(decision)
+    targets = " + ".join([decision.next_action] + [t["agent"] for t in parallel])
     logger.info(
         "Orchestrator [iter %d/%d] → %s | sub_query: %r | reason: %s",
         iteration + 1,
-        max_iter,
-        decision.next_action,
+        state.get("max_iterations", 3),
+        targets,
         decision.sub_query,
         decision.reasoning,
     )
@@ -164,10 +320,60 @@ def orchestrator_node(state: AgentState) -> dict:
     return {
         "next_action": decision.next_action,
         "sub_query": decision.sub_query,
+        "parallel_actions": parallel,
         "iteration": iteration + 1,
         "messages": [
             AIMessage(
-                content=f"[Orchestrator → {decision.next_action}] {decision.reasoning}"
+                content=f"[Orchestrator → {targets}] {decision.reasoning}"
             )
         ],
     }
+
+
+def orchestrator_node(state: AgentState) -> dict:
+    """
+    Reads the current investigation state and decides which specialist(s) to call.
+    """
+    # Compact the scratchpad view here, after any parallel branches have joined
+    compaction = compact_findings(state)
+    state = {**state, **compaction}
+
+    shortcut = _budget_exit(state) or _shortcut(state) or _early_exit(state)
+    if shortcut is not None:
+        return {**compaction, **shortcut}
+
+    start_prefetch(state)
+    prediction = predict_first_hop(state)
+    if prediction is not None and prediction["use"]:
+        return {**compaction, **_router_update(state, prediction)}
+
+    try:
+        decision = _parse_decision(_routing_model().invoke(_routing_messages(state)))
+    except Exception as e:
+        return {**compaction, **_fallback(state, e)}
+    if prediction is not None:
+        record_llm_route(prediction, decision.next_action)
+    return {**compaction, **_decision_update(state, decision)}
+
+
+async def aorchestrator_node(state: AgentState) -> dict:
+    """Async variant of ``orchestrator_node``."""
+    compaction = await acompact_findings(state)
+    state = {**state, **compaction}
+
+    shortcut = _budget_exit(state) or _shortcut(state) or _early_exit(state)
+    if shortcut is not None:
+        return {**compaction, **shortcut}
+
+    start_prefetch(state)
+    prediction = await run_blocking(predict_first_hop, state)
+    if prediction is not None and prediction["use"]:
+        return {**compaction, **_router_update(state, prediction)}
+
+    try:
+        decision = _parse_decision(await bounded(_routing_model().ainvoke(_routing_messages(state)), state))
+    except Exception as e:
+        return {**compaction, **_fallback(state, e)}
+    if prediction is not None:
+        record_llm_route(prediction, decision.next_action)
+    return {**compaction, **_decision_update(state, decision)}
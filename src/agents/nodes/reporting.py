@@ -11,18 +11,30 @@ Adapts citation style based on what data sources contributed:
   - Mixed → include both, clearly separated
 """
 import os
-from pathlib import Path
+from typing import Optional
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 
 from ..llm import get_chat_model
+from ..prompts import GUARDRAILS_BLOCK, build_messages, record_cache_usage
 from ..state import AgentState
 
-_COMPLIANCE_PATH = Path(__file__).resolve().parent.parent / "compliance.md"
-_COMPLIANCE_RULES = _COMPLIANCE_PATH.read_text(encoding="utf-8")
+# Static prefix — shared by every report so the provider's prompt cache can reuse it
+_SYSTEM_PROMPT = (
+    "You are an expert Semiconductor Manufacturing Assistant compiling a final answer.\n"
+    "Use ONLY the investigation notes provided — do not invent information.\n\n"
+    f"{GUARDRAILS_BLOCK}\n"
+    "You MUST NOT generate ASCII art, charts, or diagrams.\n"
+    "Follow the citation rules given with the investigation notes.\n"
+    "---------------------------"
+)
 
 
-def reporting_node(state: AgentState) -> dict:
+_NO_INFORMATION = "I could not find relevant information in the knowledge base to answer your question."
+
+
+def _report_messages(state: AgentState) -> Optional[list]:
+    """Build the report prompt, or None when there are no investigation notes."""
     scratchpad = state.get("scratchpad", "").strip()
     citations = state.get("citations", [])
     image_urls = state.get("image_urls", [])
@@ -84,50 +96,66 @@ def reporting_node(state: AgentState) -> dict:
         panel_md=panel_md,
     )
 
-    system_instruction = (
-        "You are an expert Semiconductor Manufacturing Assistant compiling a final answer.\n"
-        "Use ONLY the investigation notes below — do not invent information.\n\n"
-        "=== COMPLIANCE GUARDRAILS ===\n"
-        f"{_COMPLIANCE_RULES}\n"
-        "=== END GUARDRAILS ===\n\n"
-        f"{citation_rules}"
-        "You MUST NOT generate ASCII art, charts, or diagrams.\n"
-        "---------------------------"
-    )
-
     if not scratchpad:
-        final = "I could not find relevant information in the knowledge base to answer your question."
-    else:
-        # Adapt report instructions to match the data sources
-        cite_instruction = _build_report_cite_instruction(has_kb_docs, has_live_data)
-
-        report_prompt = (
-            f"ORIGINAL QUESTION:\n{state['user_query']}\n\n"
-            f"INVESTIGATION NOTES:\n{scratchpad}\n\n"
-            "Write a comprehensive, well-structured final answer. Include:\n"
-            "1. Direct answer to the question\n"
-            "2. Supporting evidence and key findings\n"
-            f"{cite_instruction}"
-            "4. Recommendations or next steps where applicable\n"
-        )
-        if kb_image_map or panel_md:
-            report_prompt += "Embed any available images inline using the rules in the system prompt."
+        return None
+
+    # Adapt report instructions to match the data sources
+    cite_instruction = _build_report_cite_instruction(has_kb_docs, has_live_data)
+
+    # Citation rules embed per-request links, so they go in the dynamic suffix
+    report_prompt = (
+        f"{citation_rules}\n"
+        f"ORIGINAL QUESTION:\n{state['user_query']}\n\n"
+        f"INVESTIGATION NOTES:\n{scratchpad}\n\n"
+        "Write a comprehensive, well-structured final answer. Include:\n"
+        "1. Direct answer to the question\n"
+        "2. Supporting evidence and key findings\n"
+        f"{cite_instruction}"
+        "4. Recommendations or next steps where applicable\n"
+    )
+    if kb_image_map or panel_md:
+        report_prompt += "Embed any available images inline using the citation rules above."
+    return build_messages(_SYSTEM_PROMPT, report_prompt)
 
-        model = get_chat_model(temperature=0.5)
-        try:
-            response = model.invoke(
-                [HumanMessage(content=system_instruction + "\n\n" + report_prompt)]
-            )
-            final = response.content
-        except Exception as e:
-            final = f"Report generation failed: {e}\n\nRaw notes:\n{scratchpad}"
 
+def _update(final: str) -> dict:
     return {
         "final_answer": final,
         "messages": [AIMessage(content=final)],
     }
 
 
+def reporting_node(state: AgentState) -> dict:
+    messages = _report_messages(state)
+    if messages is None:
+        return _update(_NO_INFORMATION)
+
+    model = get_chat_model(temperature=0.5, node="reporting")
+    try:
+        response = model.invoke(messages)
+        record_cache_usage("reporting", response)
+        final = response.content
+    except Exception as e:
+        final = f"Report generation failed: {e}\n\nRaw notes:\n{state.get('scratchpad', '').strip()}"
+    return _update(final)
+
+
+async def areporting_node(state: AgentState) -> dict:
+    """Async variant of ``reporting_node``."""
+    messages = _report_messages(state)
+    if messages is None:
+        return _update(_NO_INFORMATION)
+
+    model = get_chat_model(temperature=0.5, node="reporting")
+    try:
+        response = await model.ainvoke(messages)
+        record_cache_usage("reporting", response)
+        final = response.content
+    except Exception as e:
+        final = f"Report generation failed: {e}\n\nRaw notes:\n{state.get('scratchpad', '').strip()}"
+    return _update(final)
+
+
 def _build_citation_rules(
     has_kb_docs: bool,
     has_live_data: bool,
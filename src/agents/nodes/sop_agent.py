@@ -4,62 +4,100 @@ SOP / Document Agent node.
 Searches the knowledge base for procedures, BKMs, checklists, and manuals,
 then summarises the relevant steps and appends them to the scratchpad.
 """
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 
+from ..budget import bounded
+from ..executor import run_blocking
 from ..llm import get_chat_model
+from ..prefetch import kb_retrieval
+from ..prompts import build_messages, record_cache_usage
+from ..scratchpad import record_finding, scratchpad_view
 from ..state import AgentState
-from ..tools import retrieve_from_knowledge_base
 
+_SYSTEM_PROMPT = (
+    "You are a Document & SOP Agent specialising in semiconductor manufacturing.\n\n"
+    "You will be given the original question, the search query used, previous "
+    "investigation notes, and the retrieved documents.\n"
+    "Summarise the relevant procedures, best-known methods (BKMs), or "
+    "checklist steps from the retrieved documents. Include:\n"
+    "1. The specific steps or instructions applicable to the question\n"
+    "2. Any warnings, prerequisites, or critical parameters mentioned\n"
+    "3. Document name and page number for each referenced section\n"
+    "Be concise and use numbered lists for steps."
+)
 
-def sop_agent_node(state: AgentState) -> dict:
+
+_NO_CONTEXT = "No relevant SOPs or documents found for this query."
+
+
+def _retrieve(state: AgentState) -> tuple[str, dict]:
     sub_query = state.get("sub_query") or state["user_query"]
-    channel = state.get("channel")
-    iteration = state.get("iteration", 1)
+    return sub_query, kb_retrieval(state, sub_query)
 
-    # 1. Retrieve relevant documents
-    retrieval = retrieve_from_knowledge_base(sub_query, channel=channel, n_results=5)
 
+def _analysis_messages(state: AgentState, sub_query: str, retrieval: dict):
+    """Procedure-focused summary prompt, or None when nothing was retrieved."""
     if not retrieval["context"].strip():
-        finding = "No relevant SOPs or documents found for this query."
-    else:
-        # 2. Summarise with a procedure-focused LLM call
-        analysis_prompt = (
-            "You are a Document & SOP Agent specialising in semiconductor manufacturing.\n\n"
-            f"ORIGINAL QUESTION: {state['user_query']}\n"
-            f"SEARCH QUERY USED: {sub_query}\n\n"
-            f"PREVIOUS INVESTIGATION NOTES:\n{state.get('scratchpad', 'None')}\n\n"
-            "RETRIEVED DOCUMENTS:\n"
-            f"{retrieval['context']}\n\n"
-            "Summarise the relevant procedures, best-known methods (BKMs), or "
-            "checklist steps from the retrieved documents. Include:\n"
-            "1. The specific steps or instructions applicable to the question\n"
-            "2. Any warnings, prerequisites, or critical parameters mentioned\n"
-            "3. Document name and page number for each referenced section\n"
-            "Be concise and use numbered lists for steps."
-        )
-        model = get_chat_model(temperature=0.3)
-        try:
-            response = model.invoke([HumanMessage(content=analysis_prompt)])
-            finding = response.content
-        except Exception as e:
-            finding = f"Analysis failed: {e}"
-
-    # 3. Append to shared scratchpad
-    current = state.get("scratchpad", "")
-    new_scratchpad = (
-        current
-        + f"\n\n--- [SOP Agent — Step {iteration}] ---\n"
-        + finding
+        return None
+    analysis_prompt = (
+        f"ORIGINAL QUESTION: {state['user_query']}\n"
+        f"SEARCH QUERY USED: {sub_query}\n\n"
+        f"PREVIOUS INVESTIGATION NOTES:\n{scratchpad_view(state) or 'None'}\n\n"
+        "RETRIEVED DOCUMENTS:\n"
+        f"{retrieval['context']}\n"
     )
+    return build_messages(_SYSTEM_PROMPT, analysis_prompt)
+
 
+def _update(state: AgentState, recorded: dict, finding: str, retrieval: dict) -> dict:
     return {
-        "scratchpad": new_scratchpad,
-        "retrieved_docs": state.get("retrieved_docs", []) + retrieval["docs"],
-        "image_urls": list(
-            dict.fromkeys(state.get("image_urls", []) + retrieval["images"])
-        ),
-        "citations": state.get("citations", []) + retrieval["citations"],
+        **recorded,
+        "retrieved_docs": retrieval["docs"],
+        "image_urls": retrieval["images"],
+        "citations": retrieval["citations"],
         "messages": [
             AIMessage(content=f"[SOP Agent] {finding[:300]}{'...' if len(finding) > 300 else ''}")
         ],
     }
+
+
+def sop_agent_node(state: AgentState) -> dict:
+    # 1. Retrieve relevant documents
+    sub_query, retrieval = _retrieve(state)
+
+    # 2. Summarise with a procedure-focused LLM call
+    messages = _analysis_messages(state, sub_query, retrieval)
+    evidence = messages is not None
+    if messages is None:
+        finding = _NO_CONTEXT
+    else:
+        model = get_chat_model(temperature=0.3, node="sop_agent")
+        try:
+            response = model.invoke(messages)
+            record_cache_usage("sop_agent", response)
+            finding = response.content
+        except Exception as e:
+            finding, evidence = f"Analysis failed: {e}", False
+
+    # 3. Append to shared scratchpad
+    return _update(state, record_finding(state, "SOP Agent", finding, evidence), finding, retrieval)
+
+
+async def asop_agent_node(state: AgentState) -> dict:
+    """Async variant of ``sop_agent_node`` — retrieval runs on the blocking-I/O executor."""
+    sub_query, retrieval = await run_blocking(_retrieve, state)
+
+    messages = _analysis_messages(state, sub_query, retrieval)
+    evidence = messages is not None
+    if messages is None:
+        finding = _NO_CONTEXT
+    else:
+        model = get_chat_model(temperature=0.3, node="sop_agent")
+        try:
+            response = await bounded(model.ainvoke(messages), state)
+            record_cache_usage("sop_agent", response)
+            finding = response.content
+        except Exception as e:
+            finding, evidence = f"Analysis failed: {e}", False
+
+    return _update(state, record_finding(state, "SOP Agent", finding, evidence), finding, retrieval)
@@ -26,7 +26,12 @@ import re
 from langchain_core.messages import AIMessage
 
 from ...config import TRACEBACK_CLOUD_ROOT
+from ..budget import fits, skipped_note
+from ..entities import query_entities, question_entities
+from ..executor import run_blocking
+from ..jobs import job_progress
 from ..llm import get_chat_model
+from ..scratchpad import record_finding
 from ..state import AgentState
 from ..tools import align_and_preprocess_images, run_defect_traceback
 
@@ -36,9 +41,6 @@ log = logging.getLogger(__name__)
 # Intentionally excludes bare Unix /word patterns which appear in LLM-generated text
 _PATH_RE = re.compile(r'(?:[A-Za-z]:[\\\/]|\\\\)[\w\\/\.\-]+')
 
-# Matches a typical Intel fab lot/VID identifier: U6P22X1603318, U6UQ657500716
-VID_RE = re.compile(r'\b([A-Z][A-Z0-9]{9,19})\b')
-
 _DEFAULT_OUTPUT_DIR = os.path.join("static", "images")
 
 
@@ -56,15 +58,6 @@ def _extract_path(text: str) -> str | None:
     return m.group(0).strip() if m else None
 
 
-def extract_vid(text: str) -> str | None:
-    """Return the first VID/lot-number token found in *text*, or None.
-
-    Exported so the orchestrator can call it for routing decisions.
-    """
-    m = VID_RE.search(text)
-    return m.group(1) if m else None
-
-
 def find_uploads_dir(vid: str) -> str | None:
     """Resolve a VID to its directory of images + CSVs on the cloud share.
 
@@ -81,9 +74,8 @@ def find_uploads_dir(vid: str) -> str | None:
     return None
 
 
-def stains_detective_node(state: AgentState) -> dict:
-    """Runs defect traceback or image alignment based on the current sub_query."""
-    iteration = state.get("iteration", 0)
+def _resolve(state: AgentState) -> tuple[str | None, str, bool]:
+    """Blocking I/O: resolve (uploads_dir, output_dir, alignment_only) for this request."""
     sub_query = state.get("sub_query", "")
     user_query = state.get("user_query", "")
     combined_text = sub_query + " " + user_query
@@ -99,7 +91,8 @@ def stains_detective_node(state: AgentState) -> dict:
         uploads_dir = _extract_path(user_query)
 
     if not uploads_dir:
-        vid = extract_vid(combined_text)
+        vids = query_entities(state)["vids"]
+        vid = vids[0] if vids else None
         if vid:
             uploads_dir = find_uploads_dir(vid)
             if not uploads_dir:
@@ -115,7 +108,7 @@ def stains_detective_node(state: AgentState) -> dict:
     # alignment-only only makes sense when the user explicitly asks for it
     # on an explicit folder path without any traceback intent.
     # ------------------------------------------------------------------
-    vid_in_query = extract_vid(user_query) is not None
+    vid_in_query = bool(question_entities(state)["vids"])
     if vid_in_query or state.get("traceback_uploads_dir"):
         alignment_only = False
     else:
@@ -125,37 +118,31 @@ def stains_detective_node(state: AgentState) -> dict:
         ) and not any(
             kw in lower for kw in ("traceback", "trace back", "origin", "defect origin", "csv")
         )
+    return uploads_dir, output_dir, alignment_only
 
-    # ------------------------------------------------------------------
-    # 3. No directory found — ask the user
-    # ------------------------------------------------------------------
-    if not uploads_dir:
-        model = get_chat_model(temperature=0)
-        clarification = model.invoke([
-            {
-                "role": "system",
-                "content": (
-                    "You are a semiconductor defect analysis assistant. "
-                    "The user wants to run a defect traceback but no lot/VID number was found. "
-                    "Ask them concisely for the VID (e.g. U6P22X1603318) — "
-                    "the system will look it up on the cloud share automatically."
-                ),
-            },
-            {"role": "user", "content": user_query},
-        ])
-        note = f"[Stains Detective] Missing uploads directory — {clarification.content}"
-        log.warning("Stains detective: no uploads_dir or VID found.")
-        return {
-            "scratchpad": (
-                state.get("scratchpad", "")
-                + f"\n\n--- [Stains Detective — Step {iteration}] ---\n{note}"
-            ).strip(),
-            "messages": [AIMessage(content=note)],
-        }
 
-    # ------------------------------------------------------------------
-    # 4. Run the appropriate tool
-    # ------------------------------------------------------------------
+def _clarification_messages(user_query: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a semiconductor defect analysis assistant. "
+                "The user wants to run a defect traceback but no lot/VID number was found. "
+                "Ask them concisely for the VID (e.g. U6P22X1603318) — "
+                "the system will look it up on the cloud share automatically."
+            ),
+        },
+        {"role": "user", "content": user_query},
+    ]
+
+
+def _missing_dir_note(clarification) -> str:
+    log.warning("Stains detective: no uploads_dir or VID found.")
+    return f"[Stains Detective] Missing uploads directory — {clarification.content}"
+
+
+def _run_tool(uploads_dir: str, output_dir: str, alignment_only: bool) -> tuple[str, list, bool]:
+    """Blocking: run alignment or the full traceback and return (note, new image URLs, succeeded)."""
     if alignment_only:
         log.info("Stains detective: alignment-only mode on %s", uploads_dir)
         result = align_and_preprocess_images(uploads_dir, uploads_dir, output_dir)
@@ -174,44 +161,87 @@ def stains_detective_node(state: AgentState) -> dict:
                     f"reproj_p95={info['reproj_p95']} | method={info['method']}"
                 )
             note = "\n".join(lines)
-        new_image_urls = result.get("diagnostics", [])
+        return note, result.get("diagnostics", []), not result.get("error")
 
+    log.info("Stains detective: full traceback on %s", uploads_dir)
+    result = run_defect_traceback(uploads_dir, output_dir, progress_callback=job_progress("stains_detective"))
+    if result.get("error"):
+        note = f"[Stains Detective] Traceback failed: {result['error']}"
     else:
-        log.info("Stains detective: full traceback on %s", uploads_dir)
-        result = run_defect_traceback(uploads_dir, output_dir)
-        if result.get("error"):
-            note = f"[Stains Detective] Traceback failed: {result['error']}"
+        lines = [f"Defect traceback complete (source: {uploads_dir}).\n"]
+        origins = result.get("origin_summary", {})
+        if origins:
+            lines.append("Origin summary:")
+            for defect_id, origin in origins.items():
+                lines.append(f"  • {defect_id} → {origin}")
         else:
-            lines = [f"Defect traceback complete (source: {uploads_dir}).\n"]
-            origins = result.get("origin_summary", {})
-            if origins:
-                lines.append("Origin summary:")
-                for defect_id, origin in origins.items():
-                    lines.append(f"  • {defect_id} → {origin}")
-            else:
-                lines.append("No defect origins identified.")
-            report = result.get("report_text", "")
-            if report:
-                lines.append("\nDetailed report:\n" + report)
-            note = "\n".join(lines)
-        new_image_urls = result.get("output_images", [])
+            lines.append("No defect origins identified.")
+        report = result.get("report_text", "")
+        if report:
+            lines.append("\nDetailed report:\n" + report)
+        note = "\n".join(lines)
+    return note, result.get("output_images", []), not result.get("error")
 
-    # ------------------------------------------------------------------
-    # 5. Update state
-    # ------------------------------------------------------------------
-    scratchpad = state.get("scratchpad", "")
-    scratchpad = (
-        scratchpad + f"\n\n--- [Stains Detective — Step {iteration}] ---\n{note}"
-    ).strip()
 
-    existing_urls: list = state.get("image_urls", [])
-    combined_urls = existing_urls + [u for u in new_image_urls if u not in existing_urls]
+def _finding_text(state: AgentState, note: str) -> str:
+    # "vid=<VID>" for the VID this step looked up — the orchestrator's VID shortcut looks for it
+    vids = query_entities(state)["vids"]
+    return f"(Sources: vid={vids[0]})\n{note}" if vids else note
+
 
+def _update(state: AgentState, recorded: dict, note: str, new_image_urls: list) -> dict:
     log.info("Stains detective complete. Images: %d", len(new_image_urls))
 
     msg = note[:300] + "…" if len(note) > 300 else note
     return {
-        "scratchpad": scratchpad,
-        "image_urls": combined_urls,
-        "messages": [AIMessage(content=f"[Stains Detective — Step {iteration}] {msg}")],
+        **recorded,
+        "image_urls": new_image_urls,
+        "messages": [AIMessage(content=f"[Stains Detective — Step {state.get('iteration', 0)}] {msg}")],
     }
+
+
+def stains_detective_node(state: AgentState) -> dict:
+    """Runs defect traceback or image alignment based on the current sub_query."""
+    uploads_dir, output_dir, alignment_only = _resolve(state)
+
+    # ------------------------------------------------------------------
+    # 3. No directory found — ask the user
+    # ------------------------------------------------------------------
+    if not uploads_dir:
+        model = get_chat_model(temperature=0, node="stains_clarify")
+        note = _missing_dir_note(model.invoke(_clarification_messages(state.get("user_query", ""))))
+        recorded = record_finding(state, "Stains Detective", _finding_text(state, note), evidence=False)
+        return {**recorded, "messages": [AIMessage(content=note)]}
+
+    # ------------------------------------------------------------------
+    # 4. Run the appropriate tool
+    # ------------------------------------------------------------------
+    if not fits("alignment" if alignment_only else "traceback", state):
+        note, new_image_urls, ok = skipped_note("Stains Detective", state), [], False
+    else:
+        note, new_image_urls, ok = _run_tool(uploads_dir, output_dir, alignment_only)
+
+    # ------------------------------------------------------------------
+    # 5. Update state
+    # ------------------------------------------------------------------
+    recorded = record_finding(state, "Stains Detective", _finding_text(state, note), ok)
+    return _update(state, recorded, note, new_image_urls)
+
+
+async def astains_detective_node(state: AgentState) -> dict:
+    """Async variant of ``stains_detective_node`` — directory lookups and the
+    traceback pipeline run on the blocking-I/O executor."""
+    uploads_dir, output_dir, alignment_only = await run_blocking(_resolve, state)
+
+    if not uploads_dir:
+        model = get_chat_model(temperature=0, node="stains_clarify")
+        note = _missing_dir_note(await model.ainvoke(_clarification_messages(state.get("user_query", ""))))
+        recorded = record_finding(state, "Stains Detective", _finding_text(state, note), evidence=False)
+        return {**recorded, "messages": [AIMessage(content=note)]}
+
+    if not fits("alignment" if alignment_only else "traceback", state):
+        note, new_image_urls, ok = skipped_note("Stains Detective", state), [], False
+    else:
+        note, new_image_urls, ok = await run_blocking(_run_tool, uploads_dir, output_dir, alignment_only)
+    recorded = record_finding(state, "Stains Detective", _finding_text(state, note), ok)
+    return _update(state, recorded, note, new_image_urls)
@@ -0,0 +1,204 @@
+"""
+Speculative knowledge-base prefetch.
+
+While the orchestrator waits on its routing call nothing else happens, yet
+most investigations end up in issue_agent or sop_agent searching the
+knowledge base with a query close to the user's question. On the first hop
+of a request the orchestrator calls ``start_prefetch()``, which embeds the
+raw user query and runs the Chroma search on a small dedicated pool
+(KB_PREFETCH_WORKERS), registered under the state's ``request_id``.
+
+``kb_retrieval()`` is what the KB-searching nodes call instead of
+``retrieve_from_knowledge_base``:
+
+  - same question (normalised text match) → the prefetched result
+  - otherwise the sub_query is embedded and compared with the prefetched
+    query embedding; cosine >= KB_PREFETCH_MIN_SIMILARITY → prefetched result
+  - otherwise the prefetch is discarded for this call and a fresh search
+    runs with the sub_query embedding already computed, so a miss costs no
+    extra embedding call
+
+A prefetch still queued behind other requests is cancelled rather than
+waited for. Entries expire after KB_PREFETCH_TTL_S; ``prefetch_stats()``
+reports hits, misses, prefetches nobody used and the retrieval time taken
+off the critical path.
+"""
+import contextvars
+import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from ..config import KB_PREFETCH, KB_PREFETCH_MIN_SIMILARITY, KB_PREFETCH_TTL_S, KB_PREFETCH_WORKERS
+from .budget import remaining
+from .state import AgentState
+from .tools import retrieve_from_knowledge_base
+
+log = logging.getLogger(__name__)
+
+_N_RESULTS = 5
+_MAX_ENTRIES = 256
+
+_pool = ThreadPoolExecutor(max_workers=KB_PREFETCH_WORKERS, thread_name_prefix="kb-prefetch")
+
+_embed_fn = None
+_embed_lock = threading.Lock()
+
+
+def _embed(text: str) -> Optional[list]:
+    """Query embedding with the knowledge base's embedding function, or None on failure."""
+    global _embed_fn
+    with _embed_lock:
+        if _embed_fn is None:
+            from ..models import get_embedding_function
+            _embed_fn = get_embedding_function()
+    try:
+        vector = list(_embed_fn([text])[0])
+    except Exception as e:
+        log.warning("KB prefetch: embedding failed: %s", e)
+        return None
+    # The OpenAI embedding function returns zero vectors when the endpoint fails
+    return vector if any(vector) else None
+
+
+def _cosine(a: list, b: list) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _normalise(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+class _Prefetch:
+    def __init__(self, query: str, channel: Optional[str]):
+        self.query = query
+        self.channel = channel
+        self.created = time.monotonic()
+        self.embedding: Optional[list] = None
+        self.embedded = threading.Event()
+        self.duration = 0.0
+        self.used = False
+        self.future: Optional[Future] = None
+
+    def run(self) -> dict:
+        started = time.perf_counter()
+        try:
+            self.embedding = _embed(self.query)
+        finally:
+            self.embedded.set()
+        retrieval = retrieve_from_knowledge_base(
+            self.query, channel=self.channel, n_results=_N_RESULTS, query_embedding=self.embedding,
+        )
+        self.duration = time.perf_counter() - started
+        return retrieval
+
+
+_lock = threading.Lock()
+_entries: dict[str, _Prefetch] = {}
+_stats = {"started": 0, "hits": 0, "misses": 0, "cancelled": 0, "errors": 0, "unused": 0, "saved_ms": 0.0}
+
+
+def _prune(now: float) -> None:
+    """Drop expired entries, and the oldest ones beyond _MAX_ENTRIES. Caller holds _lock."""
+    for rid in [rid for rid, e in _entries.items() if now - e.created > KB_PREFETCH_TTL_S]:
+        _drop(rid)
+    while len(_entries) >= _MAX_ENTRIES:
+        _drop(next(iter(_entries)))
+
+
+def _drop(request_id: str) -> None:
+    if not _entries.pop(request_id).used:
+        _stats["unused"] += 1
+
+
+def _wait_s(state: AgentState) -> float:
+    left = remaining(state)
+    return KB_PREFETCH_TTL_S if left is None else max(left, 0.0)
+
+
+def start_prefetch(state: AgentState) -> None:
+    """Start the KB search for the user query on the first hop of a request (non-blocking)."""
+    request_id = state.get("request_id")
+    if not KB_PREFETCH or not request_id or state.get("iteration", 0):
+        return
+    with _lock:
+        _prune(time.monotonic())
+        if request_id in _entries:
+            return
+        entry = _entries[request_id] = _Prefetch(state["user_query"], state.get("channel"))
+        _stats["started"] += 1
+    ctx = contextvars.copy_context()
+    entry.future = _pool.submit(ctx.run, entry.run)
+    log.debug("KB prefetch started for request %s", request_id)
+
+
+def _hit(entry: _Prefetch, sub_query: str, state: AgentState, how: str) -> Optional[dict]:
+    waited_from = time.perf_counter()
+    try:
+        retrieval = entry.future.result(timeout=_wait_s(state))
+    except Exception as e:
+        log.warning("KB prefetch failed, searching again: %s", e)
+        with _lock:
+            _stats["errors"] += 1
+        return None
+    saved = max(0.0, entry.duration - (time.perf_counter() - waited_from))
+    with _lock:
+        entry.used = True
+        _stats["hits"] += 1
+        _stats["saved_ms"] += saved * 1000
+    log.info("KB prefetch hit (%s) for %r — %.0fms of retrieval off the critical path", how, sub_query[:80], saved * 1000)
+    return retrieval
+
+
+def kb_retrieval(state: AgentState, sub_query: str) -> dict:
+    """Knowledge-base retrieval for *sub_query*, reusing this request's prefetch when it matches."""
+    channel = state.get("channel")
+    with _lock:
+        entry = _entries.get(state.get("request_id") or "")
+    if entry is None or entry.future is None or entry.channel != channel:
+        return retrieve_from_knowledge_base(sub_query, channel=channel, n_results=_N_RESULTS)
+
+    # Still queued behind other requests' prefetches — searching directly is faster
+    if entry.future.cancel():
+        with _lock:
+            _entries.pop(state["request_id"], None)
+            _stats["cancelled"] += 1
+        return retrieve_from_knowledge_base(sub_query, channel=channel, n_results=_N_RESULTS)
+
+    if _normalise(sub_query) == _normalise(entry.query):
+        retrieval = _hit(entry, sub_query, state, "same query")
+        if retrieval is not None:
+            return retrieval
+        return retrieve_from_knowledge_base(sub_query, channel=channel, n_results=_N_RESULTS)
+
+    sub_embedding = _embed(sub_query)
+    entry.embedded.wait(timeout=_wait_s(state))
+    if sub_embedding is not None and entry.embedding is not None:
+        similarity = _cosine(sub_embedding, entry.embedding)
+        if similarity >= KB_PREFETCH_MIN_SIMILARITY:
+            retrieval = _hit(entry, sub_query, state, f"similarity {similarity:.3f}")
+            if retrieval is not None:
+                return retrieval
+        else:
+            log.info("KB prefetch miss for %r (similarity %.3f)", sub_query[:80], similarity)
+    with _lock:
+        _stats["misses"] += 1
+    return retrieve_from_knowledge_base(
+        sub_query, channel=channel, n_results=_N_RESULTS, query_embedding=sub_embedding,
+    )
+
+
+def prefetch_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = len(_entries)
+    stats["enabled"] = KB_PREFETCH
+    stats["saved_ms"] = round(stats["saved_ms"], 1)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+    return stats
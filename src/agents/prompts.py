@@ -0,0 +1,81 @@
+"""
+Shared prompt assembly for the agent nodes.
+
+Provider-side prompt caching (OpenAI / Azure OpenAI) only reuses an exact,
+byte-identical prefix of at least 1024 tokens. Every node therefore builds its
+messages as:
+
+  SystemMessage — static content only: role, compliance guardrails, tool /
+                  agent descriptions, output rules. Identical on every call.
+  HumanMessage  — dynamic content, last: user question, investigation notes,
+                  retrieved context, iteration counters, citation links.
+
+``record_cache_usage()`` reads ``cached_tokens`` from each response's usage
+metadata so the prefix hit rate can be checked per node.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+log = logging.getLogger(__name__)
+
+_COMPLIANCE_PATH = Path(__file__).resolve().parent / "compliance.md"
+COMPLIANCE_RULES = _COMPLIANCE_PATH.read_text(encoding="utf-8")
+
+GUARDRAILS_BLOCK = (
+    "=== COMPLIANCE GUARDRAILS ===\n"
+    f"{COMPLIANCE_RULES}\n"
+    "=== END GUARDRAILS ===\n"
+)
+
+
+def build_messages(static_prefix: str, dynamic: str) -> list:
+    """Return [system(static prefix), human(dynamic suffix)] for a node call."""
+    return [SystemMessage(content=static_prefix), HumanMessage(content=dynamic)]
+
+
+# ---------------------------------------------------------------------------
+# Cached-token telemetry
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_usage: dict[str, dict] = {}
+
+
+def _cached_tokens(message: Any) -> tuple[int, int]:
+    """Return (input_tokens, cached_tokens) from a LangChain AIMessage."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached is None:
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        input_tokens = input_tokens or token_usage.get("prompt_tokens", 0)
+        cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+    return input_tokens or 0, cached or 0
+
+
+def record_cache_usage(node: str, message: Any) -> None:
+    """Accumulate prompt / cached token counts for *node* from an LLM response."""
+    if message is None:
+        return
+    input_tokens, cached = _cached_tokens(message)
+    with _lock:
+        entry = _usage.setdefault(node, {"calls": 0, "input_tokens": 0, "cached_tokens": 0})
+        entry["calls"] += 1
+        entry["input_tokens"] += input_tokens
+        entry["cached_tokens"] += cached
+    log.debug("%s: %d prompt tokens, %d served from provider cache", node, input_tokens, cached)
+
+
+def prompt_cache_stats() -> dict:
+    """Per-node prompt-cache telemetry with the cached share of input tokens."""
+    with _lock:
+        stats = {node: dict(entry) for node, entry in _usage.items()}
+    for entry in stats.values():
+        entry["cached_ratio"] = (
+            round(entry["cached_tokens"] / entry["input_tokens"], 3) if entry["input_tokens"] else 0.0
+        )
+    return stats
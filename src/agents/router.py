@@ -0,0 +1,266 @@
+"""
+Embedding-based first-hop intent router.
+
+The orchestrator's first step on most requests is an unambiguous choice —
+chit-chat, an SOP lookup, a known-issue search, live lot data, a defect
+traceback — yet it costs a structured-output call on the routing model.
+This router classifies the user query locally instead:
+
+  - a small labelled prototype set per action (``_PROTOTYPES``, or a JSON
+    file at ROUTER_PROTOTYPES_PATH mapping action → example queries)
+  - prototypes are embedded once with the configured embedding function and
+    averaged into one unit-length centroid per action
+  - a query is embedded and assigned to the nearest centroid (cosine)
+
+A prediction is *confident* when its similarity is at least
+ROUTER_MIN_SIMILARITY and beats the runner-up by ROUTER_MIN_MARGIN. Only the
+first hop is routed locally; later hops depend on the scratchpad and stay
+with the LLM.
+
+ROUTER_MODE:
+  off     — never classify
+  shadow  — classify, but always call the LLM and log whether they agree
+  active  — confident predictions skip the LLM; ROUTER_AUDIT_RATE of them
+            still call it so accuracy keeps being measured
+
+Accuracy (agreement with the LLM on audited / shadowed requests) and LLM
+calls saved are logged per decision and exported by ``router_stats()``.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from ..config import (
+    ROUTER_AUDIT_RATE,
+    ROUTER_MIN_MARGIN,
+    ROUTER_MIN_SIMILARITY,
+    ROUTER_MODE,
+    ROUTER_PROTOTYPES_PATH,
+)
+from .state import AgentState
+
+log = logging.getLogger(__name__)
+
+OFF = "off"
+SHADOW = "shadow"
+ACTIVE = "active"
+
+_PROTOTYPES: dict[str, list[str]] = {
+    "general": [
+        "hello",
+        "hi there, how are you?",
+        "what can you do?",
+        "who are you?",
+        "thanks, that was helpful",
+        "what kind of questions can I ask you?",
+        "good morning",
+        "can you help me?",
+    ],
+    "sop_agent": [
+        "what is the SOP for handling a tester alarm?",
+        "show me the procedure to replace a probe card",
+        "what are the steps to requalify a handler after maintenance?",
+        "is there a BKM for cleaning the load board?",
+        "give me the checklist for a tester PM",
+        "where is the work instruction for socket replacement?",
+        "how do I calibrate the thermal head according to the manual?",
+        "what does the spec say about retest limits?",
+    ],
+    "issue_agent": [
+        "why would bin 7 fallout increase after a probe card change?",
+        "what causes intermittent contact failures on the handler?",
+        "have we seen this continuity failure pattern before?",
+        "what is the root cause of high leakage failures at hot test?",
+        "find RCA reports for socket burn issues",
+        "known issues with yield drop after a test program update",
+        "what does alarm E1234 on the handler usually mean?",
+        "why are units failing open/short at final test?",
+    ],
+    "aries_data": [
+        "list the most recent lots",
+        "show me the latest tester alarms",
+        "what is the yield of the lots tested today?",
+        "how is tester HXV042 performing?",
+        "give me an overview of current production activity",
+        "which lots are on hold right now?",
+        "show the bin summary for the last lots on this tester",
+        "what are the recent test results for this product?",
+    ],
+    "stains_detective": [
+        "trace back the defect origins across the process images",
+        "align the inspection images for this wafer",
+        "run the defect traceback pipeline",
+        "where did this stain first appear in the process?",
+        "analyse particle origins across inspection steps",
+        "find which process step introduced these defects",
+        "compare the defect maps between inspection layers",
+        "run traceback on the images in this folder",
+    ],
+}
+
+
+def _load_prototypes() -> dict[str, list[str]]:
+    if not ROUTER_PROTOTYPES_PATH:
+        return _PROTOTYPES
+    try:
+        with open(ROUTER_PROTOTYPES_PATH, encoding="utf-8") as f:
+            prototypes = json.load(f)
+        return {str(action): [str(q) for q in queries] for action, queries in prototypes.items() if queries}
+    except (OSError, ValueError, AttributeError) as e:
+        log.warning("Ignoring ROUTER_PROTOTYPES_PATH %s: %s", ROUTER_PROTOTYPES_PATH, e)
+        return _PROTOTYPES
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class IntentRouter:
+    """Nearest-centroid classifier over query embeddings."""
+
+    def __init__(self, prototypes: dict[str, list[str]], embed: Callable[[list], list],
+                 min_similarity: float, min_margin: float):
+        self._prototypes = prototypes
+        self._embed = embed
+        self._min_similarity = min_similarity
+        self._min_margin = min_margin
+        self._labels: list[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _ensure_centroids(self) -> Optional[np.ndarray]:
+        if self._centroids is not None:
+            return self._centroids
+        with self._lock:
+            if self._centroids is None:
+                labels, texts = [], []
+                for action, queries in self._prototypes.items():
+                    labels.extend([action] * len(queries))
+                    texts.extend(queries)
+                vectors = _unit(np.asarray(self._embed(texts), dtype=np.float32))
+                if not np.any(vectors):
+                    # Embedding endpoint failed (zero vectors) — retry on the next request
+                    log.warning("Intent router: prototype embeddings unavailable")
+                    return None
+                self._labels = list(self._prototypes)
+                label_arr = np.asarray(labels)
+                self._centroids = _unit(np.stack([vectors[label_arr == a].mean(axis=0) for a in self._labels]))
+                log.info("Intent router: %d centroids from %d prototypes", len(self._labels), len(texts))
+        return self._centroids
+
+    def classify(self, query: str) -> Optional[dict]:
+        """Return {"action", "similarity", "margin", "confident", "latency_ms"} or None."""
+        started = time.perf_counter()
+        centroids = self._ensure_centroids()
+        if centroids is None:
+            return None
+        vector = _unit(np.asarray(self._embed([query])[0], dtype=np.float32))
+        if not np.any(vector):
+            return None
+        scores = centroids @ vector
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        return {
+            "action": self._labels[order[0]],
+            "similarity": round(best, 4),
+            "margin": round(margin, 4),
+            "confident": best >= self._min_similarity and margin >= self._min_margin,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "classified": 0,
+    "confident": 0,
+    "llm_calls_saved": 0,
+    "audited": 0,
+    "agreed": 0,
+    "latency_ms": 0.0,
+    "by_action": {},
+}
+
+
+def get_router() -> IntentRouter:
+    """Return the process-wide router (prototype centroids are built on first use)."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            from ..models import get_embedding_function
+            _router = IntentRouter(_load_prototypes(), get_embedding_function(),
+                                   ROUTER_MIN_SIMILARITY, ROUTER_MIN_MARGIN)
+        return _router
+
+
+def predict_first_hop(state: AgentState) -> Optional[dict]:
+    """Classify the user query when this is the first orchestrator hop.
+
+    Returns None when the router is off, this is a later hop, or the
+    embeddings are unavailable. Blocking (one embedding call) — async callers
+    run it on the blocking-I/O executor.
+    """
+    if ROUTER_MODE not in (SHADOW, ACTIVE):
+        return None
+    if state.get("iteration", 0) or state.get("findings"):
+        return None
+    try:
+        prediction = get_router().classify(state["user_query"])
+    except Exception as e:
+        log.warning("Intent router failed: %s", e)
+        return None
+    if prediction is None:
+        return None
+
+    # Decide now whether the LLM runs anyway (shadow / audit sample)
+    prediction["use"] = (
+        ROUTER_MODE == ACTIVE and prediction["confident"] and random.random() >= ROUTER_AUDIT_RATE
+    )
+    with _stats_lock:
+        _stats["classified"] += 1
+        _stats["latency_ms"] += prediction["latency_ms"]
+        if prediction["confident"]:
+            _stats["confident"] += 1
+        if prediction["use"]:
+            _stats["llm_calls_saved"] += 1
+            _stats["by_action"][prediction["action"]] = _stats["by_action"].get(prediction["action"], 0) + 1
+    if prediction["use"]:
+        log.info(
+            "Intent router → %s (similarity %.3f, margin %.3f, %.0fms) — LLM routing call skipped",
+            prediction["action"], prediction["similarity"], prediction["margin"], prediction["latency_ms"],
+        )
+    return prediction
+
+
+def record_llm_route(prediction: dict, llm_action: str) -> None:
+    """Compare a router prediction the LLM also decided on, for accuracy tracking."""
+    agreed = prediction["action"] == llm_action
+    with _stats_lock:
+        _stats["audited"] += 1
+        _stats["agreed"] += int(agreed)
+        audited, total_agreed = _stats["audited"], _stats["agreed"]
+    log.info(
+        "Intent router %s: predicted %s (similarity %.3f, %s), LLM chose %s — accuracy %d/%d",
+        "agrees" if agreed else "DISAGREES",
+        prediction["action"], prediction["similarity"],
+        "confident" if prediction["confident"] else "unsure",
+        llm_action, total_agreed, audited,
+    )
+
+
+def router_stats() -> dict:
+    with _stats_lock:
+        stats = {k: dict(v) if isinstance(v, dict) else v for k, v in _stats.items()}
+    stats["mode"] = ROUTER_MODE
+    stats["accuracy"] = round(stats["agreed"] / stats["audited"], 4) if stats["audited"] else None
+    stats["mean_latency_ms"] = round(stats.pop("latency_ms") / stats["classified"], 1) if stats["classified"] else None
+    return stats
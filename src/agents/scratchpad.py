@@ -0,0 +1,186 @@
+"""
+Structured findings store for the agent loop.
+
+Every specialist step is recorded twice (``record_finding``):
+  - appended to ``scratchpad`` — the full, ever-growing log, kept for the
+    reporting node and for "has agent X already run?" checks
+  - appended to ``findings`` — one {"agent", "step", "text", "evidence"}
+    entry per step
+Both fields have append reducers, so specialists running in parallel
+branches merge their findings instead of overwriting each other.
+
+Orchestrator and specialist prompts use ``scratchpad_view()`` instead of the
+full log. The view is the rolling ``findings_summary`` plus the findings that
+have not been compacted yet. The orchestrator — the single join point after
+a fan-out — calls ``compact_findings()`` each step to keep the view under
+SCRATCHPAD_TOKEN_CAP: the oldest findings (never the most recent
+SCRATCHPAD_KEEP_RECENT) are folded into the summary, either extractively or
+with a cheap LLM call (SCRATCHPAD_COMPACTION=llm).
+
+Prompt size therefore stays bounded as max_iterations grows, instead of
+growing quadratically over the run.
+"""
+import logging
+
+from langchain_core.messages import HumanMessage
+
+from ..config import SCRATCHPAD_COMPACTION, SCRATCHPAD_KEEP_RECENT, SCRATCHPAD_TOKEN_CAP
+from .state import AgentState
+
+log = logging.getLogger(__name__)
+
+# Extractive compaction keeps this many leading lines of each folded finding
+_EXTRACT_LINES = 4
+_EXTRACT_LINE_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/technical text)."""
+    return len(text) // 4
+
+
+def _render(finding: dict) -> str:
+    return f"--- [{finding['agent']} — Step {finding['step']}] ---\n{finding['text']}"
+
+
+def _render_view(summary: str, findings: list) -> str:
+    parts = []
+    if summary:
+        parts.append(f"--- [Summary of earlier findings] ---\n{summary}")
+    parts.extend(_render(f) for f in findings)
+    return "\n\n".join(parts)
+
+
+def scratchpad_view(state: AgentState) -> str:
+    """Bounded view of the investigation notes for orchestrator / agent prompts."""
+    findings = state.get("findings") or []
+    if not findings and not state.get("findings_summary"):
+        # State from before findings were tracked — fall back to the raw log
+        return state.get("scratchpad", "").strip()
+    return _render_view(
+        state.get("findings_summary", ""),
+        findings[state.get("compacted_count", 0):],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------------------
+
+def _extractive_summary(summary: str, folded: list) -> str:
+    lines = [summary] if summary else []
+    for f in folded:
+        kept = [ln.strip()[:_EXTRACT_LINE_CHARS] for ln in f["text"].splitlines() if ln.strip()]
+        lines.append(f"• {f['agent']} (step {f['step']}): " + " | ".join(kept[:_EXTRACT_LINES]))
+    text = "\n".join(lines)
+
+    # The summary itself may use at most half of the cap; drop the oldest bullets first
+    budget_chars = SCRATCHPAD_TOKEN_CAP * 4 // 2
+    while len(text) > budget_chars and "\n" in text:
+        text = text.split("\n", 1)[1]
+    return text[-budget_chars:]
+
+
+def _llm_prompt(summary: str, folded: list) -> list:
+    notes = "\n\n".join(_render(f) for f in folded)
+    prompt = (
+        "Condense these semiconductor investigation notes into a compact summary "
+        f"of at most {SCRATCHPAD_TOKEN_CAP // 2} tokens. Keep every lot ID, "
+        "operation, tester, bin, yield figure, alarm, document/page reference and "
+        "conclusion. Drop prose and repetition.\n\n"
+        f"EXISTING SUMMARY:\n{summary or 'None'}\n\n"
+        f"NOTES TO FOLD IN:\n{notes}"
+    )
+    return [HumanMessage(content=prompt)]
+
+
+def _compact(summary: str, folded: list) -> str:
+    if SCRATCHPAD_COMPACTION == "llm":
+        from .llm import get_chat_model
+
+        try:
+            model = get_chat_model(temperature=0, node="scratchpad_compaction")
+            return str(model.invoke(_llm_prompt(summary, folded)).content).strip()
+        except Exception as e:
+            log.warning("LLM scratchpad compaction failed (%s) — using extractive summary", e)
+    return _extractive_summary(summary, folded)
+
+
+async def _acompact(summary: str, folded: list) -> str:
+    if SCRATCHPAD_COMPACTION == "llm":
+        from .llm import get_chat_model
+
+        try:
+            model = get_chat_model(temperature=0, node="scratchpad_compaction")
+            return str((await model.ainvoke(_llm_prompt(summary, folded))).content).strip()
+        except Exception as e:
+            log.warning("LLM scratchpad compaction failed (%s) — using extractive summary", e)
+    return _extractive_summary(summary, folded)
+
+
+def record_finding(state: AgentState, agent: str, text: str, evidence: bool = True) -> dict:
+    """Return the state update that records a specialist finding.
+
+    ``scratchpad`` holds only the text to append and ``findings`` the new
+    entry — both state fields append. *evidence* is False when the step got
+    no real data (nothing retrieved, source errors, skipped or failed run).
+    """
+    step = state.get("iteration", 0)
+    return {
+        "scratchpad": f"\n\n--- [{agent} — Step {step}] ---\n{text}",
+        "findings": [{"agent": agent, "step": step, "text": text, "evidence": evidence}],
+    }
+
+
+def _plan_compaction(state: AgentState) -> tuple[list, int]:
+    """Return (live findings, number of oldest live findings to fold into the summary)."""
+    findings = list(state.get("findings") or [])
+    summary = state.get("findings_summary", "")
+    live = findings[state.get("compacted_count", 0):]
+    if estimate_tokens(_render_view(summary, live)) <= SCRATCHPAD_TOKEN_CAP:
+        return live, 0
+
+    # Fold the oldest live findings until the view fits, keeping the most recent ones verbatim
+    foldable = max(0, len(live) - SCRATCHPAD_KEEP_RECENT)
+    n_fold = 0
+    while n_fold < foldable:
+        n_fold += 1
+        rest = live[n_fold:]
+        if estimate_tokens(_render_view(summary, rest)) + SCRATCHPAD_TOKEN_CAP // 4 <= SCRATCHPAD_TOKEN_CAP:
+            break
+    return live, n_fold
+
+
+def _compaction_update(state: AgentState, live: list, n_fold: int, new_summary: str) -> dict:
+    log.info(
+        "Scratchpad compaction: folded %d finding(s) into summary (%s), view %d → %d tokens",
+        n_fold, SCRATCHPAD_COMPACTION,
+        estimate_tokens(_render_view(state.get("findings_summary", ""), live)),
+        estimate_tokens(_render_view(new_summary, live[n_fold:])),
+    )
+    return {
+        "findings_summary": new_summary,
+        "compacted_count": state.get("compacted_count", 0) + n_fold,
+    }
+
+
+def compact_findings(state: AgentState) -> dict:
+    """Fold old findings into the summary when the view exceeds the cap.
+
+    Returns the ``findings_summary`` / ``compacted_count`` update, or {} when
+    the view already fits.
+    """
+    live, n_fold = _plan_compaction(state)
+    if n_fold == 0:
+        return {}
+    new_summary = _compact(state.get("findings_summary", ""), live[:n_fold])
+    return _compaction_update(state, live, n_fold, new_summary)
+
+
+async def acompact_findings(state: AgentState) -> dict:
+    """Async variant of ``compact_findings`` — LLM compaction uses ``ainvoke``."""
+    live, n_fold = _plan_compaction(state)
+    if n_fold == 0:
+        return {}
+    new_summary = await _acompact(state.get("findings_summary", ""), live[:n_fold])
+    return _compaction_update(state, live, n_fold, new_summary)
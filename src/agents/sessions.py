@@ -0,0 +1,146 @@
+"""
+Multi-turn agent sessions backed by a LangGraph checkpointer.
+
+Without a session every /agentic-chat call starts from an empty AgentState,
+so a follow-up about the same lot re-runs every Aries, Lamas and KB query.
+With a ``session_id`` the graph runs on a thread of an AsyncSqliteSaver
+checkpointer (AGENT_CHECKPOINT_PATH), which persists the state after every
+node:
+
+  - follow-up turns send only the per-turn fields (question, iteration
+    counter, routing fields — ``_TURN_FIELDS``); the scratchpad, findings,
+    retrieved docs, citations and images of earlier turns stay in the
+    checkpoint, so the orchestrator's shortcuts and the sufficiency check
+    reuse that evidence instead of querying the sources again
+  - ``resume=True`` continues an interrupted run from its last completed
+    node (input None)
+
+Turns of one session run one at a time (``session_lock``): two overlapping
+requests on the same thread would otherwise both start from the same
+checkpoint and interleave their scratchpad and findings writes.
+
+The plain ``agent_graph`` (no checkpointer) stays in use for stateless
+requests and scripts.
+"""
+import asyncio
+import contextlib
+import logging
+import weakref
+from typing import Optional
+
+from ..config import AGENT_CHECKPOINT_PATH
+from .graph import build_graph
+
+log = logging.getLogger(__name__)
+
+# Fields reset at the start of every turn; everything else accumulates
+_TURN_FIELDS = (
+    "user_query",
+    "request_id",
+    "channel",
+    "sub_query",
+    "next_action",
+    "parallel_actions",
+    "final_answer",
+    "iteration",
+    "iterations_saved",
+    "max_iterations",
+    "deadline",
+    "traceback_uploads_dir",
+    "traceback_output_dir",
+)
+
+_graph = None
+_conn = None
+_lock = asyncio.Lock()
+# One lock per session with a turn running or waiting — entries go away with the last holder
+_turn_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def get_session_graph():
+    """Return the checkpointed graph, opening the SQLite checkpoint store on first use."""
+    global _graph, _conn
+    async with _lock:
+        if _graph is None:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+            _conn = await aiosqlite.connect(AGENT_CHECKPOINT_PATH)
+            saver = AsyncSqliteSaver(_conn)
+            await saver.setup()
+            _graph = build_graph(checkpointer=saver)
+            log.info("Agent sessions: checkpoints in %s", AGENT_CHECKPOINT_PATH)
+    return _graph
+
+
+async def close_sessions() -> None:
+    global _graph, _conn
+    async with _lock:
+        if _conn is not None:
+            await _conn.close()
+        _graph = _conn = None
+
+
+@contextlib.asynccontextmanager
+async def session_lock(session_id: str):
+    """Hold *session_id* for one turn; a concurrent turn on it waits until this one ends."""
+    lock = _turn_locks.get(session_id)
+    if lock is None:
+        lock = _turn_locks[session_id] = asyncio.Lock()
+    if lock.locked():
+        log.info("Session %s: waiting for the previous turn to finish", session_id)
+    async with lock:
+        yield
+
+
+def session_config(session_id: str) -> dict:
+    return {"configurable": {"thread_id": session_id}}
+
+
+async def session_input(graph, session_id: str, initial_state: dict, resume: bool = False) -> tuple[Optional[dict], dict]:
+    """Graph input for this turn of *session_id*, plus the prior list lengths.
+
+    Returns (input, prior) where input is None to resume an interrupted run,
+    the full *initial_state* for a new session, or only the per-turn fields
+    for a follow-up. *prior* maps citations / image_urls to how many items
+    earlier turns left in the state, so responses can show this turn's.
+
+    Raises ValueError when *resume* is set but the session has no pending run.
+    """
+    snapshot = await graph.aget_state(session_config(session_id))
+    values = snapshot.values or {}
+    prior = {key: len(values.get(key) or []) for key in ("citations", "image_urls")}
+    if resume:
+        if not snapshot.next:
+            raise ValueError(f"Session {session_id!r} has no interrupted run to resume")
+        log.info("Session %s: resuming at %s", session_id, ", ".join(snapshot.next))
+        return None, prior
+    if not values:
+        return initial_state, prior
+    log.info(
+        "Session %s: follow-up turn with %d prior finding(s)",
+        session_id, len(values.get("findings") or []),
+    )
+    return {key: initial_state[key] for key in _TURN_FIELDS if key in initial_state}, prior
+
+
+async def session_info(session_id: str) -> Optional[dict]:
+    """Summary of a stored session, or None when it does not exist."""
+    graph = await get_session_graph()
+    snapshot = await graph.aget_state(session_config(session_id))
+    values = snapshot.values or {}
+    if not values:
+        return None
+    return {
+        "session_id": session_id,
+        "last_query": values.get("user_query", ""),
+        "interrupted_at": list(snapshot.next),
+        "iteration": values.get("iteration", 0),
+        "findings": [
+            {"agent": f.get("agent"), "step": f.get("step")} for f in values.get("findings") or []
+        ],
+        "retrieved_docs": len(values.get("retrieved_docs") or []),
+        "citations": len(values.get("citations") or []),
+        "images": len(values.get("image_urls") or []),
+        "updated_at": (snapshot.created_at or ""),
+    }
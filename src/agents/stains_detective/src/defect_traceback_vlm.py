@@ -26,6 +26,7 @@ import io
 import json
 import base64
 import logging
+import time
 from openai import OpenAI
 from openai import AzureOpenAI
 import ssl # This is for ssl verification (or you could just go ask for the certs :P)
@@ -63,6 +64,55 @@ C_BLACK   = (0, 0, 0)
 VLM_CONTEXT_PAD = 60
 VLM_BATCH_LIMIT = 50   # max images per VLM request (incl. OG reference)
 
+# Image encoding — when running inside the Skybot host project, crops go through
+# the shared image payload service (downscaled, JPEG/WebP, cached by hash).
+# Standalone builds fall back to lossless PNG.
+try:
+    from ....llm.image_payload import encode_image as _encode_image
+except ImportError:
+    _encode_image = None
+
+# Token / latency accounting and the shared rate limiter — only available
+# inside the Skybot host project
+try:
+    from ....llm.usage import record_llm_call as _record_llm_call
+except ImportError:
+    _record_llm_call = None
+
+try:
+    from ....llm.rate_limit import rate_limit_hooks as _rate_limit_hooks
+except ImportError:
+    _rate_limit_hooks = None
+
+
+def _client_event_hooks() -> dict:
+    return _rate_limit_hooks() if _rate_limit_hooks is not None else {}
+
+
+def _record_usage(model_name: str, resp, started: float, error: bool = False) -> None:
+    if _record_llm_call is None:
+        return
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    _record_llm_call(
+        "stains_traceback_vlm",
+        model_name,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0),
+        completion_tokens=getattr(usage, "completion_tokens", 0),
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        latency_s=time.perf_counter() - started,
+        error=error,
+    )
+
+
+def _pil_to_data_url(img, detail: str = "high") -> str:
+    if _encode_image is not None:
+        return _encode_image(img, detail=detail)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
 # VLM Service Layer
 class VLMService:
     """Abstract base for VLM providers."""
@@ -74,7 +124,8 @@ class OpenAIVLM(VLMService):
                  base_url: Optional[str] = None):
         proxy_url = os.getenv("PROXY_HTTPS") or os.getenv("PROXY_HTTP") or os.getenv("HTTPS_PROXY") or os.getenv("HTTP_PROXY")
         transport = httpx.HTTPTransport(proxy=proxy_url) if proxy_url else None
-        http_client = httpx.Client(transport=transport) if transport else None
+        event_hooks = _client_event_hooks()
+        http_client = httpx.Client(transport=transport, event_hooks=event_hooks) if transport or event_hooks else None
         kwargs: dict = {"api_key": api_key}
         if base_url:
             kwargs["base_url"] = base_url
@@ -84,9 +135,7 @@ class OpenAIVLM(VLMService):
         self.model_name = model_name
 
     def _pil_to_b64(self, img) -> str:
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+        return _pil_to_data_url(img)
 
     def analyze_images(self, images: list, prompt: str) -> str:
         content = [{"type": "text", "text": prompt}]
@@ -95,14 +144,17 @@ class OpenAIVLM(VLMService):
                 "type": "image_url",
                 "image_url": {"url": self._pil_to_b64(img), "detail": "high"}
             })
+        started = time.perf_counter()
         try:
             resp = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[{"role": "user", "content": content}],
                 temperature=0.2,
             )
+            _record_usage(self.model_name, resp, started)
             return resp.choices[0].message.content
         except Exception as e:
+            _record_usage(self.model_name, None, started, error=True)
             log.error(f"OpenAI VLM error: {e}")
             return f"ERROR: {e}"
 
@@ -120,14 +172,12 @@ class AzureOpenAIVLM(VLMService):
             api_key=api_key,
             azure_endpoint=azure_endpoint,
             api_version=api_version,
-            http_client=httpx.Client(transport=transport),
+            http_client=httpx.Client(transport=transport, event_hooks=_client_event_hooks()),
         )
         self.model_name = model_name
 
     def _pil_to_b64(self, img) -> str:
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+        return _pil_to_data_url(img)
 
     def analyze_images(self, images: list, prompt: str) -> str:
         content = [{"type": "text", "text": prompt}]
@@ -136,13 +186,16 @@ class AzureOpenAIVLM(VLMService):
                 "type": "image_url",
                 "image_url": {"url": self._pil_to_b64(img), "detail": "high"}
             })
+        started = time.perf_counter()
         try:
             resp = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[{"role": "user", "content": content}],
             )
+            _record_usage(self.model_name, resp, started)
             return resp.choices[0].message.content
         except Exception as e:
+            _record_usage(self.model_name, None, started, error=True)
             log.error(f"Azure OpenAI VLM error: {e}")
             return f"ERROR: {e}"
 
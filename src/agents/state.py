@@ -1,6 +1,34 @@
+import operator
 from typing import TypedDict, Annotated, Optional
 from langgraph.graph.message import add_messages
 
+from .entities import Entities
+
+
+def _ref_key(item):
+    """Dedup key — the chunk ID for chunk refs and citations, the value itself otherwise."""
+    if isinstance(item, dict):
+        return item.get("chunk_id") or tuple(sorted((k, str(v)) for k, v in item.items()))
+    return item
+
+
+def merge_unique(existing: list, new: list) -> list:
+    """Append *new* items whose key is not already present, preserving order.
+
+    Cost is linear in the list length and the list is only copied when
+    something new arrives, so re-retrieving the same chunks across
+    iterations neither grows the state nor copies it.
+    """
+    existing = existing or []
+    seen = {_ref_key(item) for item in existing}
+    added = []
+    for item in new or []:
+        key = _ref_key(item)
+        if key not in seen:
+            seen.add(key)
+            added.append(item)
+    return existing + added if added else existing
+
 
 class AgentState(TypedDict):
     # Conversation history — add_messages merges lists instead of overwriting
@@ -8,30 +36,55 @@ class AgentState(TypedDict):
 
     # The original question from the user
     user_query: str
+    # Unique per turn — keys per-request side state such as the KB prefetch
+    request_id: str
 
     # Optional ChromaDB channel filter
     channel: Optional[str]
 
-    # Running investigation notes written by each agent step
-    scratchpad: str
+    # Lots, operations, testers, VIDs, time window and site named in the
+    # question — set once per turn by the entities node (see entities.py)
+    entities: Optional[Entities]
+
+    # Running investigation notes written by each agent step (full log,
+    # used by reporting). Prompts use scratchpad.scratchpad_view() instead.
+    # Nodes return only the text to append, so parallel branches merge.
+    scratchpad: Annotated[str, operator.add]
+
+    # Structured findings — one {"agent", "step", "text", "evidence"} per
+    # specialist step; evidence is False when the step got no real data.
+    # findings[:compacted_count] are folded into findings_summary (written
+    # only by the orchestrator, after parallel branches have joined).
+    findings: Annotated[list, operator.add]
+    findings_summary: str
+    compacted_count: int
 
     # Focused query the orchestrator sends to the next agent
     sub_query: str
 
-    # Accumulated across all agent calls
-    retrieved_docs: list
-    image_urls: list
-    citations: list
+    # Accumulated across all agent calls — nodes return only their new items,
+    # deduplicated by chunk ID. retrieved_docs holds lightweight chunk refs
+    # ({chunk_id, source, page, type}) — the text stays out of the state
+    retrieved_docs: Annotated[list, merge_unique]
+    image_urls: Annotated[list, merge_unique]
+    citations: Annotated[list, merge_unique]
 
     # Routing decision set by the orchestrator each iteration
-    # Values: "issue_agent" | "sop_agent" | "reporting"
+    # Values: "issue_agent" | "sop_agent" | "aries_data" | "stains_detective" | "general" | "reporting"
     next_action: str
+    # Extra specialists dispatched concurrently with next_action via Send —
+    # [{"agent": ..., "sub_query": ...}]; empty for a single dispatch
+    parallel_actions: list
 
     # Set by the reporting node — the user-facing final answer
     final_answer: str
 
     # Loop control
     iteration: int
+    # Remaining iteration budget when the sufficiency check ended the loop early
+    iterations_saved: int
+    # Absolute request deadline (epoch seconds, None = unbounded) — see budget.py
+    deadline: Optional[float]
     max_iterations: int
 
     # Stains detective — set when the orchestrator routes to stains_detective_agent.
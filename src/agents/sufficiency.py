@@ -0,0 +1,132 @@
+"""
+Early-exit sufficiency check.
+
+Without it the orchestrator loops — one routing call plus one specialist
+call per hop — until the routing model picks reporting or max_iterations is
+reached, even when the first specialist already answered the question.
+
+``check_sufficiency()`` is a heuristic over the findings recorded so far
+(no LLM call). The investigation is sufficient when:
+  - at least one specialist produced a useful finding: one recorded with
+    real data (the node's ``evidence`` flag) that is not a failure or a
+    "nothing found" note
+  - every entity in the question (each lot ID, operation, tester and VID of
+    the ``entities`` index) appears in the evidence of the useful findings —
+    the "(Sources: …)" header aries_data writes does not count
+  - every intent detected in the question (procedure, live data, cause /
+    known issue, defect traceback) is covered by a useful finding from the
+    specialist that serves it; a lot or tester ID always implies live data
+
+When it passes, the orchestrator routes straight to reporting. The
+iterations saved are the remaining iteration budget at that point — an upper
+bound on the hops the loop could still have made — and are reported per
+request (``iterations_saved`` in the state) and process-wide
+(``sufficiency_stats()``).
+"""
+import logging
+import re
+import threading
+
+from .entities import Entities
+from .state import AgentState
+
+log = logging.getLogger(__name__)
+
+# intent → (question pattern, agent label whose finding covers it)
+_INTENTS = {
+    "procedure": (
+        re.compile(r"\b(sop|procedures?|bkm|checklist|work instructions?|manual|spec)\b", re.IGNORECASE),
+        "SOP Agent",
+    ),
+    "live_data": (
+        re.compile(r"\b((?:recent|latest|current|today'?s?) (?:lots?|alarms?|yield|test results?)|"
+                   r"lot status|on hold)\b", re.IGNORECASE),
+        "Aries Data Agent",
+    ),
+    "cause": (
+        re.compile(r"\b(why|root cause|causes?|caused|rca|known issues?|failure (?:mode|pattern)s?)\b",
+                   re.IGNORECASE),
+        "Issue Agent",
+    ),
+    "traceback": (
+        re.compile(r"\b(trace ?back|defect origins?|align|stains?|particles?)\b", re.IGNORECASE),
+        "Stains Detective",
+    ),
+}
+
+# Header aries_data puts before its evidence — names the entities it queried,
+# whether or not they returned anything
+_SOURCES_RE = re.compile(r"^\(Sources: [^)]*\)\s*")
+
+# Backstop for findings recorded without an evidence flag
+_UNHELPFUL_RE = re.compile(
+    r"^(?:\[Stains Detective\]\s*)?"
+    r"(?:(?:LLM )?analysis failed|alignment failed|traceback failed|no relevant|skipped|"
+    r"missing uploads directory)",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+_stats = {"checks": 0, "early_exits": 0, "iterations_saved": 0}
+
+
+def evidence_text(finding: dict) -> str:
+    """The finding text without the aries_data "(Sources: …)" header."""
+    return _SOURCES_RE.sub("", finding.get("text", "").strip(), count=1)
+
+
+def useful_finding(finding: dict) -> bool:
+    """Whether *finding* carries evidence — recorded with real data and not
+    empty, a failure or a \"nothing found\" note."""
+    if not finding.get("evidence", True):
+        return False
+    text = evidence_text(finding)
+    return bool(text) and not _UNHELPFUL_RE.match(text)
+
+
+def check_sufficiency(state: AgentState, entities: Entities) -> dict:
+    """Return {"sufficient": bool, "reason": str} for the findings so far.
+
+    *entities* is the entity index of the user question; the findings must
+    mention every lot, operation, tester and VID in it.
+    """
+    useful = [f for f in state.get("findings") or [] if useful_finding(f)]
+    with _lock:
+        _stats["checks"] += 1
+    if not useful:
+        return {"sufficient": False, "reason": "no useful findings yet"}
+
+    text = "\n".join(evidence_text(f) for f in useful).lower()
+    identifiers = entities["lots"] + entities["operations"] + entities["testers"] + entities["vids"]
+    missing = [e for e in identifiers if e.lower() not in text]
+    if missing:
+        return {"sufficient": False, "reason": f"findings do not mention {', '.join(missing)}"}
+
+    covered = {f.get("agent") for f in useful}
+    query = state["user_query"]
+    intents = [
+        (intent, agent) for intent, (pattern, agent) in _INTENTS.items()
+        if pattern.search(query)
+        or (intent == "live_data" and (entities["lots"] or entities["testers"]))
+    ]
+    # Findings carried over from earlier session turns only count when the new
+    # question names something concrete for them to cover
+    if state.get("iteration", 0) == 0 and not intents and not identifiers:
+        return {"sufficient": False, "reason": "nothing in the question to match prior findings against"}
+    uncovered = [intent for intent, agent in intents if agent not in covered]
+    if uncovered:
+        return {"sufficient": False, "reason": f"no findings for {', '.join(uncovered)}"}
+
+    agents = ", ".join(sorted(a for a in covered if a))
+    return {"sufficient": True, "reason": f"findings from {agents} cover the question"}
+
+
+def record_early_exit(iterations_saved: int) -> None:
+    with _lock:
+        _stats["early_exits"] += 1
+        _stats["iterations_saved"] += iterations_saved
+
+
+def sufficiency_stats() -> dict:
+    with _lock:
+        return dict(_stats)
@@ -5,18 +5,28 @@ Extracts and centralises the ChromaDB query + hybrid image retrieval
 logic that previously lived inside RAGEngine.query(). Both the existing
 RAGEngine and the new agent nodes can import from here.
 
+Retrieved chunks travel through the graph state (and session checkpoints)
+as lightweight references (``chunk_ref``); their text only goes into the
+prompt context of the specialist that retrieved them.
+
 Also exposes:
   - align_and_preprocess_images: aligns process images to an OG reference
   - run_defect_traceback: full VLM-assisted defect origin traceback pipeline
   - retrieve_lot_unit_info: fetches lot & unit XML from the network share
+
+Lot/unit XML, Aries and recent-lot lookups go through the shared tool result
+cache (src/tools/cache.py), so repeated calls from different nodes or
+concurrent requests reuse one backend call.
 """
 import logging
 import os
 import re
+import time
 from typing import Optional
 
 from ..storage.vectordb import get_vector_db
-from ..config import LOT_UNIT_DIR
+from ..config import LOT_UNIT_DIR, TOOL_CACHE_ARIES_WINDOW, TOOL_CACHE_LAMAS_TTL, TOOL_CACHE_XML_TTL
+from ..tools.cache import cached_tool_call
 
 log = logging.getLogger(__name__)
 
@@ -25,21 +35,29 @@ def retrieve_from_knowledge_base(
     query: str,
     channel: Optional[str] = None,
     n_results: int = 5,
+    query_embedding: Optional[list] = None,
 ) -> dict:
     """
     Queries ChromaDB and performs hybrid image retrieval for matching pages.
 
+    *query_embedding*, when the caller already embedded *query*, is sent
+    instead of the text so the query is not embedded twice.
+
     Returns:
         {
             "context": str,        # formatted text for LLM prompt
-            "docs":    list[dict], # raw {text, metadata} pairs
+            "docs":    list[dict], # chunk refs {chunk_id, source, page, type}
             "images":  list[str],  # /static/images/<filename> URLs
-            "citations": list[dict]
+            "citations": list[dict] # chunk metadata + chunk_id
         }
     """
     collection = get_vector_db()
 
-    query_kwargs: dict = {"query_texts": [query], "n_results": n_results}
+    query_kwargs: dict = {"n_results": n_results}
+    if query_embedding is not None:
+        query_kwargs["query_embeddings"] = [query_embedding]
+    else:
+        query_kwargs["query_texts"] = [query]
     if channel:
         query_kwargs["where"] = {"channel": channel}
 
@@ -55,10 +73,11 @@ def retrieve_from_knowledge_base(
     if results["documents"]:
         for i, doc in enumerate(results["documents"][0]):
             meta = results["metadatas"][0][i]
+            chunk_id = results["ids"][0][i]
             source_tag = f"[Source: {meta.get('source', 'Unknown')}, Page {meta.get('page', '?')}]"
             context_parts.append(f"\n--- {source_tag} ---\n{doc}")
-            docs.append({"text": doc, "metadata": meta})
-            citations.append(meta)
+            docs.append(chunk_ref(chunk_id, meta))
+            citations.append({**meta, "chunk_id": chunk_id})
 
             # Track text-bearing pages for hybrid image lookup
             if meta.get("type") == "text":
@@ -103,6 +122,16 @@ def retrieve_from_knowledge_base(
     }
 
 
+def chunk_ref(chunk_id: str, meta: dict) -> dict:
+    """Lightweight state reference to a knowledge-base chunk (no text)."""
+    return {
+        "chunk_id": chunk_id,
+        "source": meta.get("source"),
+        "page": meta.get("page"),
+        "type": meta.get("type"),
+    }
+
+
 def get_image_url_from_metadata(meta: dict) -> Optional[str]:
     if meta.get("type") == "image_cad" and meta.get("image_path"):
         return f"/static/images/{os.path.basename(meta['image_path'])}"
@@ -226,24 +255,20 @@ class _LangChainVLM:
     settings — the LangChain client is already known to reach the endpoint.
     """
 
+    def __init__(self, detail: str = "high"):
+        self.detail = detail
+
     def analyze_images(self, images: list, prompt: str) -> str:
-        import base64
-        import io as _io
         from langchain_core.messages import HumanMessage
+        from ..llm.image_payload import image_content_part
         from .llm import get_chat_model
 
         content: list = [{"type": "text", "text": prompt}]
         for img in images:
-            buf = _io.BytesIO()
-            img.save(buf, format="PNG")
-            b64 = base64.b64encode(buf.getvalue()).decode()
-            content.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{b64}", "detail": "high"},
-            })
+            content.append(image_content_part(img, detail=self.detail))
 
         try:
-            llm = get_chat_model(temperature=0.2)
+            llm = get_chat_model(temperature=0.2, node="stains_vlm")
             response = llm.invoke([HumanMessage(content=content)])
             return str(response.content)
         except Exception as exc:
@@ -255,6 +280,7 @@ def run_defect_traceback(
     uploads_dir: str,
     output_dir: str,
     ref_image_key: Optional[str] = None,
+    progress_callback=None,
 ) -> dict:
     """Run the full VLM-assisted defect origin traceback pipeline.
 
@@ -271,6 +297,8 @@ def run_defect_traceback(
         output_dir:     Where traceback panels and the text report are written.
         ref_image_key:  Filename of the OG image to use as anchor (auto-selects
                         FRAME2 when None).
+        progress_callback: Optional callable(step, total, message) called as
+                        each pipeline stage starts.
 
     Returns:
         {
@@ -289,6 +317,7 @@ def run_defect_traceback(
         uploads_dir=uploads_dir,
         outdir=output_dir,
         ref_image_key=ref_image_key,
+        progress_callback=progress_callback,
         vlm=_LangChainVLM(),
     )
 
@@ -337,6 +366,7 @@ def run_defect_traceback(
 def query_unit_test_aries(
     lot: Optional[str] = None,
     operation: Optional[str] = None,
+    lots: Optional[list] = None,
     tester_id: Optional[str] = None,
     visual_id: Optional[str] = None,
     interface_bin: Optional[int] = None,
@@ -347,6 +377,9 @@ def query_unit_test_aries(
 ) -> dict:
     """Query unit test data from Aries Oracle database.
 
+    *lots* queries several lots in one round trip (``v0.lot IN (...)``);
+    each row's LOT column says which lot it belongs to.
+
     Returns:
         {
             "records": list[dict],   # row dicts from the query
@@ -369,6 +402,8 @@ def query_unit_test_aries(
     params: dict = {"row_limit": row_limit}
     if lot:
         params["lot"] = lot
+    if lots:
+        params["lots"] = sorted(lots)
     if operation:
         params["operation"] = operation
     if tester_id:
@@ -384,18 +419,34 @@ def query_unit_test_aries(
     if device_end_date_time:
         params["device_end_date_time"] = device_end_date_time
 
-    try:
-        result = tool.execute(params)
-        records = result.get("data", [])
-        return {"records": records, "count": len(records), "error": None}
-    except Exception as e:
-        return {"records": [], "count": 0, "error": f"Aries query failed: {e}"}
+    def _call() -> dict:
+        try:
+            result = tool.execute(params)
+            records = result.get("data", [])
+            return {"records": records, "count": len(records), "error": None}
+        except Exception as e:
+            return {"records": [], "count": 0, "error": f"Aries query failed: {e}"}
+
+    # Identical queries inside one time window share a result
+    window = int(time.time() // TOOL_CACHE_ARIES_WINDOW) if TOOL_CACHE_ARIES_WINDOW > 0 else None
+    return cached_tool_call("aries", params, _call, ttl=TOOL_CACHE_ARIES_WINDOW, version=window)
 
 
 # ---------------------------------------------------------------------------
 # Lot & Unit info tools  (XML from network share)
 # ---------------------------------------------------------------------------
 
+def _xml_mtimes(lot_dir: str) -> Optional[list]:
+    """mtimes of the lot/unit XML files — the cache version for a lot folder."""
+    mtimes = []
+    for name in ("lotinfo.xml", "unitinfo.xml"):
+        try:
+            mtimes.append(os.path.getmtime(os.path.join(lot_dir, name)))
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
 def retrieve_lot_unit_info(
     lot_id: str,
     operation: str,
@@ -405,6 +456,8 @@ def retrieve_lot_unit_info(
 
     Searches ``{base_dir}/{lot_id}_{operation}/`` for the XML files and
     returns compact, token-efficient summaries ready for LLM prompts.
+    Results are cached until either XML file changes (mtime) or
+    TOOL_CACHE_XML_TTL expires.
 
     Returns:
         {
@@ -413,13 +466,23 @@ def retrieve_lot_unit_info(
             "error":        str or None,
         }
     """
+    lot_dir = os.path.join(base_dir or LOT_UNIT_DIR, f"{lot_id}_{operation}")
+    return cached_tool_call(
+        "lot_unit_xml",
+        {"lot_dir": lot_dir},
+        lambda: _read_lot_unit_info(lot_dir),
+        ttl=TOOL_CACHE_XML_TTL,
+        version=_xml_mtimes(lot_dir),
+        # Partial results are fine — a file appearing later changes the version
+        cacheable=lambda r: bool(r["lot_summary"] or r["unit_summary"]),
+    )
+
+
+def _read_lot_unit_info(lot_dir: str) -> dict:
     from ..extractors.xml import XMLExtractor
     from ..tools.lot_info_tool import format_lot_info
     from ..tools.unit_info_tool import format_unit_info
 
-    search_dir = base_dir or LOT_UNIT_DIR
-    lot_dir = os.path.join(search_dir, f"{lot_id}_{operation}")
-
     if not os.path.isdir(lot_dir):
         return {
             "lot_summary": "",
@@ -525,6 +588,19 @@ def _list_recent_lots_aries(n: int = 10) -> dict:
 def list_recent_lots(
     n: int = 10,
     base_dir: Optional[str] = None,
+) -> dict:
+    """Cached wrapper around ``_list_recent_lots`` (short TTL, TOOL_CACHE_LAMAS_TTL)."""
+    return cached_tool_call(
+        "recent_lots",
+        {"n": n, "base_dir": base_dir},
+        lambda: _list_recent_lots(n, base_dir),
+        ttl=TOOL_CACHE_LAMAS_TTL,
+    )
+
+
+def _list_recent_lots(
+    n: int = 10,
+    base_dir: Optional[str] = None,
 ) -> dict:
     """List the most recently modified lot folders and parse their summaries.
 
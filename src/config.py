@@ -19,6 +19,54 @@ OPENAI_ENDPOINT = os.getenv("OPENAI_ENDPOINT", None)
 OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION", None)
 OPENAI_REGION = os.getenv("OPENAI_REGION", None) # Technically not needed since the endpoint should include the region but just in case :))
 
+# --- Per-node model tiering ---
+# Model (Azure: deployment) used by each get_chat_model(node=...) caller.
+# Routing, chit-chat, clarification and note compaction default to FAST_MODEL;
+# analysis and the final report stay on OPENAI_MODEL. Leave FAST_MODEL unset to
+# run every node on OPENAI_MODEL. Any entry can be overridden with <NODE>_MODEL.
+FAST_MODEL = os.getenv("FAST_MODEL", "") or OPENAI_MODEL
+NODE_MODELS = {
+    "orchestrator": os.getenv("ORCHESTRATOR_MODEL", FAST_MODEL),
+    "general": os.getenv("GENERAL_MODEL", FAST_MODEL),
+    "stains_clarify": os.getenv("STAINS_CLARIFY_MODEL", FAST_MODEL),
+    "scratchpad_compaction": os.getenv("SCRATCHPAD_COMPACTION_MODEL", FAST_MODEL),
+    "issue_agent": os.getenv("ISSUE_AGENT_MODEL", OPENAI_MODEL),
+    "sop_agent": os.getenv("SOP_AGENT_MODEL", OPENAI_MODEL),
+    "aries_data": os.getenv("ARIES_DATA_MODEL", OPENAI_MODEL),
+    "stains_vlm": os.getenv("STAINS_VLM_MODEL", OPENAI_MODEL),
+    "reporting": os.getenv("REPORTING_MODEL", OPENAI_MODEL),
+}
+
+# --- LLM HTTP connection pool ---
+# One pooled, keep-alive httpx client (sync + async) is shared by every
+# OpenAI / Azure OpenAI caller in the process. HTTP/2 needs the `h2` package.
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "90"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+
+# --- LLM rate limiter ---
+# Shared by every OpenAI / Azure OpenAI request in the process. Set these to
+# the deployment quota (0 = unlimited). Batch traffic (ingestion) only draws on
+# the buckets while more than LLM_RATE_BATCH_RESERVE of capacity is left.
+LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_RATE_BATCH_RESERVE = float(os.getenv("LLM_RATE_BATCH_RESERVE", "0.2"))
+LLM_RATE_COMPLETION_ESTIMATE = int(os.getenv("LLM_RATE_COMPLETION_ESTIMATE", "512"))
+
+# --- LLM response cache (opt-in) ---
+# Exact-match cache keyed by model, temperature, normalised messages and image
+# hashes. Only safe for deterministic workloads (routing, regression runs).
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.getcwd(), "llm_cache.sqlite"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+# --- LLM usage accounting ---
+# Optional JSON price table (USD per 1M tokens) overriding the built-in one, e.g.
+# {"my-gpt4o-deployment": {"input": 2.5, "cached_input": 1.25, "output": 10.0}}
+LLM_PRICING_JSON = os.getenv("LLM_PRICING_JSON", "")
+
 VLM_MODEL = OPENAI_MODEL
 CHAT_MODEL = VLM_MODEL
 # --- Embedding Configuration ---
@@ -27,8 +75,77 @@ CHAT_MODEL = VLM_MODEL
 OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 LOCAL_EMBEDDING_MODEL  = os.getenv("LOCAL_EMBEDDING_MODEL",  "all-MiniLM-L6-v2")
 EMBEDDING_MODEL = OPENAI_EMBEDDING_MODEL
+# --- Multimodal image payloads ---
+# Images are downscaled to the model's effective resolution and re-encoded
+# before upload. VLM_IMAGE_FORMAT: JPEG | WEBP | PNG.
+# VLM_IMAGE_DETAIL: "low" (single 512px tile), "high" (768px short side) or "auto".
+VLM_IMAGE_FORMAT = os.getenv("VLM_IMAGE_FORMAT", "JPEG").upper()
+VLM_IMAGE_QUALITY = int(os.getenv("VLM_IMAGE_QUALITY", "85"))
+VLM_IMAGE_DETAIL = os.getenv("VLM_IMAGE_DETAIL", "auto").lower()
+VLM_IMAGE_CACHE_SIZE = int(os.getenv("VLM_IMAGE_CACHE_SIZE", "256"))
 # --- VLM Ingestion Toggle ---
 ENABLE_VLM_INGESTION = os.getenv("ENABLE_VLM_INGESTION", "true").lower() == "true"
+# --- Agent scratchpad compaction ---
+# Prompts see a bounded view of the investigation notes; older findings are
+# folded into a summary once the view exceeds the cap.
+# SCRATCHPAD_COMPACTION: "extractive" (no LLM call) | "llm"
+SCRATCHPAD_TOKEN_CAP = int(os.getenv("SCRATCHPAD_TOKEN_CAP", "3000"))
+SCRATCHPAD_KEEP_RECENT = int(os.getenv("SCRATCHPAD_KEEP_RECENT", "2"))
+SCRATCHPAD_COMPACTION = os.getenv("SCRATCHPAD_COMPACTION", "extractive").lower()
+# --- Async request path ---
+# Async graph nodes run blocking I/O (Chroma, Oracle, Lamas, network share,
+# traceback pipeline) on a shared thread pool of this size.
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+# --- Agent sessions ---
+# LangGraph checkpoint store for multi-turn /agentic-chat sessions (session_id)
+AGENT_CHECKPOINT_PATH = os.getenv("AGENT_CHECKPOINT_PATH", os.path.join(os.getcwd(), "agent_sessions.sqlite"))
+# --- Request time budget ---
+# Default per-request deadline for /agentic-chat (0 = unbounded); the last
+# REPORT_RESERVE_S seconds are kept for the reporting node.
+REQUEST_BUDGET_S = float(os.getenv("REQUEST_BUDGET_S", "180"))
+REPORT_RESERVE_S = float(os.getenv("REPORT_RESERVE_S", "20"))
+# --- Background agent jobs ---
+# POST /agentic-chat/jobs runs investigations off the request: at most
+# AGENT_JOB_WORKERS graphs run at once and AGENT_JOB_MAX_PENDING jobs may be
+# queued or running; finished jobs stay pollable for AGENT_JOB_TTL_S.
+# A job's default time budget is AGENT_JOB_BUDGET_S (0 = unbounded).
+AGENT_JOB_WORKERS = int(os.getenv("AGENT_JOB_WORKERS", "4"))
+AGENT_JOB_MAX_PENDING = int(os.getenv("AGENT_JOB_MAX_PENDING", "32"))
+AGENT_JOB_TTL_S = float(os.getenv("AGENT_JOB_TTL_S", "3600"))
+AGENT_JOB_BUDGET_S = float(os.getenv("AGENT_JOB_BUDGET_S", "900"))
+# --- Cost-aware routing ---
+# Give the routing model recent p50 / p95 latency and success rate per
+# specialist (last AGENT_COST_WINDOW runs) and the currently degraded data
+# sources, so it prefers the cheaper of several adequate paths.
+COST_AWARE_ROUTING = os.getenv("COST_AWARE_ROUTING", "true").lower() == "true"
+AGENT_COST_WINDOW = int(os.getenv("AGENT_COST_WINDOW", "50"))
+# --- Parallel agent fan-out ---
+# Let the orchestrator dispatch independent specialists (e.g. aries_data and
+# issue_agent for a lot query) in the same step instead of one after another.
+PARALLEL_FANOUT = os.getenv("PARALLEL_FANOUT", "true").lower() == "true"
+# --- Early-exit sufficiency check ---
+# Route straight to reporting once the findings cover the question's entities
+# and intents, instead of spending another routing + specialist hop.
+SUFFICIENCY_CHECK = os.getenv("SUFFICIENCY_CHECK", "true").lower() == "true"
+# --- Local intent router ---
+# First-hop routing by nearest-centroid classification of the query embedding.
+# ROUTER_MODE: "off" | "shadow" (classify + log agreement, always call the LLM)
+#            | "active" (confident predictions skip the LLM routing call)
+ROUTER_MODE = os.getenv("ROUTER_MODE", "active").lower()
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.40"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.04"))
+# Fraction of confident predictions still sent to the LLM to measure accuracy
+ROUTER_AUDIT_RATE = float(os.getenv("ROUTER_AUDIT_RATE", "0.05"))
+# Optional JSON file {action: [example queries]} replacing the built-in prototypes
+ROUTER_PROTOTYPES_PATH = os.getenv("ROUTER_PROTOTYPES_PATH", "")
+# --- Speculative knowledge-base prefetch ---
+# Start the KB search for the raw user query while the orchestrator routes;
+# issue_agent / sop_agent reuse it when their sub_query is the same question
+# (identical text, or query-embedding cosine >= KB_PREFETCH_MIN_SIMILARITY).
+KB_PREFETCH = os.getenv("KB_PREFETCH", "true").lower() == "true"
+KB_PREFETCH_MIN_SIMILARITY = float(os.getenv("KB_PREFETCH_MIN_SIMILARITY", "0.90"))
+KB_PREFETCH_TTL_S = float(os.getenv("KB_PREFETCH_TTL_S", "300"))
+KB_PREFETCH_WORKERS = int(os.getenv("KB_PREFETCH_WORKERS", "4"))
 # --- ChromaDB Configuration ---
 CHROMA_PERSIST_DIR = os.path.join(os.getcwd(), "chroma_db")
 COLLECTION_NAME = "semicon_knowledge_base"
@@ -57,6 +174,30 @@ ARIES_DB_USER = os.getenv("ARIES_DB_USER", "")
 ARIES_DB_PASSWORD = os.getenv("ARIES_DB_PASSWORD", "")
 ARIES_DB_DSN = os.getenv("ARIES_DB_DSN", "vn.aries")
 
+# --- Tool result cache ---
+# Shared across graph nodes and concurrent requests (see src/tools/cache.py).
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512"))
+TOOL_CACHE_XML_TTL = float(os.getenv("TOOL_CACHE_XML_TTL", "3600"))        # also keyed by file mtime
+TOOL_CACHE_ARIES_WINDOW = float(os.getenv("TOOL_CACHE_ARIES_WINDOW", "300"))  # seconds per time bucket
+TOOL_CACHE_LAMAS_TTL = float(os.getenv("TOOL_CACHE_LAMAS_TTL", "60"))
+
+# --- Tool execution (src/tools/base_tool.py) ---
+# _run executes on a worker pool so timeouts are enforced; retries back off
+# exponentially with full jitter, capped at TOOL_RETRY_MAX_DELAY_S.
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+TOOL_RETRY_MAX_DELAY_S = float(os.getenv("TOOL_RETRY_MAX_DELAY_S", "30"))
+# Per-tool circuit breaker: after TOOL_BREAKER_FAILURES consecutive failures
+# calls fail fast for TOOL_BREAKER_RESET_S, then one probe call is let through.
+TOOL_BREAKER_FAILURES = int(os.getenv("TOOL_BREAKER_FAILURES", "3"))
+TOOL_BREAKER_RESET_S = float(os.getenv("TOOL_BREAKER_RESET_S", "60"))
+
+# --- Production data agent ---
+# Lot XML, Lamas and Aries are fetched concurrently; sources still running
+# after this many seconds are left out of the analysis.
+DATA_SOURCE_DEADLINE_S = float(os.getenv("DATA_SOURCE_DEADLINE_S", "90"))
+DATA_SOURCE_WORKERS = int(os.getenv("DATA_SOURCE_WORKERS", "8"))
+
 # --- Stains Detective — Cloud share for pre-existing traceback results ---
 # Folder layout: TRACEBACK_CLOUD_ROOT\{VID}\  (contains OG images, process images, CSVs)
 # Override via .env: TRACEBACK_CLOUD_ROOT=\\server\share\path
@@ -0,0 +1,152 @@
+"""
+Process-wide pooled HTTP clients for OpenAI / Azure OpenAI traffic.
+
+Every SDK client (LangChain chat models, OpenAIService, embeddings) is built
+on top of these shared httpx clients so TLS sessions and keep-alive
+connections are reused across graph nodes, iterations and requests instead
+of being re-established per call. Both clients also meter every request
+through the shared rate limiter (src/llm/rate_limit.py).
+
+``set_transport_wrapper()`` routes both clients through a wrapping httpx
+transport instead (benchmarks/graph_replay.py records or replays LLM and
+embedding traffic with it).
+
+Connection reuse is measured with httpcore trace hooks:
+  requests         — HTTP requests sent through the pool
+  new_connections  — TCP connects (each one is a fresh TLS handshake on https)
+  reused           — requests served on an already-open connection
+"""
+import logging
+import ssl
+import threading
+from typing import Callable, Optional
+
+import httpx
+
+from ..config import (
+    LLM_HTTP2,
+    LLM_HTTP_TIMEOUT,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+)
+from .rate_limit import rate_limit_hooks
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_transport_wrapper: Optional[Callable] = None
+
+_stats = {"requests": 0, "new_connections": 0, "tls_handshakes": 0}
+
+
+# ---------------------------------------------------------------------------
+# Connection-reuse metrics
+# ---------------------------------------------------------------------------
+
+def _record_trace(event_name: str) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        with _lock:
+            _stats["new_connections"] += 1
+    elif event_name == "connection.start_tls.complete":
+        with _lock:
+            _stats["tls_handshakes"] += 1
+
+
+def _sync_trace(event_name: str, info: dict) -> None:
+    _record_trace(event_name)
+
+
+async def _async_trace(event_name: str, info: dict) -> None:
+    _record_trace(event_name)
+
+
+def _on_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = _sync_trace
+    with _lock:
+        _stats["requests"] += 1
+
+
+async def _on_async_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = _async_trace
+    with _lock:
+        _stats["requests"] += 1
+
+
+def pool_stats() -> dict:
+    """Return request / connection counters and the connection reuse ratio."""
+    with _lock:
+        stats = dict(_stats)
+    stats["reused"] = max(0, stats["requests"] - stats["new_connections"])
+    stats["reuse_ratio"] = round(stats["reused"] / stats["requests"], 3) if stats["requests"] else 0.0
+    stats["http2"] = LLM_HTTP2
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Client factories
+# ---------------------------------------------------------------------------
+
+def _client_kwargs() -> dict:
+    return {
+        "verify": ssl.create_default_context(),
+        "timeout": httpx.Timeout(LLM_HTTP_TIMEOUT, connect=10.0),
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _build(client_cls, trace_hook, is_async: bool):
+    kwargs = _client_kwargs()
+    hooks = rate_limit_hooks(is_async)
+    # Count the request before the limiter may hold it back
+    kwargs["event_hooks"] = {"request": [trace_hook] + hooks["request"], "response": hooks["response"]}
+    if _transport_wrapper is not None:
+        transport_cls = httpx.AsyncHTTPTransport if is_async else httpx.HTTPTransport
+        inner = transport_cls(verify=kwargs.pop("verify"), limits=kwargs.pop("limits"))
+        return client_cls(transport=_transport_wrapper(inner, is_async), **kwargs)
+    if LLM_HTTP2:
+        try:
+            return client_cls(http2=True, **kwargs)
+        except ImportError:
+            log.warning("LLM_HTTP2 is enabled but the 'h2' package is missing — using HTTP/1.1")
+    return client_cls(**kwargs)
+
+
+def set_transport_wrapper(wrapper: Optional[Callable]) -> None:
+    """Build the pooled clients on ``wrapper(inner_transport, is_async)``; None restores the default.
+
+    Models and SDK clients keep the client they were built with, so set this
+    before the first LLM or embedding call.
+    """
+    global _transport_wrapper, _sync_client, _async_client
+    with _lock:
+        _transport_wrapper = wrapper
+        _sync_client = _async_client = None
+
+
+def get_http_client() -> httpx.Client:
+    """Return the shared synchronous pooled client."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = _build(httpx.Client, _on_request, is_async=False)
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared asynchronous pooled client.
+
+    Pooled connections belong to the event loop that opened them — this is
+    meant for the single uvicorn loop, not for ad-hoc ``asyncio.run`` calls.
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = _build(httpx.AsyncClient, _on_async_request, is_async=True)
+        return _async_client
@@ -0,0 +1,221 @@
+"""
+Image payload service for multimodal prompts.
+
+Every image sent to a vision model goes through here so that it is:
+  1. Downscaled to the resolution the model actually looks at
+       low  → fits in a single 512x512 tile
+       high → fits in 2048x2048, then the short side is capped at 768
+       auto → same bound as high (the provider picks the tile count)
+  2. Re-encoded as JPEG / WebP at a tuned quality instead of lossless PNG
+  3. Cached as a ready-to-send data URL keyed by the image content hash
+
+Anything larger than the effective resolution is resized server-side anyway,
+so the extra pixels only cost upload size and time-to-first-token.
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+from PIL import Image
+
+from ..config import (
+    VLM_IMAGE_CACHE_SIZE,
+    VLM_IMAGE_DETAIL,
+    VLM_IMAGE_FORMAT,
+    VLM_IMAGE_QUALITY,
+)
+
+log = logging.getLogger(__name__)
+
+_LOW_MAX_SIDE = 512
+_HIGH_MAX_LONG_SIDE = 2048
+_HIGH_MAX_SHORT_SIDE = 768
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+_VALID_DETAILS = ("low", "high", "auto")
+
+
+class ImageRef:
+    """Lazy reference to an image file on disk.
+
+    Lets callers put an image into a prompt without decoding it — on a cache
+    hit the file is only read to hash it, never opened by PIL.
+    """
+
+    def __init__(self, path: str, detail: Optional[str] = None):
+        self.path = path
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return f"ImageRef({self.path!r}, detail={self.detail!r})"
+
+
+ImageInput = Union[Image.Image, ImageRef, str]
+
+
+# ---------------------------------------------------------------------------
+# Encoded data-URL cache
+# ---------------------------------------------------------------------------
+
+_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def cache_stats() -> dict:
+    """Return hit/miss counters and the total raw vs encoded payload bytes."""
+    with _cache_lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def _cache_get(key: tuple) -> Optional[str]:
+    with _cache_lock:
+        url = _cache.get(key)
+        if url is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        return url
+
+
+def _cache_put(key: tuple, url: str) -> None:
+    with _cache_lock:
+        _cache[key] = url
+        _cache.move_to_end(key)
+        while len(_cache) > VLM_IMAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _resolve_detail(detail: Optional[str]) -> str:
+    detail = (detail or VLM_IMAGE_DETAIL).lower()
+    return detail if detail in _VALID_DETAILS else "auto"
+
+
+def target_size(width: int, height: int, detail: str) -> tuple[int, int]:
+    """Return the (width, height) the model effectively sees for *detail*."""
+    if detail == "low":
+        scale = min(1.0, _LOW_MAX_SIDE / max(width, height))
+    else:
+        scale = min(1.0, _HIGH_MAX_LONG_SIDE / max(width, height))
+        short_side = min(width, height) * scale
+        if short_side > _HIGH_MAX_SHORT_SIDE:
+            scale *= _HIGH_MAX_SHORT_SIDE / short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def image_hash(image: ImageInput) -> str:
+    """Content hash of an image — file bytes for paths, pixel data for PIL images."""
+    h = hashlib.sha1()
+    if isinstance(image, (ImageRef, str)):
+        path = image.path if isinstance(image, ImageRef) else image
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+    else:
+        h.update(f"{image.mode}:{image.size}".encode())
+        h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def _prepare(img: Image.Image, fmt: str) -> Image.Image:
+    """Convert to a mode the target encoder accepts (JPEG has no alpha)."""
+    if fmt == "JPEG":
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            rgba = img.convert("RGBA")
+            flat = Image.new("RGB", rgba.size, (255, 255, 255))
+            flat.paste(rgba, mask=rgba.split()[-1])
+            return flat
+        if img.mode not in ("RGB", "L"):
+            return img.convert("RGB")
+    elif img.mode not in ("RGB", "RGBA", "L"):
+        return img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    return img
+
+
+def _encode(img: Image.Image, detail: str, fmt: str, quality: int) -> tuple[str, int]:
+    w, h = target_size(img.width, img.height, detail)
+    if (w, h) != img.size:
+        img = img.resize((w, h), Image.LANCZOS)
+    img = _prepare(img, fmt)
+
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    elif fmt == "WEBP":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
+    data = buf.getvalue()
+    b64 = base64.b64encode(data).decode("ascii")
+    return f"data:{_MIME_TYPES[fmt]};base64,{b64}", len(data)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def encode_image(
+    image: ImageInput,
+    detail: Optional[str] = None,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+) -> str:
+    """Return a downscaled, compressed base64 data URL for *image*.
+
+    Args:
+        image:   PIL image, ImageRef, or a filesystem path.
+        detail:  "low" | "high" | "auto" — defaults to VLM_IMAGE_DETAIL.
+        fmt:     "JPEG" | "WEBP" | "PNG" — defaults to VLM_IMAGE_FORMAT.
+        quality: Encoder quality (JPEG/WebP) — defaults to VLM_IMAGE_QUALITY.
+    """
+    if isinstance(image, ImageRef) and detail is None:
+        detail = image.detail
+    detail = _resolve_detail(detail)
+    fmt = (fmt or VLM_IMAGE_FORMAT).upper()
+    if fmt not in _MIME_TYPES:
+        fmt = "JPEG"
+    quality = quality or VLM_IMAGE_QUALITY
+
+    key = (image_hash(image), detail, fmt, quality)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    if isinstance(image, (ImageRef, str)):
+        path = image.path if isinstance(image, ImageRef) else image
+        raw_size = os.path.getsize(path)
+        with Image.open(path) as img:
+            img.load()
+            url, out_size = _encode(img, detail, fmt, quality)
+    else:
+        raw_size = image.width * image.height * len(image.getbands())
+        url, out_size = _encode(image, detail, fmt, quality)
+
+    with _cache_lock:
+        _stats["bytes_in"] += raw_size
+        _stats["bytes_out"] += out_size
+    log.debug("Encoded image %s → %s/%s, %d → %d bytes", key[0][:10], fmt, detail, raw_size, out_size)
+
+    _cache_put(key, url)
+    return url
+
+
+def image_content_part(image: ImageInput, detail: Optional[str] = None) -> dict:
+    """Build an OpenAI ``image_url`` content part for *image*."""
+    if isinstance(image, ImageRef) and detail is None:
+        detail = image.detail
+    detail = _resolve_detail(detail)
+    return {
+        "type": "image_url",
+        "image_url": {"url": encode_image(image, detail=detail), "detail": detail},
+    }
@@ -0,0 +1,319 @@
+"""
+Process-wide rate limiter for OpenAI / Azure OpenAI traffic.
+
+Ingestion VLM calls, embeddings, agent LLM calls and Stains Detective VLM
+batches all share one deployment quota. Every request is metered through a
+single limiter with two token buckets:
+  - requests per minute  (LLM_RATE_LIMIT_RPM, 0 = unlimited)
+  - tokens per minute    (LLM_RATE_LIMIT_TPM, 0 = unlimited)
+
+Token cost is estimated from the request body before it is sent (prompt
+characters / 4, a flat cost per inline image, plus max_tokens or
+LLM_RATE_COMPLETION_ESTIMATE for the completion).
+
+Priority lanes:
+  interactive — default; chat and agent requests
+  batch       — ingestion (``priority_lane("batch")``); may only draw on the
+                buckets while more than LLM_RATE_BATCH_RESERVE of capacity is
+                left, and always yields to waiting interactive requests
+
+A 429 response pauses every lane until its ``Retry-After`` /
+``retry-after-ms`` has elapsed, or, when the header is missing, for an
+exponential backoff that resets on the next success. The SDK's own retry of
+the 429 then waits in the limiter instead of hammering the deployment.
+
+The limiter is wired in through httpx event hooks (``rate_limit_hooks()``),
+installed on the shared pooled clients in src/llm/http_pool.py and on the
+traceback VLM's own clients.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
+from ..config import (
+    LLM_RATE_BATCH_RESERVE,
+    LLM_RATE_COMPLETION_ESTIMATE,
+    LLM_RATE_LIMIT_RPM,
+    LLM_RATE_LIMIT_TPM,
+)
+
+log = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_IMAGE_TOKENS = 765          # a high-detail 1024px image tile set
+_MAX_BACKOFF_S = 60.0
+_POLL_S = 0.25               # upper bound on a single sleep while waiting
+_MIN_WAIT_S = 0.01           # shorter waits are lock overhead, not throttling
+
+_DATA_URL_RE = re.compile(r"data:image/[\w.+-]+;base64,[A-Za-z0-9+/=]+")
+
+_lane: ContextVar[str] = ContextVar("llm_rate_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def priority_lane(lane: str):
+    """Send LLM requests made inside this block through *lane*."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """Estimate the token cost (prompt + completion) of an OpenAI request body."""
+    if not body:
+        return 1
+    text = body.decode("utf-8", errors="ignore")
+    text, n_images = _DATA_URL_RE.subn("", text)
+    completion = LLM_RATE_COMPLETION_ESTIMATE
+    try:
+        payload = json.loads(text)
+        if isinstance(payload, dict):
+            completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or completion
+            if "input" in payload and "messages" not in payload:
+                completion = 0   # embeddings
+    except ValueError:
+        pass
+    return max(1, len(text) // 4 + n_images * _IMAGE_TOKENS + int(completion))
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``capacity`` per minute."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        if self.unlimited:
+            return
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_for(self, cost: float, floor: float) -> float:
+        """Seconds until *cost* can be taken while leaving at least *floor* in the bucket."""
+        if self.unlimited:
+            return 0.0
+        # A single oversized request is admitted once the bucket is full
+        needed = min(cost + floor, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self._rate
+
+    def take(self, cost: float) -> None:
+        if not self.unlimited:
+            self.level -= min(cost, self.capacity)
+
+
+class RateLimiter:
+    """RPM + TPM token-bucket limiter with priority lanes and 429 back-off."""
+
+    def __init__(self, rpm: int, tpm: int, batch_reserve: float):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._batch_reserve = batch_reserve
+        self._paused_until = 0.0
+        self._consecutive_429 = 0
+        self._interactive_waiting = 0
+        self._stats = {
+            "acquired": {INTERACTIVE: 0, BATCH: 0},
+            "waited": {INTERACTIVE: 0, BATCH: 0},
+            "wait_seconds": {INTERACTIVE: 0.0, BATCH: 0.0},
+            "throttled_429": 0,
+        }
+
+    # -- admission ----------------------------------------------------------
+
+    def _try_take(self, tokens: int, lane: str) -> float:
+        """Take capacity and return 0, or return how long to wait before retrying."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if lane == BATCH and self._interactive_waiting:
+            return _POLL_S
+
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        reserve = self._batch_reserve if lane == BATCH else 0.0
+        wait = max(
+            self._requests.wait_for(1, reserve * self._requests.capacity),
+            self._tokens.wait_for(tokens, reserve * self._tokens.capacity),
+        )
+        if wait > 0:
+            return wait
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        return 0.0
+
+    def _begin(self, lane: str) -> None:
+        if lane != BATCH:
+            with self._lock:
+                self._interactive_waiting += 1
+
+    def _end(self, lane: str, waited: float) -> None:
+        with self._lock:
+            if lane != BATCH:
+                self._interactive_waiting -= 1
+            key = lane if lane in self._stats["acquired"] else INTERACTIVE
+            self._stats["acquired"][key] += 1
+            if waited > _MIN_WAIT_S:
+                self._stats["waited"][key] += 1
+                self._stats["wait_seconds"][key] += waited
+        if waited > 1.0:
+            log.info("LLM rate limiter: %s request waited %.1fs", lane, waited)
+
+    def acquire(self, tokens: int, lane: Optional[str] = None) -> float:
+        """Block until the request may be sent; returns the time spent waiting."""
+        lane = lane or current_lane()
+        started = time.monotonic()
+        self._begin(lane)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_take(tokens, lane)
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, _POLL_S))
+        finally:
+            waited = time.monotonic() - started
+            self._end(lane, waited)
+        return waited
+
+    async def aacquire(self, tokens: int, lane: Optional[str] = None) -> float:
+        """Async variant of ``acquire`` — waits without blocking the event loop."""
+        lane = lane or current_lane()
+        started = time.monotonic()
+        self._begin(lane)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_take(tokens, lane)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, _POLL_S))
+        finally:
+            waited = time.monotonic() - started
+            self._end(lane, waited)
+        return waited
+
+    # -- feedback -----------------------------------------------------------
+
+    def on_response(self, response: httpx.Response) -> None:
+        if response.status_code != 429:
+            if self._consecutive_429:
+                with self._lock:
+                    self._consecutive_429 = 0
+            return
+
+        delay = _retry_after(response.headers)
+        with self._lock:
+            self._consecutive_429 += 1
+            self._stats["throttled_429"] += 1
+            if delay is None:
+                delay = min(_MAX_BACKOFF_S, 2.0 ** self._consecutive_429)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        log.warning("LLM endpoint returned 429 — pausing all lanes for %.1fs", delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            stats = {k: dict(v) if isinstance(v, dict) else v for k, v in self._stats.items()}
+            stats["paused_for_s"] = round(max(0.0, self._paused_until - now), 2)
+            stats["rpm_limit"] = int(self._requests.capacity)
+            stats["tpm_limit"] = int(self._tokens.capacity)
+            stats["requests_available"] = None if self._requests.unlimited else int(self._requests.level)
+            stats["tokens_available"] = None if self._tokens.unlimited else int(self._tokens.level)
+        for lane, seconds in stats["wait_seconds"].items():
+            stats["wait_seconds"][lane] = round(seconds, 2)
+        return stats
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    """Seconds to wait from ``retry-after-ms`` / ``Retry-After`` (seconds form only)."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(LLM_RATE_LIMIT_RPM, LLM_RATE_LIMIT_TPM, LLM_RATE_BATCH_RESERVE)
+            if LLM_RATE_LIMIT_RPM or LLM_RATE_LIMIT_TPM:
+                log.info(
+                    "LLM rate limiter: %s RPM, %s TPM, %.0f%% reserved for interactive traffic",
+                    LLM_RATE_LIMIT_RPM or "unlimited", LLM_RATE_LIMIT_TPM or "unlimited",
+                    LLM_RATE_BATCH_RESERVE * 100,
+                )
+        return _limiter
+
+
+# ---------------------------------------------------------------------------
+# httpx integration
+# ---------------------------------------------------------------------------
+
+def _on_request(request: httpx.Request) -> None:
+    get_rate_limiter().acquire(estimate_request_tokens(request.content))
+
+
+def _on_response(response: httpx.Response) -> None:
+    get_rate_limiter().on_response(response)
+
+
+async def _on_async_request(request: httpx.Request) -> None:
+    await get_rate_limiter().aacquire(estimate_request_tokens(request.content))
+
+
+async def _on_async_response(response: httpx.Response) -> None:
+    get_rate_limiter().on_response(response)
+
+
+def rate_limit_hooks(is_async: bool = False) -> dict:
+    """httpx ``event_hooks`` that meter a client through the shared limiter."""
+    if is_async:
+        return {"request": [_on_async_request], "response": [_on_async_response]}
+    return {"request": [_on_request], "response": [_on_response]}
+
+
+def rate_limit_stats() -> dict:
+    return get_rate_limiter().stats()
@@ -0,0 +1,164 @@
+"""
+Exact-match LLM response cache with a SQLite backend.
+
+Opt-in via LLM_CACHE_ENABLED. Entries are keyed by model, temperature and
+the normalised message list, where inline base64 images are replaced by
+their content hash, so the same prompt with the same images always maps to
+the same row. Rows expire after LLM_CACHE_TTL_SECONDS.
+
+Callers that need a fresh completion (e.g. "regenerate") wrap the call in
+``bypass_cache()`` — lookups are skipped, but the new answer is still stored.
+
+Used by:
+  - get_chat_model()               (src/agents/llm.py, as a LangChain BaseCache)
+  - OpenAIService.generate_response (src/llm/service.py)
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from ..config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+
+log = logging.getLogger(__name__)
+
+_DATA_URL_RE = re.compile(r"data:image/[\w.+-]+;base64,[A-Za-z0-9+/=]+")
+# Applied to JSON-serialised messages, so newlines/tabs appear as "\n" / "\t" escapes
+_TRAILING_WS_RE = re.compile(r"(?: |\\t)+(?=\\n)")
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True):
+    """Skip cache lookups for LLM calls made inside this block."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def set_bypass(enabled: bool) -> None:
+    """Set the bypass flag for the current context (for contexts driven via ``Context.run``)."""
+    _bypass.set(enabled)
+
+
+def cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+def _normalise(payload: str) -> str:
+    """Hash inline images and strip whitespace noise from a JSON-serialised prompt."""
+    payload = _DATA_URL_RE.sub(
+        lambda m: "image:" + hashlib.sha1(m.group(0).encode("ascii")).hexdigest(),
+        payload,
+    )
+    payload = payload.replace("\\r\\n", "\\n")
+    return _TRAILING_WS_RE.sub("", payload).strip()
+
+
+def make_key(model: str, temperature: Optional[float], messages: Any) -> str:
+    """Build a cache key from the model config and a message list (or a prompt already serialised to JSON)."""
+    if isinstance(messages, str):
+        payload = messages
+    else:
+        payload = json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str)
+    raw = f"{model}\x1f{temperature}\x1f{_normalise(payload)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe SQLite store of serialised LLM responses with a TTL."""
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " tokens INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "writes": 0, "tokens_saved": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for *key*, or None on miss / expiry / bypass."""
+        if cache_bypassed():
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, tokens, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[2] > self.ttl_seconds:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["tokens_saved"] += row[1]
+        log.debug("LLM cache hit %s (%d tokens saved)", key[:12], row[1])
+        return row[0]
+
+    def put(self, key: str, value: str, tokens: int = 0) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, tokens, created) VALUES (?, ?, ?, ?)",
+                (key, value, int(tokens or 0), time.time()),
+            )
+            self._conn.commit()
+            self._stats["writes"] += 1
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None when LLM_CACHE_ENABLED is off."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS)
+            removed = _cache.purge_expired()
+            log.info("LLM response cache enabled at %s (%d expired rows purged)", LLM_CACHE_PATH, removed)
+        return _cache
+
+
+def cache_stats() -> dict:
+    cache = get_response_cache()
+    return cache.stats() if cache else {"enabled": False}
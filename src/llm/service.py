@@ -1,8 +1,12 @@
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any, Union
+from typing import Iterator, List, Optional, Dict, Any, Union
 from PIL import Image
-import os
-import io
+
+from .http_pool import get_http_client
+from .response_cache import get_response_cache, make_key
+from .usage import record_llm_call
+from .image_payload import ImageInput, ImageRef, encode_image, image_content_part
 
 try:
     from openai import OpenAI, AzureOpenAI
@@ -29,34 +33,44 @@ class ChatService(ABC):
 
 # --- OPENAI IMPLEMENTATION ---
 class OpenAIService(VLMService, ChatService):
-    def __init__(self, api_key: str, model_name: str = "gpt-4o", base_url: Optional[str] = None, api_version: Optional[str] = None):
+    def __init__(self, api_key: str, model_name: str = "gpt-4o", base_url: Optional[str] = None, api_version: Optional[str] = None,
+                 usage_label: str = "openai_service"):
         # Use AzureOpenAI client when api_version is provided (Azure deployment)
+        # Both variants share the process-wide keep-alive connection pool
         if api_version and AzureOpenAI:
-            import ssl
-            import httpx
-            ssl_context = ssl.create_default_context()
             self.client = AzureOpenAI(
                 api_key=api_key,
                 azure_endpoint=base_url,
                 api_version=api_version,
-                http_client=httpx.Client(verify=ssl_context),
+                http_client=get_http_client(),
             )
         else:
-            client_kwargs = {"api_key": api_key}
+            client_kwargs = {"api_key": api_key, "http_client": get_http_client()}
             if base_url:
                 client_kwargs["base_url"] = base_url
             self.client = OpenAI(**client_kwargs)
         self.model_name = model_name
+        # Node name this service's calls are reported under in usage accounting
+        self.usage_label = usage_label
 
-    def _image_to_base64_url(self, image: Image.Image) -> str:
-        """Convert a PIL Image to a base64 data URL for the OpenAI vision API."""
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        import base64
-        b64 = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-        return f"data:image/png;base64,{b64}"
+    def _record_usage(self, usage: Any, started: float, error: bool = False) -> None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_llm_call(
+            self.usage_label,
+            self.model_name,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0),
+            completion_tokens=getattr(usage, "completion_tokens", 0),
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+            latency_s=time.perf_counter() - started,
+            error=error,
+        )
 
-    def analyze_image(self, image: Image.Image, prompt: str) -> str:
+    def _image_to_base64_url(self, image: ImageInput, detail: Optional[str] = None) -> str:
+        """Convert an image to a downscaled, cached base64 data URL for the OpenAI vision API."""
+        return encode_image(image, detail=detail)
+
+    def analyze_image(self, image: Image.Image, prompt: str, detail: Optional[str] = None) -> str:
+        started = time.perf_counter()
         try:
             response = self.client.chat.completions.create(
                 model=self.model_name,
@@ -65,49 +79,115 @@ class OpenAIService(VLMService, ChatService):
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": self._image_to_base64_url(image)}
-                            }
+                            image_content_part(image, detail=detail)
                         ]
                     }
                 ],
                 temperature=0.5
             )
+            self._record_usage(response.usage, started)
             return response.choices[0].message.content
         except Exception as e:
+            self._record_usage(None, started, error=True)
             return f"Error analyzing image with OpenAI: {str(e)}"
 
-    def generate_response(self, prompt: Union[str, List[Any]], system_instruction: Optional[str] = None) -> str:
+    def _build_messages(self, prompt: Union[str, List[Any]], system_instruction: Optional[str],
+                        detail: Optional[str]) -> List[Dict[str, Any]]:
+        messages = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+
+        # Build user message content parts
+        content_parts = []
+        if isinstance(prompt, list):
+            for item in prompt:
+                if isinstance(item, str):
+                    content_parts.append({"type": "text", "text": item})
+                elif isinstance(item, (Image.Image, ImageRef)):
+                    content_parts.append(image_content_part(item, detail=detail))
+        else:
+            content_parts.append({"type": "text", "text": prompt})
+
+        messages.append({"role": "user", "content": content_parts})
+        return messages
+
+    def generate_response(self, prompt: Union[str, List[Any]], system_instruction: Optional[str] = None,
+                          detail: Optional[str] = None) -> str:
         try:
-            messages = []
-            if system_instruction:
-                messages.append({"role": "system", "content": system_instruction})
-
-            # Build user message content parts
-            content_parts = []
-            if isinstance(prompt, list):
-                for item in prompt:
-                    if isinstance(item, str):
-                        content_parts.append({"type": "text", "text": item})
-                    elif isinstance(item, Image.Image):
-                        content_parts.append({
-                            "type": "image_url",
-                            "image_url": {"url": self._image_to_base64_url(item)}
-                        })
-            else:
-                content_parts.append({"type": "text", "text": prompt})
-
-            messages.append({"role": "user", "content": content_parts})
+            messages = self._build_messages(prompt, system_instruction, detail)
+            cache = get_response_cache()
+            cache_key = make_key(self.model_name, 0.5, messages) if cache else None
+            if cache:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
 
-            response = self.client.chat.completions.create(
+            started = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=0.5
+                )
+            except Exception:
+                self._record_usage(None, started, error=True)
+                raise
+            self._record_usage(response.usage, started)
+            answer = response.choices[0].message.content
+            if cache and answer:
+                cache.put(cache_key, answer, response.usage.total_tokens if response.usage else 0)
+            return answer
+        except Exception as e:
+            return f"Error generating response with OpenAI: {str(e)}"
+
+    def generate_response_stream(self, prompt: Union[str, List[Any]], system_instruction: Optional[str] = None,
+                                 detail: Optional[str] = None) -> Iterator[str]:
+        """Same as generate_response, but yields text deltas as they arrive."""
+        try:
+            messages = self._build_messages(prompt, system_instruction, detail)
+            cache = get_response_cache()
+            cache_key = make_key(self.model_name, 0.5, messages) if cache else None
+            if cache:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=messages,
-                temperature=0.5
+                temperature=0.5,
+                stream=True,
             )
-            return response.choices[0].message.content
+            parts: List[str] = []
+            try:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except Exception:
+                self._record_usage(None, started, error=True)
+                raise
+            # Streamed responses carry no usage block — estimate at ~4 chars/token
+            answer = "".join(parts)
+            prompt_chars = sum(
+                len(p["text"]) for m in messages
+                for p in (m["content"] if isinstance(m["content"], list) else [{"text": m["content"]}])
+                if "text" in p
+            )
+            record_llm_call(
+                self.usage_label, self.model_name,
+                prompt_tokens=prompt_chars // 4, completion_tokens=len(answer) // 4,
+                latency_s=time.perf_counter() - started,
+            )
+            if cache and parts:
+                cache.put(cache_key, answer, len(answer) // 4)
         except Exception as e:
-            return f"Error generating response with OpenAI: {str(e)}"
+            yield f"Error generating response with OpenAI: {str(e)}"
 
 # --- FACTORY ---
 def get_llm_service(provider: str = "openai", **kwargs):
@@ -116,7 +196,8 @@ def get_llm_service(provider: str = "openai", **kwargs):
             api_key=kwargs.get("api_key"),
             model_name=kwargs.get("model_name", "gpt-4o"),
             base_url=kwargs.get("base_url"),
-            api_version=kwargs.get("api_version")
+            api_version=kwargs.get("api_version"),
+            usage_label=kwargs.get("usage_label", "openai_service"),
         )
     else:
         raise ValueError(f"Unknown provider: {provider}")
@@ -0,0 +1,499 @@
+"""
+Deterministic local stand-in for the OpenAI / Azure OpenAI API.
+
+Lets the agent graph, IngestionPipeline and run_traceback run offline and
+under load without touching the real deployment. Responses are a pure
+function of the request body (same request → same response), schema-valid,
+and come back after a configurable simulated latency.
+
+Supported:
+  POST /v1/chat/completions, /chat/completions,
+       /openai/deployments/{deployment}/chat/completions   (Azure)
+      - plain text, streaming (SSE, incl. stream_options.include_usage)
+      - structured output via ``tools`` / ``tool_choice`` and
+        ``response_format`` json_schema / json_object
+      - vision inputs: image tokens are counted with OpenAI's tile formula
+      - the Stains Detective traceback prompt gets a valid per-image verdict
+  POST /v1/embeddings, /embeddings,
+       /openai/deployments/{deployment}/embeddings          (Azure)
+      - hashed bag-of-words vectors, so similar texts stay close
+      - float and base64 encodings
+  GET  /stats — request counters
+
+Usage:
+    python -m src.llm.stub_server --port 8100 --latency-ms 300 --ms-per-token 10
+
+    # OpenAI-style client
+    OPENAI_ENDPOINT=http://localhost:8100/v1  OPENAI_API_VERSION=
+    # Azure-style client
+    OPENAI_ENDPOINT=http://localhost:8100     OPENAI_API_VERSION=2024-12-01-preview
+
+Every option can also be set with an environment variable (STUB_LATENCY_MS,
+STUB_MS_PER_TOKEN, STUB_COMPLETION_TOKENS, STUB_EMBEDDING_DIM, STUB_FAIL_EVERY,
+STUB_RETRY_AFTER).
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_DATA_URL_RE = re.compile(r"^data:image/[\w.+-]+;base64,(.*)$", re.DOTALL)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_TRACEBACK_IMAGE_RE = re.compile(r"Image \d+: \*\*(.+?)\*\*")
+
+# Provider prompt caching only applies to prefixes of at least this many tokens,
+# counted in 128-token increments
+_CACHE_MIN_TOKENS = 1024
+_CACHE_INCREMENT = 128
+
+_FILLER = (
+    "the analysis indicates lot yield excursion tester handler bin operation "
+    "process step review recommended data shows alarm history consistent with "
+    "previous findings further investigation of equipment logs is advised"
+).split()
+
+
+@dataclass
+class StubSettings:
+    latency_ms: float = float(os.getenv("STUB_LATENCY_MS", "200"))
+    ms_per_token: float = float(os.getenv("STUB_MS_PER_TOKEN", "0"))
+    completion_tokens: int = int(os.getenv("STUB_COMPLETION_TOKENS", "120"))
+    embedding_dim: int = int(os.getenv("STUB_EMBEDDING_DIM", "1536"))
+    fail_every: int = int(os.getenv("STUB_FAIL_EVERY", "0"))       # every Nth request → 429 (0 = never)
+    retry_after: float = float(os.getenv("STUB_RETRY_AFTER", "1"))
+
+
+# ---------------------------------------------------------------------------
+# Deterministic helpers
+# ---------------------------------------------------------------------------
+
+def _seed(payload: Any) -> int:
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(raw).digest()[:8], "big")
+
+
+def _text_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def _image_tokens(url: str, detail: str) -> int:
+    """Vision token cost using OpenAI's 512px tile formula (85 base + 170 per tile)."""
+    if detail == "low":
+        return 85
+    width = height = None
+    match = _DATA_URL_RE.match(url or "")
+    if match:
+        try:
+            from PIL import Image
+
+            with Image.open(io.BytesIO(base64.b64decode(match.group(1)))) as img:
+                width, height = img.size
+        except Exception:
+            pass
+    if not width or not height:
+        return 765   # a 1024x1024 image at high detail
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+    return ""
+
+
+def _prompt_tokens(messages: list) -> tuple[int, int]:
+    """Return (total prompt tokens, image count) for a chat message list."""
+    tokens, images = 3, 0
+    for message in messages:
+        tokens += 4 + _text_tokens(_message_text(message))
+        content = message.get("content")
+        if isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    image = part.get("image_url") or {}
+                    tokens += _image_tokens(image.get("url", ""), image.get("detail", "auto"))
+                    images += 1
+        if message.get("tool_calls"):
+            tokens += _text_tokens(json.dumps(message["tool_calls"]))
+    return tokens, images
+
+
+def _filler_text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(_FILLER) for _ in range(max(0, n_words)))
+
+
+# ---------------------------------------------------------------------------
+# JSON-schema instance generation (structured output)
+# ---------------------------------------------------------------------------
+
+def _resolve(schema: dict, root: dict) -> dict:
+    ref = schema.get("$ref")
+    if ref and ref.startswith("#/"):
+        node: Any = root
+        for part in ref[2:].split("/"):
+            node = node.get(part, {})
+        return _resolve(node, root)
+    return schema
+
+
+def _instance(schema: dict, root: dict, rng: random.Random, name: str = "value") -> Any:
+    """Build a deterministic value that validates against *schema*."""
+    schema = _resolve(schema or {}, root)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if _resolve(s, root).get("type") != "null"] or schema[key]
+            return _instance(options[0], root, rng, name)
+    if "allOf" in schema:
+        merged: dict = {}
+        for sub in schema["allOf"]:
+            merged.update(_resolve(sub, root))
+        return _instance(merged, root, rng, name)
+
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object" or "properties" in schema:
+        return {
+            prop: _instance(sub, root, rng, prop)
+            for prop, sub in (schema.get("properties") or {}).items()
+        }
+    if kind == "array":
+        count = max(1, schema.get("minItems", 1))
+        return [_instance(schema.get("items") or {}, root, rng, name) for _ in range(count)]
+    if kind == "integer":
+        low = schema.get("minimum", 0)
+        return int(rng.randint(low, schema.get("maximum", low + 10)))
+    if kind == "number":
+        low = schema.get("minimum", 0.0)
+        return round(rng.uniform(low, schema.get("maximum", low + 1.0)), 3)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    if "default" in schema:
+        return schema["default"]
+    return f"stub {name.replace('_', ' ')} {_filler_text(rng, 4)}".strip()
+
+
+# ---------------------------------------------------------------------------
+# Chat completions
+# ---------------------------------------------------------------------------
+
+def _traceback_verdict(prompt: str, rng: random.Random) -> Optional[str]:
+    """Valid JSON for the Stains Detective batch traceback prompt, or None if not that prompt."""
+    if "defect origin traceback" not in prompt or "per_image" not in prompt:
+        return None
+    filenames = _TRACEBACK_IMAGE_RE.findall(prompt)
+    if not filenames:
+        return None
+    # Images are listed newest → oldest; everything up to the origin shows the defect
+    origin_idx = rng.randrange(len(filenames))
+    per_image = [
+        {
+            "filename": fname,
+            "status": "PRESENT" if i <= origin_idx else "ABSENT",
+            "confidence": round(rng.uniform(0.75, 0.95), 2),
+        }
+        for i, fname in enumerate(filenames)
+    ]
+    return json.dumps({
+        "per_image": per_image,
+        "origin": filenames[origin_idx],
+        "reasoning": "Stub verdict: defect visible from the origin step onwards, absent before it.",
+    })
+
+
+def _build_completion(body: dict, settings: StubSettings) -> dict:
+    """Return {"content", "tool_calls", "finish_reason", "completion_tokens"} for a request."""
+    messages = body.get("messages") or []
+    rng = random.Random(_seed(messages))
+    limit = body.get("max_completion_tokens") or body.get("max_tokens")
+    n_tokens = min(settings.completion_tokens, limit) if limit else settings.completion_tokens
+
+    tools = body.get("tools") or []
+    tool_choice = body.get("tool_choice")
+    if tools and tool_choice != "none":
+        chosen = tools[0]
+        if isinstance(tool_choice, dict):
+            wanted = (tool_choice.get("function") or {}).get("name")
+            chosen = next((t for t in tools if t.get("function", {}).get("name") == wanted), chosen)
+        fn = chosen.get("function") or {}
+        params = fn.get("parameters") or {}
+        arguments = json.dumps(_instance(params, params, rng, fn.get("name", "value")))
+        return {
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{rng.getrandbits(48):012x}",
+                "type": "function",
+                "function": {"name": fn.get("name", "tool"), "arguments": arguments},
+            }],
+            "finish_reason": "tool_calls",
+            "completion_tokens": _text_tokens(arguments),
+        }
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = (response_format.get("json_schema") or {}).get("schema") or {}
+        content = json.dumps(_instance(schema, schema, rng))
+        return {"content": content, "tool_calls": None, "finish_reason": "stop",
+                "completion_tokens": _text_tokens(content)}
+    if response_format.get("type") == "json_object":
+        content = json.dumps({"result": _filler_text(rng, min(n_tokens, 40))})
+        return {"content": content, "tool_calls": None, "finish_reason": "stop",
+                "completion_tokens": _text_tokens(content)}
+
+    last_user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+    verdict = _traceback_verdict(_message_text(last_user), rng)
+    if verdict is not None:
+        return {"content": verdict, "tool_calls": None, "finish_reason": "stop",
+                "completion_tokens": _text_tokens(verdict)}
+
+    question = " ".join(_message_text(last_user).split())[:160]
+    header = f"[stub:{body.get('model', 'model')}] Response to: {question}\n\n"
+    content = header + _filler_text(rng, n_tokens - _text_tokens(header))
+    return {"content": content, "tool_calls": None, "finish_reason": "stop", "completion_tokens": n_tokens}
+
+
+class _PromptCache:
+    """Simulates provider prefix caching on the first (system) message."""
+
+    def __init__(self, size: int = 1024):
+        self._seen: OrderedDict = OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, messages: list) -> int:
+        if not messages:
+            return 0
+        prefix = _message_text(messages[0])
+        tokens = _text_tokens(prefix)
+        if tokens < _CACHE_MIN_TOKENS:
+            return 0
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            hit = key in self._seen
+            self._seen[key] = True
+            self._seen.move_to_end(key)
+            while len(self._seen) > self._size:
+                self._seen.popitem(last=False)
+        return (tokens // _CACHE_INCREMENT) * _CACHE_INCREMENT if hit else 0
+
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+def _embed(text: Any, dim: int) -> list:
+    """Hashed bag-of-words vector (unit length) — similar texts share dimensions."""
+    if isinstance(text, list):   # pre-tokenised input (token ids)
+        words = [f"t{t}" for t in text]
+    else:
+        words = _WORD_RE.findall(str(text).lower())
+    vec = [0.0] * dim
+    for word in words or ["<empty>"]:
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+# ---------------------------------------------------------------------------
+# App
+# ---------------------------------------------------------------------------
+
+def create_app(settings: Optional[StubSettings] = None) -> FastAPI:
+    settings = settings or StubSettings()
+    app = FastAPI(title="Skybot OpenAI stub", version="1.0.0")
+    prompt_cache = _PromptCache()
+    lock = threading.Lock()
+    stats = {"chat": 0, "chat_stream": 0, "embeddings": 0, "throttled": 0, "prompt_tokens": 0,
+             "completion_tokens": 0, "images": 0}
+
+    def _throttle() -> Optional[JSONResponse]:
+        with lock:
+            count = stats["chat"] + stats["embeddings"] + stats["throttled"] + 1
+            if settings.fail_every and count % settings.fail_every == 0:
+                stats["throttled"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    headers={"Retry-After": str(settings.retry_after)},
+                    content={"error": {"code": "429", "message": "Stub rate limit — retry later."}},
+                )
+        return None
+
+    async def chat_completions(request: Request, deployment: Optional[str] = None):
+        throttled = _throttle()
+        if throttled is not None:
+            return throttled
+        body = await request.json()
+        model = deployment or body.get("model", "stub-model")
+        messages = body.get("messages") or []
+        result = _build_completion(body, settings)
+        prompt_tokens, images = _prompt_tokens(messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": result["completion_tokens"],
+            "total_tokens": prompt_tokens + result["completion_tokens"],
+            "prompt_tokens_details": {"cached_tokens": prompt_cache.cached_tokens(messages)},
+        }
+        with lock:
+            stats["chat"] += 1
+            stats["chat_stream"] += int(bool(body.get("stream")))
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += result["completion_tokens"]
+            stats["images"] += images
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        await asyncio.sleep(settings.latency_ms / 1000)
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                _stream(completion_id, created, model, result, usage, include_usage),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(settings.ms_per_token * result["completion_tokens"] / 1000)
+        message: dict = {"role": "assistant", "content": result["content"]}
+        if result["tool_calls"]:
+            message["tool_calls"] = result["tool_calls"]
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": result["finish_reason"]}],
+            "usage": usage,
+        }
+
+    async def _stream(completion_id: str, created: int, model: str, result: dict, usage: dict,
+                      include_usage: bool):
+        def chunk(delta: dict, finish_reason: Optional[str] = None, choices: bool = True) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else []}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        if result["tool_calls"]:
+            call = result["tool_calls"][0]
+            yield chunk({"tool_calls": [{"index": 0, **call}]})
+        else:
+            words = result["content"].split(" ")
+            per_word = settings.ms_per_token * result["completion_tokens"] / max(1, len(words)) / 1000
+            for i, word in enumerate(words):
+                if per_word:
+                    await asyncio.sleep(per_word)
+                yield chunk({"content": word if i == 0 else " " + word})
+        yield chunk({}, result["finish_reason"])
+        if include_usage:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": [], "usage": usage}
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def embeddings(request: Request, deployment: Optional[str] = None):
+        throttled = _throttle()
+        if throttled is not None:
+            return throttled
+        body = await request.json()
+        inputs = body.get("input")
+        if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dim = int(body.get("dimensions") or settings.embedding_dim)
+        b64 = body.get("encoding_format") == "base64"
+
+        data = []
+        prompt_tokens = 0
+        for i, text in enumerate(inputs or []):
+            vector = _embed(text, dim)
+            prompt_tokens += len(text) if isinstance(text, list) else _text_tokens(str(text))
+            embedding: Any = base64.b64encode(struct.pack(f"<{dim}f", *vector)).decode() if b64 else vector
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        with lock:
+            stats["embeddings"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+
+        await asyncio.sleep(settings.latency_ms / 4000)   # embeddings are much faster than chat
+        return {
+            "object": "list",
+            "data": data,
+            "model": deployment or body.get("model", "stub-embedding"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    for path in ("/v1/chat/completions", "/chat/completions"):
+        app.add_api_route(path, chat_completions, methods=["POST"])
+    app.add_api_route("/openai/deployments/{deployment}/chat/completions", chat_completions, methods=["POST"])
+    for path in ("/v1/embeddings", "/embeddings"):
+        app.add_api_route(path, embeddings, methods=["POST"])
+    app.add_api_route("/openai/deployments/{deployment}/embeddings", embeddings, methods=["POST"])
+
+    @app.get("/stats")
+    async def get_stats():
+        with lock:
+            return dict(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic local OpenAI / Azure OpenAI stand-in.")
+    defaults = StubSettings()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms,
+                        help="Time to first token for chat (embeddings take a quarter of this)")
+    parser.add_argument("--ms-per-token", type=float, default=defaults.ms_per_token,
+                        help="Additional generation time per completion token")
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens,
+                        help="Length of free-text completions")
+    parser.add_argument("--embedding-dim", type=int, default=defaults.embedding_dim)
+    parser.add_argument("--fail-every", type=int, default=defaults.fail_every,
+                        help="Return 429 for every Nth request (0 = never)")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = StubSettings(
+        latency_ms=args.latency_ms,
+        ms_per_token=args.ms_per_token,
+        completion_tokens=args.completion_tokens,
+        embedding_dim=args.embedding_dim,
+        fail_every=args.fail_every,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
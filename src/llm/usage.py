@@ -0,0 +1,213 @@
+"""
+Token, cost and latency accounting for every LLM call.
+
+Each API request runs inside ``track_usage()``, which installs a per-request
+UsageTracker in a context variable. LLM calls report into it through
+``record_llm_call()``:
+  - LangChain models (get_chat_model) via UsageCallbackHandler in
+    src/agents/llm.py — the graph node comes from LangGraph's
+    ``langgraph_node`` callback metadata
+  - OpenAIService directly, labelled with its ``usage_label``
+  - the Stains Detective traceback VLM (stains_traceback_vlm)
+
+Every call is also added to process-wide totals exported on /metrics.
+Costs use a built-in USD-per-1M-token table (prefix-matched on the model /
+deployment name), overridable with LLM_PRICING_JSON.
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from ..config import LLM_PRICING_JSON
+
+log = logging.getLogger(__name__)
+
+# USD per 1M tokens
+_DEFAULT_PRICING = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+}
+
+
+def _load_pricing() -> dict:
+    pricing = dict(_DEFAULT_PRICING)
+    if LLM_PRICING_JSON:
+        try:
+            pricing.update(json.loads(LLM_PRICING_JSON))
+        except ValueError as e:
+            log.warning("Ignoring invalid LLM_PRICING_JSON: %s", e)
+    return pricing
+
+
+_PRICING = _load_pricing()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """USD cost of one call, or None when the model has no price entry."""
+    name = (model or "").lower()
+    price = _PRICING.get(name)
+    if price is None:
+        # Longest prefix wins so "gpt-4o-mini-2024-07-18" doesn't match "gpt-4o"
+        for key in sorted(_PRICING, key=len, reverse=True):
+            if name.startswith(key.lower()):
+                price = _PRICING[key]
+                break
+    if price is None:
+        return None
+    uncached = max(0, prompt_tokens - cached_tokens)
+    cost = (
+        uncached * price["input"]
+        + cached_tokens * price.get("cached_input", price["input"])
+        + completion_tokens * price["output"]
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+class _Aggregate:
+    """Running totals for one grouping key (node or model)."""
+
+    __slots__ = ("calls", "errors", "prompt_tokens", "completion_tokens", "cached_tokens",
+                 "latency_s", "cost_usd")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency_s = 0.0
+        self.cost_usd = 0.0
+
+    def add(self, call: dict) -> None:
+        self.calls += 1
+        self.errors += int(call["error"])
+        self.prompt_tokens += call["prompt_tokens"]
+        self.completion_tokens += call["completion_tokens"]
+        self.cached_tokens += call["cached_tokens"]
+        self.latency_s += call["latency_s"]
+        self.cost_usd += call["cost_usd"] or 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "latency_s": round(self.latency_s, 3),
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class UsageTracker:
+    """Collects every LLM call made while handling one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: list[dict] = []
+
+    def add(self, call: dict) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> dict:
+        """Totals plus per-node and per-model breakdowns."""
+        total = _Aggregate()
+        by_node: dict[str, _Aggregate] = {}
+        by_model: dict[str, _Aggregate] = {}
+        with self._lock:
+            calls = list(self.calls)
+        for call in calls:
+            total.add(call)
+            by_node.setdefault(call["node"], _Aggregate()).add(call)
+            by_model.setdefault(call["model"], _Aggregate()).add(call)
+        return {
+            "total": total.to_dict(),
+            "by_node": {k: v.to_dict() for k, v in by_node.items()},
+            "by_model": {k: v.to_dict() for k, v in by_model.items()},
+        }
+
+
+_current: ContextVar[Optional[UsageTracker]] = ContextVar("llm_usage_tracker", default=None)
+
+_global_lock = threading.Lock()
+_global_total = _Aggregate()
+_global_by_node: dict[str, _Aggregate] = {}
+_global_by_model: dict[str, _Aggregate] = {}
+
+
+@contextmanager
+def track_usage():
+    """Install a fresh UsageTracker for LLM calls made inside this block."""
+    tracker = UsageTracker()
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+
+def start_tracking() -> UsageTracker:
+    """Install a tracker in the current context without a with-block (for ``Context.run``)."""
+    tracker = UsageTracker()
+    _current.set(tracker)
+    return tracker
+
+
+def current_tracker() -> Optional[UsageTracker]:
+    return _current.get()
+
+
+def record_llm_call(
+    node: str,
+    model: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cached_tokens: int = 0,
+    latency_s: float = 0.0,
+    error: bool = False,
+) -> None:
+    """Record one LLM call against the current request and the process totals."""
+    call = {
+        "node": node or "unknown",
+        "model": model or "unknown",
+        "prompt_tokens": int(prompt_tokens or 0),
+        "completion_tokens": int(completion_tokens or 0),
+        "cached_tokens": int(cached_tokens or 0),
+        "latency_s": float(latency_s),
+        "error": bool(error),
+    }
+    call["cost_usd"] = estimate_cost(
+        call["model"], call["prompt_tokens"], call["completion_tokens"], call["cached_tokens"]
+    )
+
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.add(call)
+
+    with _global_lock:
+        _global_total.add(call)
+        _global_by_node.setdefault(call["node"], _Aggregate()).add(call)
+        _global_by_model.setdefault(call["model"], _Aggregate()).add(call)
+
+    log.debug(
+        "LLM call node=%s model=%s prompt=%d completion=%d cached=%d %.2fs",
+        call["node"], call["model"], call["prompt_tokens"], call["completion_tokens"],
+        call["cached_tokens"], call["latency_s"],
+    )
+
+
+def usage_stats() -> dict:
+    """Process-wide totals since startup, for the /metrics endpoint."""
+    with _global_lock:
+        return {
+            "total": _global_total.to_dict(),
+            "by_node": {k: v.to_dict() for k, v in _global_by_node.items()},
+            "by_model": {k: v.to_dict() for k, v in _global_by_model.items()},
+        }
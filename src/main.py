@@ -1,6 +1,10 @@
+import contextlib
+import contextvars
+import json
 import logging
 import os
 import shutil
+import uuid
 import uvicorn
 
 logging.basicConfig(
@@ -14,7 +18,11 @@ from typing import List, Optional
 
 from src.rag import IngestionPipeline, RAGEngine
 from src.agents import agent_graph
-from src.config import IMAGE_STORE_DIR, DOCUMENT_STORE_DIR
+from src.agents.budget import new_deadline, request_deadline
+from src.agents.executor import run_blocking
+from src.config import AGENT_JOB_BUDGET_S, IMAGE_STORE_DIR, DOCUMENT_STORE_DIR, REQUEST_BUDGET_S
+from src.llm.response_cache import bypass_cache, set_bypass
+from src.llm.usage import UsageTracker, start_tracking, track_usage
 
 # Ensure directories exist
 UPLOAD_DIR = os.path.join(os.getcwd(), "uploads")
@@ -23,7 +31,7 @@ os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
 os.makedirs(DOCUMENT_STORE_DIR, exist_ok=True)
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 app = FastAPI(title="Skybot Backend", version="2.0.0")
 
@@ -54,6 +62,7 @@ except Exception as e:
 class ChatRequest(BaseModel):
     query: str
     channel: Optional[str] = None
+    no_cache: bool = False   # skip LLM response-cache lookups (e.g. "regenerate")
 
 
 class AgenticChatRequest(BaseModel):
@@ -62,6 +71,10 @@ class AgenticChatRequest(BaseModel):
     max_iterations: int = 3
     traceback_uploads_dir: Optional[str] = None   # stains detective: explicit image folder
     traceback_output_dir: Optional[str] = None    # stains detective: where to write panels
+    no_cache: bool = False                         # skip LLM response-cache lookups
+    session_id: Optional[str] = None               # multi-turn session: keep evidence between turns
+    resume: bool = False                           # continue the session's interrupted run
+    timeout_s: Optional[float] = None              # time budget for this turn (default REQUEST_BUDGET_S, 0 = none)
 
 class IngestResponse(BaseModel):
     status: str
@@ -80,8 +93,8 @@ async def ingest_document(file: UploadFile = File(...), channel: str = Form("gen
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
             
-        # Run ingestion with channel
-        result = ingestion_pipeline.ingest_file(file_path, channel=channel)
+        # Run ingestion with channel (off the event loop — extraction and embedding block)
+        result = await run_blocking(ingestion_pipeline.ingest_file, file_path, channel=channel)
         return result
     except Exception as e:
         import traceback
@@ -94,11 +107,215 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail="RAG engine not initialized.")
         
     try:
-        response = rag_engine.query(request.query, channel=request.channel)
+        with bypass_cache(request.no_cache), track_usage() as tracker:
+            response = await run_blocking(rag_engine.query, request.query, channel=request.channel)
+        response["metadata"] = {"usage": tracker.summary()}
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
+
+# ---------------------------------------------------------------------------
+# Server-Sent Events streaming
+# ---------------------------------------------------------------------------
+
+# Only user-facing answer tokens are streamed; specialist analyses stay internal.
+_STREAMED_NODES = {"reporting", "general"}
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _iterate_in_context(ctx: contextvars.Context, iterator):
+    """Drive a sync iterator inside *ctx* so per-request context vars (cache
+    bypass, usage tracker) survive StreamingResponse resuming it on different worker threads."""
+    while True:
+        try:
+            yield ctx.run(next, iterator)
+        except StopIteration:
+            return
+
+
+def _request_context(no_cache: bool) -> tuple[contextvars.Context, UsageTracker]:
+    ctx = contextvars.copy_context()
+    ctx.run(set_bypass, no_cache)
+    tracker = ctx.run(start_tracking)
+    return ctx, tracker
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat.
+
+    Events: sources → token* → done { usage }  (or error)
+    """
+    if not rag_engine:
+        raise HTTPException(status_code=500, detail="RAG engine not initialized.")
+
+    def events():
+        try:
+            for ev in rag_engine.query_stream(request.query, channel=request.channel):
+                if ev["type"] == "sources":
+                    yield _sse("sources", {"citations": ev["citations"], "images": ev["images"]})
+                else:
+                    yield _sse("token", {"text": ev["text"]})
+            yield _sse("done", {"usage": tracker.summary()})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Chat failed: {str(e)}"})
+
+    ctx, tracker = _request_context(request.no_cache)
+    return StreamingResponse(_iterate_in_context(ctx, events()), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+def _request_deadline(request: "AgenticChatRequest", default_s: float = REQUEST_BUDGET_S) -> Optional[float]:
+    return new_deadline(default_s if request.timeout_s is None else request.timeout_s)
+
+
+def _initial_state(request: "AgenticChatRequest", deadline: Optional[float] = None) -> dict:
+    return {
+        "messages": [],
+        "user_query": request.query,
+        "request_id": uuid.uuid4().hex,
+        "channel": request.channel,
+        "entities": None,
+        "scratchpad": "",
+        "findings": [],
+        "findings_summary": "",
+        "compacted_count": 0,
+        "sub_query": "",
+        "retrieved_docs": [],
+        "image_urls": [],
+        "citations": [],
+        "next_action": "",
+        "parallel_actions": [],
+        "final_answer": "",
+        "iteration": 0,
+        "iterations_saved": 0,
+        "max_iterations": request.max_iterations,
+        "deadline": deadline,
+        "traceback_uploads_dir": request.traceback_uploads_dir,
+        "traceback_output_dir": request.traceback_output_dir,
+    }
+
+
+def _describe_update(node: str, update: dict) -> dict:
+    """Compact, JSON-safe summary of one node's state update."""
+    event = {"node": node}
+    if node == "orchestrator":
+        event["next_action"] = update.get("next_action")
+        event["sub_query"] = update.get("sub_query")
+        event["iteration"] = update.get("iteration")
+        event["parallel"] = [task["agent"] for task in update.get("parallel_actions") or []]
+    elif node == "entities":
+        event["entities"] = update.get("entities")
+    messages = update.get("messages") or []
+    if messages:
+        content = str(getattr(messages[-1], "content", ""))
+        event["summary"] = content[:300] + ("..." if len(content) > 300 else "")
+    return event
+
+
+async def _prepare_agent_run(request: AgenticChatRequest, deadline: Optional[float]) -> tuple:
+    """Return (graph, input, config, prior) for a stateless or session request.
+
+    *prior* holds the citation / image counts left by earlier session turns.
+    Raises ValueError for an invalid resume.
+    """
+    initial_state = _initial_state(request, deadline)
+    if not request.session_id:
+        if request.resume:
+            raise ValueError("resume requires a session_id")
+        return agent_graph, initial_state, None, {}
+    from src.agents.sessions import get_session_graph, session_config, session_input
+
+    graph = await get_session_graph()
+    graph_input, prior = await session_input(graph, request.session_id, initial_state, request.resume)
+    return graph, graph_input, session_config(request.session_id), prior
+
+
+def _session_turn(session_id: Optional[str]):
+    """Run one turn of *session_id* at a time; stateless requests don't wait."""
+    if not session_id:
+        return contextlib.nullcontext()
+    from src.agents.sessions import session_lock
+
+    return session_lock(session_id)
+
+
+def _agentic_response(state: dict, tracker: UsageTracker, prior: dict, session_id: Optional[str]) -> dict:
+    """Response payload; in a session, citations and images favour this turn's."""
+    def _this_turn(key: str) -> list:
+        items = state.get(key, [])
+        return (items[prior.get(key, 0):] or items)[:3]
+
+    metadata = {
+        "usage": tracker.summary(),
+        "iterations": state.get("iteration", 0),
+        "iterations_saved": state.get("iterations_saved", 0),
+    }
+    if session_id:
+        metadata["session_id"] = session_id
+    return {
+        "answer": state.get("final_answer", "No answer generated."),
+        "citations": _this_turn("citations"),
+        "images": _this_turn("image_urls"),
+        "metadata": metadata,
+    }
+
+
+@app.post("/agentic-chat/stream")
+async def agentic_chat_stream(request: AgenticChatRequest):
+    """
+    Streaming variant of /agentic-chat.
+
+    Events:
+      decision — orchestrator routing choice (next_action, parallel, sub_query, iteration)
+      step     — a specialist agent finished (node, summary), or the question's entities were parsed (node "entities")
+      token    — final-answer token from the reporting / general node
+      final    — { answer, citations, images, metadata }, same shape as /agentic-chat
+      error
+    """
+    async def events():
+        # An async generator runs in the streaming task's context for its whole
+        # life, so per-request context vars can simply be set here
+        set_bypass(request.no_cache)
+        tracker = start_tracking()
+        deadline = _request_deadline(request)
+        final_state: dict = {}
+        try:
+            async with _session_turn(request.session_id):
+                graph, graph_input, config, prior = await _prepare_agent_run(request, deadline)
+                with request_deadline(deadline):
+                    async for mode, chunk in graph.astream(
+                        graph_input,
+                        config,
+                        stream_mode=["updates", "messages", "values"],
+                    ):
+                        if mode == "messages":
+                            msg, meta = chunk
+                            if meta.get("langgraph_node") in _STREAMED_NODES and msg.content:
+                                yield _sse("token", {"text": msg.content})
+                        elif mode == "updates":
+                            for node, update in chunk.items():
+                                if not update:
+                                    continue
+                                kind = "decision" if node == "orchestrator" else "step"
+                                yield _sse(kind, _describe_update(node, update))
+                        else:
+                            final_state = chunk
+            yield _sse("final", _agentic_response(final_state, tracker, prior, request.session_id))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield _sse("error", {"detail": f"Agentic chat failed: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
 @app.post("/agentic-chat")
 async def agentic_chat(request: AgenticChatRequest):
     """
@@ -108,36 +325,138 @@ async def agentic_chat(request: AgenticChatRequest):
     the SOP/Document Agent, or go straight to the Reporting Agent — looping
     until max_iterations is reached or the orchestrator is satisfied.
 
+    Runs the graph with ``ainvoke``: LLM calls use the async pooled client
+    and blocking I/O goes through the bounded executor, so one worker can
+    serve many concurrent investigations.
+
     Returns the same shape as /chat for frontend compatibility:
-      { answer, citations, images }
+      { answer, citations, images, metadata }
+
+    ``metadata.usage`` breaks down the LLM tokens, latency and estimated
+    cost of this request per graph node and per model; ``metadata.iterations``
+    / ``iterations_saved`` show how many orchestrator hops ran and how much of
+    the budget the sufficiency check left unused.
+
+    With ``session_id`` the run is checkpointed: follow-up questions reuse
+    the scratchpad, findings and retrieved evidence of earlier turns, and
+    ``resume=true`` continues an interrupted run. Turns of the same session
+    run one at a time; an overlapping request waits for the previous turn.
+
+    ``timeout_s`` (default REQUEST_BUDGET_S) bounds the turn: sources that
+    won't fit in the remaining time are skipped and the report is written
+    from whatever evidence was gathered when the budget runs out.
     """
+    deadline = _request_deadline(request)
+    async with _session_turn(request.session_id):
+        try:
+            graph, graph_input, config, prior = await _prepare_agent_run(request, deadline)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            with bypass_cache(request.no_cache), track_usage() as tracker, request_deadline(deadline):
+                result = await graph.ainvoke(graph_input, config)
+            return _agentic_response(result, tracker, prior, request.session_id)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Agentic chat failed: {str(e)}")
+
+
+@app.get("/agentic-chat/sessions/{session_id}")
+async def get_agent_session(session_id: str):
+    """Stored evidence of a multi-turn session and where an interrupted run stopped."""
+    from src.agents.sessions import session_info
+
+    info = await session_info(session_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.")
+    return info
+
+
+async def _run_agent_job(request: AgenticChatRequest, job) -> dict:
+    """Run one background job: node updates become job progress, the result is the /agentic-chat payload."""
+    # The job task has its own context copy, so per-request context vars are set here
+    set_bypass(request.no_cache)
+    tracker = start_tracking()
+    final_state: dict = {}
+    async with _session_turn(request.session_id):
+        # The budget starts when the job leaves the queue and has its session
+        deadline = _request_deadline(request, AGENT_JOB_BUDGET_S)
+        graph, graph_input, config, prior = await _prepare_agent_run(request, deadline)
+        with request_deadline(deadline):
+            async for mode, chunk in graph.astream(graph_input, config, stream_mode=["updates", "values"]):
+                if mode == "updates":
+                    for node, update in chunk.items():
+                        if update:
+                            job.progress(_describe_update(node, update))
+                else:
+                    final_state = chunk
+    return _agentic_response(final_state, tracker, prior, request.session_id)
+
+
+@app.post("/agentic-chat/jobs", status_code=202)
+async def submit_agentic_job(request: AgenticChatRequest):
+    """
+    Background variant of /agentic-chat for long investigations (Stains
+    Detective tracebacks, multi-lot lookups) that outlast proxy timeouts.
+
+    Returns { job_id, status } at once; poll GET /agentic-chat/jobs/{job_id}
+    for progress and the result, DELETE it to cancel. Jobs run on a bounded
+    pool (AGENT_JOB_WORKERS); ``timeout_s`` defaults to AGENT_JOB_BUDGET_S.
+    """
+    from src.agents.jobs import JobQueueFull, submit_job
+
+    if request.resume and not request.session_id:
+        raise HTTPException(status_code=409, detail="resume requires a session_id")
     try:
-        initial_state = {
-            "messages": [],
-            "user_query": request.query,
-            "channel": request.channel,
-            "scratchpad": "",
-            "sub_query": "",
-            "retrieved_docs": [],
-            "image_urls": [],
-            "citations": [],
-            "next_action": "",
-            "final_answer": "",
-            "iteration": 0,
-            "max_iterations": request.max_iterations,
-            "traceback_uploads_dir": request.traceback_uploads_dir,
-            "traceback_output_dir": request.traceback_output_dir,
-        }
-        result = agent_graph.invoke(initial_state)
-        return {
-            "answer": result.get("final_answer", "No answer generated."),
-            "citations": result.get("citations", [])[:3],
-            "images": result.get("image_urls", [])[:3],
-        }
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Agentic chat failed: {str(e)}")
+        job = submit_job(request.query, lambda job: _run_agent_job(request, job), request.session_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/agentic-chat/jobs/{job_id}")
+async def get_agentic_job(job_id: str, since: int = 0):
+    """
+    Status of a background job.
+
+    ``progress`` lists node events (same shape as the stream's decision / step
+    events) and Stains Detective traceback steps { node, step, total, message };
+    pass ``since=<progress_total>`` to get only new ones. ``result`` (status
+    "done") has the /agentic-chat response shape; ``error`` is set for
+    "failed" and "cancelled".
+    """
+    from src.agents.jobs import get_job
+
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.to_dict(since)
+
+
+@app.delete("/agentic-chat/jobs/{job_id}")
+async def cancel_agentic_job(job_id: str):
+    """Cancel a queued or running job; finished jobs are returned unchanged."""
+    from src.agents.jobs import cancel_job
+
+    job = await cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.on_event("shutdown")
+async def _cancel_agent_jobs():
+    from src.agents.jobs import cancel_all_jobs
+
+    await cancel_all_jobs()
+
+
+@app.on_event("shutdown")
+async def _close_agent_sessions():
+    from src.agents.sessions import close_sessions
+
+    await close_sessions()
 
 
 class AriesDataRequest(BaseModel):
@@ -145,29 +464,72 @@ class AriesDataRequest(BaseModel):
     tester_filter: str = "%HXV%"
 
 
+def _query_aries(days_back: float, tester_filter: str) -> dict:
+    from src.services.aries_db import AriesDBService
+
+    svc = AriesDBService()
+    df = svc.query_unit_level_data(
+        days_back=days_back,
+        tester_filter=tester_filter,
+    )
+    summary = svc.summarise(df)
+    return {
+        "rows": len(df),
+        "summary": summary,
+        "data": df.head(500).to_dict(orient="records"),
+    }
+
+
 @app.post("/aries-data")
 async def aries_data(request: AriesDataRequest):
     """Query live unit-level test data from the Aries Oracle DB."""
     try:
-        from src.services.aries_db import AriesDBService
-
-        svc = AriesDBService()
-        df = svc.query_unit_level_data(
-            days_back=request.days_back,
-            tester_filter=request.tester_filter,
-        )
-        summary = svc.summarise(df)
-        return {
-            "rows": len(df),
-            "summary": summary,
-            "data": df.head(500).to_dict(orient="records"),
-        }
+        return await run_blocking(_query_aries, request.days_back, request.tester_filter)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Aries query failed: {str(e)}")
 
 
+@app.get("/metrics")
+async def metrics():
+    """Process-wide LLM metrics (connection reuse, rate limiting, payload/response caches, provider prompt cache,
+    token usage), blocking-I/O executor load, background agent jobs, per-agent routing costs, speculative KB
+    prefetch hits, local intent-router accuracy, early exits, tool result cache hit rates, and per-tool latency
+    histograms and circuit breaker states."""
+    from src.llm.http_pool import pool_stats
+    from src.llm.rate_limit import rate_limit_stats
+    from src.llm.image_payload import cache_stats
+    from src.llm.response_cache import cache_stats as response_cache_stats
+    from src.agents.prompts import prompt_cache_stats
+    from src.llm.usage import usage_stats
+    from src.agents.costs import cost_stats
+    from src.agents.executor import executor_stats
+    from src.agents.jobs import job_stats
+    from src.agents.prefetch import prefetch_stats
+    from src.agents.router import router_stats
+    from src.agents.sufficiency import sufficiency_stats
+    from src.tools.cache import tool_cache_stats
+    from src.tools.resilience import tool_stats
+
+    return {
+        "llm_http_pool": pool_stats(),
+        "llm_rate_limiter": rate_limit_stats(),
+        "image_payload_cache": cache_stats(),
+        "llm_response_cache": response_cache_stats(),
+        "prompt_cache": prompt_cache_stats(),
+        "llm_usage": usage_stats(),
+        "blocking_executor": executor_stats(),
+        "agent_costs": cost_stats(),
+        "agent_jobs": job_stats(),
+        "kb_prefetch": prefetch_stats(),
+        "intent_router": router_stats(),
+        "sufficiency_check": sufficiency_stats(),
+        "tool_cache": tool_cache_stats(),
+        "tools": tool_stats(),
+    }
+
+
 @app.get("/channels")
 async def list_channels():
     """Returns a list of available channels from ingested documents."""
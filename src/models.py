@@ -26,20 +26,18 @@ class OpenAIEmbeddingFunction(EmbeddingFunction):
     """
 
     def __init__(self):
+        from .llm.http_pool import get_http_client
         if OPENAI_API_VERSION:
             from openai import AzureOpenAI
-            import ssl
-            import httpx
-            ssl_context = ssl.create_default_context()
             self._client = AzureOpenAI(
                 api_key=OPENAI_API_KEY,
                 azure_endpoint=OPENAI_ENDPOINT,
                 api_version=OPENAI_API_VERSION,
-                http_client=httpx.Client(verify=ssl_context),
+                http_client=get_http_client(),
             )
         else:
             from openai import OpenAI
-            kwargs = {"api_key": OPENAI_API_KEY}
+            kwargs = {"api_key": OPENAI_API_KEY, "http_client": get_http_client()}
             if OPENAI_ENDPOINT:
                 kwargs["base_url"] = OPENAI_ENDPOINT
             self._client = OpenAI(**kwargs)
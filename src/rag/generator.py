@@ -11,7 +11,8 @@ class Generator:
             api_key=OPENAI_API_KEY,
             model_name=CHAT_MODEL,
             base_url=OPENAI_ENDPOINT,
-            api_version=OPENAI_API_VERSION
+            api_version=OPENAI_API_VERSION,
+            usage_label="rag_generator",
         )
     
     def generate(self, query: str, context: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]], List[str]]:
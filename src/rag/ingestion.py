@@ -17,6 +17,7 @@ from ..extractors.image import ImageExtractor
 from ..extractors.xml import XMLExtractor
 from ..storage.vectordb import get_vector_db
 from ..llm.service import get_llm_service
+from ..llm.rate_limit import BATCH, priority_lane
 from ..config import VLM_MODEL, OPENAI_API_KEY, OPENAI_ENDPOINT, OPENAI_API_VERSION, ENABLE_VLM_INGESTION, DOCUMENT_STORE_DIR
 
 class IngestionPipeline:
@@ -29,7 +30,8 @@ class IngestionPipeline:
             api_key=OPENAI_API_KEY,
             model_name=VLM_MODEL,
             base_url=OPENAI_ENDPOINT,
-            api_version=OPENAI_API_VERSION
+            api_version=OPENAI_API_VERSION,
+            usage_label="ingestion_vlm",
         )
         
         self.extractors = {
@@ -52,7 +54,14 @@ class IngestionPipeline:
     def ingest_file(self, file_path: str, channel: str = "general") -> Dict[str, Any]:
         """
         Ingests a single file: extracts, chunks, embeds, and stores.
+
+        VLM and embedding calls go through the rate limiter's batch lane, so a
+        large ingest never starves interactive chat of deployment quota.
         """
+        with priority_lane(BATCH):
+            return self._ingest_file(file_path, channel)
+
+    def _ingest_file(self, file_path: str, channel: str) -> Dict[str, Any]:
         ext = os.path.splitext(file_path)[1].lower()
         if ext not in self.extractors:
             raise ValueError(f"Unsupported file type: {ext}")
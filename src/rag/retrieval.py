@@ -1,6 +1,7 @@
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional
 from ..storage.vectordb import get_vector_db
 from ..llm.service import get_llm_service
+from ..llm.image_payload import ImageRef
 from ..config import CHAT_MODEL, OPENAI_API_KEY, OPENAI_ENDPOINT, OPENAI_API_VERSION
 
 class RAGEngine:
@@ -11,7 +12,8 @@ class RAGEngine:
             api_key=OPENAI_API_KEY,
             model_name=CHAT_MODEL,
             base_url=OPENAI_ENDPOINT,
-            api_version=OPENAI_API_VERSION
+            api_version=OPENAI_API_VERSION,
+            usage_label="rag_chat",
         )
 
     def get_channels(self) -> List[str]:
@@ -34,6 +36,45 @@ class RAGEngine:
         Retrieves context and generates an answer.
         Optionally filters by channel.
         """
+        prepared = self._prepare(user_query, n_results, channel)
+        if prepared["answer"] is not None:
+            return {"answer": prepared["answer"], "citations": [], "images": []}
+
+        answer = self.chat_service.generate_response(
+            prompt=prepared["prompt_parts"],
+            system_instruction=prepared["system_instruction"]
+        )
+        
+        return {
+            "answer": answer,
+            "citations": prepared["citations"],
+            "images": prepared["images"]
+        }
+
+    def query_stream(self, user_query: str, n_results: int = 5, channel: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of query().
+        Yields a "sources" event (citations + images) as soon as retrieval is done,
+        then one "token" event per generated text delta.
+        """
+        prepared = self._prepare(user_query, n_results, channel)
+        yield {"type": "sources", "citations": prepared["citations"], "images": prepared["images"]}
+
+        if prepared["answer"] is not None:
+            yield {"type": "token", "text": prepared["answer"]}
+            return
+
+        for delta in self.chat_service.generate_response_stream(
+            prompt=prepared["prompt_parts"],
+            system_instruction=prepared["system_instruction"]
+        ):
+            yield {"type": "token", "text": delta}
+
+    def _prepare(self, user_query: str, n_results: int, channel: Optional[str]) -> Dict[str, Any]:
+        """
+        Runs retrieval and builds the multimodal prompt.
+        Returns "answer" set (and no prompt) when nothing relevant was found.
+        """
         # 1. Retrieve — with optional channel filter
         query_kwargs = {
             "query_texts": [user_query],
@@ -109,7 +150,10 @@ class RAGEngine:
                 print(f"Hybrid retrieval error: {e}")
 
         if not context_str:
-            return {"answer": "I couldn't find any relevant information in the uploaded documents to answer your question.", "citations": [], "images": []}
+            return {
+                "answer": "I couldn't find any relevant information in the uploaded documents to answer your question.",
+                "prompt_parts": [], "system_instruction": "", "citations": [], "images": []
+            }
 
         # 3. Build source-to-document-URL mapping for hyperlinks
         source_doc_links = {}
@@ -158,8 +202,9 @@ class RAGEngine:
         # Add text context components
         final_prompt_parts.append(context_str)
         
-        # Add images directly to the prompt context if available
-        from PIL import Image
+        # Add images directly to the prompt context if available.
+        # ImageRef defers decoding to the image payload service, which downscales,
+        # compresses and caches the encoded data URL by content hash.
         import os
         
         loaded_images_count = 0
@@ -169,21 +214,17 @@ class RAGEngine:
                      if os.path.basename(meta['image_path']) == os.path.basename(img_url):
                          try:
                              if os.path.exists(meta['image_path']):
-                                 pil_img = Image.open(meta['image_path'])
                                  final_prompt_parts.append(f"\n<system_image_attachment name='{os.path.basename(img_url)}'/>\n")
-                                 final_prompt_parts.append(pil_img)
+                                 final_prompt_parts.append(ImageRef(meta['image_path']))
                                  loaded_images_count += 1
                          except Exception as e:
                              print(f"Failed to load image for prompt: {e}")
                          break
         
-        answer = self.chat_service.generate_response(
-            prompt=final_prompt_parts,
-            system_instruction=system_instruction
-        )
-        
         return {
-            "answer": answer,
+            "answer": None,
+            "prompt_parts": final_prompt_parts,
+            "system_instruction": system_instruction,
             "citations": retrieved_sources[:3],
             "images": list(image_urls)[:3]
         }
@@ -1,4 +1,9 @@
-from .base_tool import BaseTool, ToolConfig, ToolError, ToolValidationError, ToolExecutionError
+from .base_tool import (
+    BaseTool, ToolConfig, ToolError, ToolValidationError, ToolExecutionError, ToolTimeoutError,
+    ToolUnavailableError, time_left, tool_deadline,
+)
+from .cache import ToolResultCache, cached_tool_call, get_tool_cache, tool_cache_stats
+from .resilience import CircuitBreaker, LatencyHistogram, degraded_tools, tool_stats
 from .lot_info_tool import GetLotInfoTool, format_lot_info
 from .unit_info_tool import GetUnitInfoTool, format_unit_info
 
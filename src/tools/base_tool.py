@@ -1,12 +1,47 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Any, Dict, Optional
+import asyncio
+import contextvars
 import logging
+import random
 import time
 from pydantic import BaseModel, ValidationError
 
+from ..config import TOOL_RETRY_MAX_DELAY_S, TOOL_WORKERS
+from .resilience import CircuitBreaker, get_breaker, get_histogram
+
 logger = logging.getLogger(__name__)
 
+# Worker threads for _run, so execute() can stop waiting at the timeout.
+# A timed-out call keeps its thread until the backend returns; the circuit
+# breaker stops a hung backend from filling the pool.
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+# Absolute deadline (epoch seconds) for tool calls in the current request
+_deadline: ContextVar[Optional[float]] = ContextVar("tool_deadline", default=None)
+
+
+@contextmanager
+def tool_deadline(deadline: Optional[float]):
+    """Cap every tool call made inside this block at *deadline* (epoch seconds)."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the active tool deadline, or None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
 class ToolError(Exception):
     """Base exception for all tool-related errors."""
     pass
@@ -22,6 +57,16 @@ class ToolExecutionError(ToolError):
     pass
 
 
+class ToolTimeoutError(ToolExecutionError):
+    """Raised when a tool exceeds its timeout or the request's time budget."""
+    pass
+
+
+class ToolUnavailableError(ToolExecutionError):
+    """Raised without calling the backend while the tool's circuit breaker is open."""
+    pass
+
+
 class ToolConfig(BaseModel):
     """
     Common configuration for tools.
@@ -30,7 +75,9 @@ class ToolConfig(BaseModel):
     description: str = ""
     timeout_seconds: int = 500
     max_retries: int = 0
-    retry_delay_seconds: float = 1.0
+    retry_delay_seconds: float = 1.0             # base delay; attempt n waits up to base * backoff**n
+    retry_backoff: float = 2.0
+    retry_max_delay_seconds: Optional[float] = None  # default TOOL_RETRY_MAX_DELAY_S
 
 
 class BaseTool(ABC):
@@ -71,55 +118,153 @@ class BaseTool(ABC):
                 f"Invalid input for tool '{self.name}': {e}"
             ) from e
 
+    def breaker_key(self, validated_input: BaseModel) -> str:
+        """Circuit-breaker key for this call; override to isolate backends (e.g. per site)."""
+        return self.name
+
+    def _admit(self, breaker: CircuitBreaker) -> float:
+        """Timeout for the next attempt, or raise when the breaker or the time budget says no."""
+        if not breaker.allow():
+            raise ToolUnavailableError(
+                f"Tool '{self.name}' unavailable: circuit {breaker.key} open "
+                f"(retry in {breaker.retry_in():.0f}s)"
+            )
+        timeout = float(self.config.timeout_seconds)
+        left = time_left()
+        if left is not None:
+            timeout = min(timeout, left)
+        if timeout <= 0:
+            raise ToolTimeoutError(f"Tool '{self.name}' skipped: request time budget exhausted")
+        return timeout
+
+    def _backoff(self, attempt: int) -> Optional[float]:
+        """Full-jitter exponential delay before the next attempt, or None to stop retrying."""
+        if attempt >= self.config.max_retries:
+            return None
+        max_delay = self.config.retry_max_delay_seconds
+        if max_delay is None:
+            max_delay = TOOL_RETRY_MAX_DELAY_S
+        delay = random.uniform(0.0, min(max_delay, self.config.retry_delay_seconds * self.config.retry_backoff ** attempt))
+        left = time_left()
+        if left is not None and delay >= left:
+            logger.warning("Tool '%s': no time left in the request budget for another attempt", self.name)
+            return None
+        return delay
+
+    def _succeeded(self, breaker: CircuitBreaker, result: Any, attempt: int, started: float) -> Dict[str, Any]:
+        duration = time.perf_counter() - started
+        breaker.record_success()
+        get_histogram(self.name).observe(duration, "ok")
+        logger.info(
+            "Tool '%s' executed successfully in %.3fs",
+            self.name,
+            duration,
+        )
+        return {
+            "success": True,
+            "tool_name": self.name,
+            "data": result,
+            "error": None,
+            "metadata": {
+                "duration_seconds": duration,
+                "attempt": attempt + 1,
+            },
+        }
+
+    def _failed(self, breaker: CircuitBreaker, error: Exception, attempt: int, started: float) -> Exception:
+        breaker.record_failure(error)
+        timed_out = isinstance(error, ToolTimeoutError)
+        get_histogram(self.name).observe(time.perf_counter() - started, "timeout" if timed_out else "error")
+        if timed_out:
+            logger.warning("%s (attempt %d)", error, attempt + 1)
+        else:
+            logger.exception("Tool '%s' failed on attempt %d", self.name, attempt + 1)
+        return error
+
+    def _timeout_error(self, timeout: float) -> ToolTimeoutError:
+        return ToolTimeoutError(f"Tool '{self.name}' timed out after {timeout:.1f}s")
+
+    def _log_attempt(self, validated_input: BaseModel, attempt: int) -> None:
+        logger.info(
+            "Executing tool '%s' attempt %d with input=%s",
+            self.name,
+            attempt + 1,
+            validated_input.model_dump() if hasattr(validated_input, "model_dump") else validated_input.dict(),
+        )
+
+    def _submit(self, validated_input: BaseModel) -> Future:
+        """Run _run on the tool pool, carrying the caller's context variables."""
+        ctx = contextvars.copy_context()
+        return _tool_pool.submit(ctx.run, self._run, validated_input)
+
+    def _exhausted(self, last_error: Optional[Exception]) -> ToolExecutionError:
+        return ToolExecutionError(
+            f"Tool '{self.name}' failed after {self.config.max_retries + 1} attempt(s): {last_error}"
+        )
+
     def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Main execution entrypoint for all tools.
-        Handles validation, retry, logging, and error normalization.
+        Handles validation, circuit breaking, timeout, retry with backoff,
+        latency recording, logging, and error normalization.
+
+        Raises ToolUnavailableError while the tool's circuit is open and
+        ToolTimeoutError when the request time budget is already spent.
         """
         validated_input = self.validate_input(input_data)
+        breaker = get_breaker(self.breaker_key(validated_input))
 
         last_error: Optional[Exception] = None
 
         for attempt in range(self.config.max_retries + 1):
+            timeout = self._admit(breaker)
+            self._log_attempt(validated_input, attempt)
+            started = time.perf_counter()
             try:
-                start_time = time.time()
-                logger.info(
-                    "Executing tool '%s' attempt %d with input=%s",
-                    self.name,
-                    attempt + 1,
-                    validated_input.model_dump() if hasattr(validated_input, "model_dump") else validated_input.dict(),
-                )
-
-                result = self._run(validated_input)
-
-                duration = time.time() - start_time
-                logger.info(
-                    "Tool '%s' executed successfully in %.3fs",
-                    self.name,
-                    duration,
-                )
-
-                return {
-                    "success": True,
-                    "tool_name": self.name,
-                    "data": result,
-                    "error": None,
-                    "metadata": {
-                        "duration_seconds": duration,
-                        "attempt": attempt + 1,
-                    },
-                }
+                result = self._submit(validated_input).result(timeout=timeout)
+            except FuturesTimeout:
+                last_error = self._failed(breaker, self._timeout_error(timeout), attempt, started)
+            except Exception as e:
+                last_error = self._failed(breaker, e, attempt, started)
+            else:
+                return self._succeeded(breaker, result, attempt, started)
+
+            delay = self._backoff(attempt)
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        raise self._exhausted(last_error) from last_error
 
+    async def aexecute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of execute(): _run still runs on the tool pool, but the
+        caller's event loop is free while it waits and during backoff.
+        """
+        validated_input = self.validate_input(input_data)
+        breaker = get_breaker(self.breaker_key(validated_input))
+
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.config.max_retries + 1):
+            timeout = self._admit(breaker)
+            self._log_attempt(validated_input, attempt)
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(self._submit(validated_input)), timeout)
+            except asyncio.TimeoutError:
+                last_error = self._failed(breaker, self._timeout_error(timeout), attempt, started)
             except Exception as e:
-                last_error = e
-                logger.exception("Tool '%s' failed on attempt %d", self.name, attempt + 1)
+                last_error = self._failed(breaker, e, attempt, started)
+            else:
+                return self._succeeded(breaker, result, attempt, started)
 
-                if attempt < self.config.max_retries:
-                    time.sleep(self.config.retry_delay_seconds)
+            delay = self._backoff(attempt)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
 
-        raise ToolExecutionError(
-            f"Tool '{self.name}' failed after {self.config.max_retries + 1} attempt(s): {last_error}"
-        ) from last_error
+        raise self._exhausted(last_error) from last_error
 
     @abstractmethod
     def _run(self, validated_input: BaseModel) -> Any:
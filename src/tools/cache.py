@@ -0,0 +1,178 @@
+"""
+Tool result cache shared across graph nodes and concurrent requests.
+
+The same lot/op XML is read by both issue_agent and aries_data in one
+investigation, and users asking about the same hot lot repeat the same
+Aries and Lamas queries. ``ToolResultCache.get_or_call`` memoises tool
+results keyed by tool name + normalised parameters + a freshness version:
+
+  lot_unit_xml  version = mtimes of lotinfo.xml / unitinfo.xml, so a rewritten
+                file is a miss; TOOL_CACHE_XML_TTL caps the age
+  aries         version = TOOL_CACHE_ARIES_WINDOW time bucket — identical
+                queries inside one window share a result
+  lamas         short TTL (TOOL_CACHE_LAMAS_TTL) — alarms are near-live
+  recent_lots   short TTL (TOOL_CACHE_LAMAS_TTL)
+
+Identical calls already in flight are coalesced (single-flight): followers
+wait for the leader's result instead of hitting the backend again — but no
+longer than their own request's tool budget (``time_left()``). A follower
+whose budget runs out first calls *fn* itself, which fails fast or returns
+its "budget exhausted" result, rather than hanging on a slow leader.
+Results that report an error are returned but not stored.
+
+Cached values are shared between callers and must be treated as read-only.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from ..config import TOOL_CACHE_ENABLED, TOOL_CACHE_MAX_ENTRIES
+from .base_tool import time_left
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _ok(result: Any) -> bool:
+    """Default cacheability check — tool helpers report failures in an "error" key."""
+    return not (isinstance(result, dict) and result.get("error"))
+
+
+def _normalise(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): _normalise(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalise(v) for v in value]
+    return value
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolResultCache:
+    """In-process LRU of tool results with per-call TTL, version keys and single-flight."""
+
+    def __init__(self, max_entries: int = 512):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(tool: str, params: Dict[str, Any], version: Any = None) -> str:
+        payload = {"p": _normalise(params), "v": version}
+        return f"{tool}:{json.dumps(payload, sort_keys=True, default=str)}"
+
+    def _count(self, tool: str, event: str) -> None:
+        counters = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "coalesced": 0, "stored": 0, "wait_timeouts": 0})
+        counters[event] += 1
+
+    def get_or_call(
+        self,
+        tool: str,
+        params: Dict[str, Any],
+        fn: Callable[[], T],
+        ttl: float,
+        version: Any = None,
+        cacheable: Callable[[Any], bool] = _ok,
+    ) -> T:
+        """Return the cached result for (tool, params, version) or compute it with *fn*."""
+        key = self.make_key(tool, params, version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._count(tool, "hits")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._count(tool, "misses")
+            else:
+                self._count(tool, "coalesced")
+
+        if not leader:
+            logger.debug("Tool cache: coalescing %s with an in-flight call", tool)
+            left = time_left()
+            if flight.done.wait(None if left is None else max(0.0, left)):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            with self._lock:
+                self._count(tool, "wait_timeouts")
+            logger.warning("Tool cache: in-flight %s call outlasted the request budget, calling directly", tool)
+            return fn()
+
+        try:
+            result = fn()
+            flight.result = result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and ttl > 0 and cacheable(flight.result):
+                    self._entries[key] = (time.monotonic() + ttl, flight.result)
+                    self._entries.move_to_end(key)
+                    self._count(tool, "stored")
+                    while len(self._entries) > self._max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_tool = {tool: dict(c) for tool, c in self._stats.items()}
+            entries = len(self._entries)
+            inflight = len(self._inflight)
+        for counters in by_tool.values():
+            lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+            counters["hit_rate"] = round((counters["hits"] + counters["coalesced"]) / lookups, 4) if lookups else None
+        return {"enabled": TOOL_CACHE_ENABLED, "entries": entries, "in_flight": inflight, "by_tool": by_tool}
+
+
+_cache = ToolResultCache(TOOL_CACHE_MAX_ENTRIES)
+
+
+def cached_tool_call(
+    tool: str,
+    params: Dict[str, Any],
+    fn: Callable[[], T],
+    ttl: float,
+    version: Any = None,
+    cacheable: Callable[[Any], bool] = _ok,
+) -> T:
+    """``get_or_call`` on the process-wide cache; calls *fn* directly when disabled."""
+    if not TOOL_CACHE_ENABLED:
+        return fn()
+    return _cache.get_or_call(tool, params, fn, ttl, version=version, cacheable=cacheable)
+
+
+def get_tool_cache() -> ToolResultCache:
+    return _cache
+
+
+def tool_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
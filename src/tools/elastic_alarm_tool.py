@@ -43,6 +43,10 @@ class ElasticAlarmTool(BaseTool):
         3: ("https://pg.lamas.intel.com/rest/", KEYID_PG_LAMAS, KEYVAL_PG_LAMAS),
     }
 
+    def breaker_key(self, validated_input: ElasticAlarmInput) -> str:  # type: ignore[override]
+        # One Lamas cluster per site — a dead VN cluster must not block CD/KM/PG
+        return f"{self.name}:site{validated_input.site_name}"
+
     def _run(self, validated_input: ElasticAlarmInput) -> Dict[str, Any]:  # type: ignore[override]
         data = validated_input
 
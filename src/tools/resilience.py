@@ -0,0 +1,199 @@
+"""
+Circuit breakers and latency histograms for BaseTool.
+
+When a backend hangs (a Lamas cluster, the Aries Oracle listener), every
+request used to wait the full tool timeout again. Each breaker key — the tool
+name, or a finer key such as one Lamas site (``BaseTool.breaker_key``) — has
+a ``CircuitBreaker``:
+
+  closed     calls go through; TOOL_BREAKER_FAILURES consecutive failed
+             attempts open the breaker
+  open       calls fail fast with ToolUnavailableError for TOOL_BREAKER_RESET_S
+  half_open  after the reset period a single probe call is let through; its
+             success closes the breaker, its failure opens it again
+
+Every attempt is also recorded in a per-tool ``LatencyHistogram`` (fixed
+millisecond buckets, outcome counters). ``tool_stats()`` exports both for
+/metrics; ``degraded_tools()`` lists the breakers that are not closed.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..config import TOOL_BREAKER_FAILURES, TOOL_BREAKER_RESET_S
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upper bucket bounds in milliseconds; the last bucket is +Inf
+_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a timed open state and a single half-open probe."""
+
+    def __init__(self, key: str, failure_threshold: int, reset_seconds: float):
+        self.key = key
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._last_error = ""
+        self._times_opened = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now; False means fail fast."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self._reset_seconds:
+                self._state = HALF_OPEN
+                self._probing = False
+            # A probe that never reported back (cancelled caller) is replaced after the reset period
+            if self._state == HALF_OPEN and (not self._probing or now - self._probe_started >= self._reset_seconds):
+                self._probing = True
+                self._probe_started = now
+                logger.info("Circuit %s half-open — sending a probe call", self.key)
+                return True
+            self._rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the open breaker lets a probe through."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._reset_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit %s closed — backend recovered", self.key)
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self._failures += 1
+            self._last_error = f"{type(error).__name__}: {error}"[:200]
+            if self._state == HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != OPEN:
+                    self._times_opened += 1
+                    logger.warning(
+                        "Circuit %s OPEN after %d failure(s) — failing fast for %.0fs (%s)",
+                        self.key, self._failures, self._reset_seconds, self._last_error,
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+                "last_error": self._last_error or None,
+            }
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with per-outcome counters."""
+
+    def __init__(self):
+        self._counts = [0] * (len(_BUCKETS_MS) + 1)
+        self._total_ms = 0.0
+        self._outcomes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, outcome: str) -> None:
+        ms = seconds * 1000.0
+        with self._lock:
+            self._counts[bisect.bisect_left(_BUCKETS_MS, ms)] += 1
+            self._total_ms += ms
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+
+    def _quantile(self, q: float, total: int) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the *q* quantile; None for the +Inf bucket."""
+        rank, seen = q * total, 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return float(_BUCKETS_MS[i]) if i < len(_BUCKETS_MS) else None
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._counts)
+            buckets = {f"le_{bound}ms": c for bound, c in zip(_BUCKETS_MS, self._counts)}
+            buckets["le_inf"] = self._counts[-1]
+            return {
+                "count": total,
+                "mean_ms": round(self._total_ms / total, 1) if total else None,
+                "p50_ms": self._quantile(0.50, total) if total else None,
+                "p95_ms": self._quantile(0.95, total) if total else None,
+                "outcomes": dict(self._outcomes),
+                "buckets": buckets,
+            }
+
+
+_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+_histograms: Dict[str, LatencyHistogram] = {}
+
+
+def get_breaker(key: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key, TOOL_BREAKER_FAILURES, TOOL_BREAKER_RESET_S)
+        return breaker
+
+
+def get_histogram(tool: str) -> LatencyHistogram:
+    with _lock:
+        histogram = _histograms.get(tool)
+        if histogram is None:
+            histogram = _histograms[tool] = LatencyHistogram()
+        return histogram
+
+
+def degraded_tools() -> List[str]:
+    """Breaker keys that are currently open or half-open."""
+    with _lock:
+        breakers = list(_breakers.values())
+    return sorted(b.key for b in breakers if b.state != CLOSED)
+
+
+def tool_stats() -> Dict[str, Any]:
+    with _lock:
+        breakers = dict(_breakers)
+        histograms = dict(_histograms)
+    return {
+        "latency": {tool: h.stats() for tool, h in histograms.items()},
+        "breakers": {key: b.stats() for key, b in breakers.items()},
+        "degraded": degraded_tools(),
+    }
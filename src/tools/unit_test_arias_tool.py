@@ -1,5 +1,5 @@
 import warnings
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import oracledb as cx
 import pandas as pd
@@ -17,6 +17,7 @@ class UnitTestAriasInput(BaseModel):
     dsn: str = Field(default=ARIES_DB_DSN, description="Oracle DSN, e.g. vn.aries")
 
     lot: Optional[str] = Field(default=None, description="Filter by v0.lot")
+    lots: Optional[List[str]] = Field(default=None, description="Filter by several lots at once (v0.lot IN ...)")
     operation: Optional[str] = Field(default=None, description="Filter by v0.operation, e.g. 6% or 7%")
     tester_id: Optional[str] = Field(default=None, description="Filter by v0.tester_id, e.g. %HXV%")
     visual_id: Optional[str] = Field(default=None, description="Filter by di.visual_id")
@@ -40,6 +41,7 @@ class UnitTestAriasTool(BaseTool):
         data: UnitTestAriasInput = validated_input  # type: ignore[assignment]
         sql = self._build_sql(
             lot=data.lot,
+            lots=data.lots,
             operation=data.operation,
             tester_id=data.tester_id,
             row_limit=data.row_limit,
@@ -64,6 +66,7 @@ class UnitTestAriasTool(BaseTool):
     def _build_sql(
         self,
         lot: Optional[str],
+        lots: Optional[List[str]],
         operation: Optional[str],
         tester_id: Optional[str],
         row_limit: Optional[int],
@@ -80,6 +83,11 @@ class UnitTestAriasTool(BaseTool):
             where_clauses.append(f"v0.lot = '{lot}'")
             params["lot"] = lot
 
+        if lots:
+            quoted = ", ".join("'" + l.replace("'", "''") + "'" for l in lots)
+            where_clauses.append(f"v0.lot IN ({quoted})")
+            params["lots"] = lots
+
         if operation:
             where_clauses.append(f"v0.operation LIKE '{operation}'")
             params["operation"] = operation
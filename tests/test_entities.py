@@ -0,0 +1,87 @@
+"""Entity extraction for agent questions (src/agents/entities.py)."""
+import pytest
+
+from src.agents.entities import (
+    describe_entities,
+    extract_entities,
+    lot_operations,
+    merge_entities,
+    query_entities,
+)
+
+
+def test_lot_lists_and_operations():
+    entities = extract_entities("compare lots 4v56656r, 4V56657S and 4V56658T at op 6262")
+    assert entities["lots"] == ["4V56656R", "4V56657S", "4V56658T"]
+    assert entities["operations"] == ["6262"]
+    assert lot_operations(entities) == [("4V56656R", "6262"), ("4V56657S", "6262"), ("4V56658T", "6262")]
+
+
+def test_operations_pair_with_lots_in_order():
+    entities = extract_entities("lot 4V56656R / 4V56657S operations 6262 and 7100")
+    assert lot_operations(entities) == [("4V56656R", "6262"), ("4V56657S", "7100")]
+
+
+def test_lot_needs_a_digit_and_a_lot_keyword():
+    assert extract_entities("lot status for the ABCDEFGH line")["lots"] == []
+    assert extract_entities("4V56656R failed")["lots"] == []
+
+
+def test_testers_and_vids():
+    entities = extract_entities("alarms on hxv123 and HXV123 for unit U6P22X1603318")
+    assert entities["testers"] == ["HXV123"]
+    assert entities["vids"] == ["U6P22X1603318"]
+
+
+@pytest.mark.parametrize(
+    "text, hours",
+    [
+        ("alarms in the last 3 days", 72.0),
+        ("past 6h on HXV123", 6.0),
+        ("previous 2 wks", 336.0),
+        ("over 1.5 hrs", 1.5),
+        ("48 hours of alarms", 48.0),
+        ("this week", 168.0),
+        ("yesterday", 48.0),
+        ("today", 24.0),
+        # A number with a unit letter is not a window without a prefix
+        ("show the 2d drawing for lot 4V56656R", None),
+        ("the 3h socket", None),
+        ("op 6262", None),
+    ],
+)
+def test_hours_back(text, hours):
+    assert extract_entities(text)["hours_back"] == hours
+
+
+@pytest.mark.parametrize(
+    "text, site",
+    [
+        ("alarms at vnat", 0),
+        ("site CD testers", 1),
+        ("kulim", 2),
+        ("PG site", 3),
+        ("a cd of results", None),
+    ],
+)
+def test_site(text, site):
+    assert extract_entities(text)["site"] == site
+
+
+def test_merge_puts_first_entities_in_front():
+    merged = merge_entities(extract_entities("lot 4V56657S last 2 days"), extract_entities("lot 4V56656R past 6h"))
+    assert merged["lots"] == ["4V56657S", "4V56656R"]
+    assert merged["hours_back"] == 48.0
+
+
+def test_query_entities_adds_the_sub_query():
+    state = {"user_query": "why did lot 4V56656R fail", "sub_query": "check lot 4V56657S"}
+    assert query_entities(state)["lots"] == ["4V56657S", "4V56656R"]
+    state["sub_query"] = state["user_query"]
+    assert query_entities(state)["lots"] == ["4V56656R"]
+
+
+def test_describe_entities():
+    entities = extract_entities("lot 4V56656R op 6262 on HXV123 in the last 12h at kulim")
+    assert describe_entities(entities) == "lots: 4V56656R; operations: 6262; testers: HXV123; window: last 12h; site: KM"
+    assert describe_entities(extract_entities("hello")) == ""
@@ -0,0 +1,68 @@
+"""Shared LLM rate limiter (src/llm/rate_limit.py)."""
+import json
+
+import httpx
+import pytest
+
+from src.llm.rate_limit import BATCH, INTERACTIVE, RateLimiter, _Bucket, estimate_request_tokens
+
+
+def test_bucket_refills_at_its_per_minute_rate():
+    bucket = _Bucket(60)
+    start = bucket._updated
+    bucket.take(60)
+    assert bucket.wait_for(1, 0) == pytest.approx(1.0)
+    bucket.refill(start + 30)
+    assert bucket.level == pytest.approx(30)
+    bucket.refill(start + 600)
+    assert bucket.level == 60
+
+
+def test_bucket_admits_an_oversized_request_when_full():
+    bucket = _Bucket(100)
+    assert bucket.wait_for(500, 0) == 0.0
+    bucket.take(500)
+    assert bucket.level == 0
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = _Bucket(0)
+    assert bucket.unlimited
+    assert bucket.wait_for(10 ** 6, 0) == 0.0
+
+
+def test_batch_lane_leaves_the_interactive_reserve():
+    limiter = RateLimiter(rpm=0, tpm=1000, batch_reserve=0.5)
+    assert limiter._try_take(300, BATCH) == 0.0
+    # 700 left: another 300 would dip into the 500 reserved for interactive traffic
+    assert limiter._try_take(300, BATCH) > 0
+    assert limiter._try_take(300, INTERACTIVE) == 0.0
+
+
+def test_batch_yields_to_waiting_interactive_requests():
+    limiter = RateLimiter(rpm=0, tpm=0, batch_reserve=0.0)
+    limiter._begin(INTERACTIVE)
+    assert limiter._try_take(1, BATCH) > 0
+    limiter._end(INTERACTIVE, 0.0)
+    assert limiter._try_take(1, BATCH) == 0.0
+
+
+def test_acquire_unlimited_does_not_wait():
+    limiter = RateLimiter(rpm=0, tpm=0, batch_reserve=0.1)
+    assert limiter.acquire(100) < 0.1
+    assert limiter.stats()["acquired"][INTERACTIVE] == 1
+
+
+def test_429_pauses_every_lane():
+    limiter = RateLimiter(rpm=0, tpm=0, batch_reserve=0.0)
+    limiter.on_response(httpx.Response(429, headers={"retry-after-ms": "1500"}))
+    assert 1.0 < limiter._try_take(1, INTERACTIVE) <= 1.5
+    assert limiter.stats()["throttled_429"] == 1
+
+
+def test_estimate_request_tokens():
+    body = json.dumps({"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50}).encode()
+    assert estimate_request_tokens(body) == len(body) // 4 + 50
+    embedding = json.dumps({"input": "y" * 400}).encode()
+    assert estimate_request_tokens(embedding) == len(embedding) // 4
+    assert estimate_request_tokens(b"") == 1
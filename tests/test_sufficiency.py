@@ -0,0 +1,80 @@
+"""Early-exit sufficiency check (src/agents/sufficiency.py)."""
+from src.agents.entities import extract_entities
+from src.agents.scratchpad import record_finding
+from src.agents.sufficiency import check_sufficiency, evidence_text, useful_finding
+
+
+def _state(query: str, findings: list, iteration: int = 1) -> dict:
+    return {"user_query": query, "findings": findings, "iteration": iteration}
+
+
+def _check(query: str, findings: list, iteration: int = 1) -> dict:
+    return check_sufficiency(_state(query, findings, iteration), extract_entities(query))
+
+
+def _finding(agent: str, text: str, evidence: bool = True) -> dict:
+    return record_finding({"iteration": 1}, agent, text, evidence)["findings"][0]
+
+
+def test_record_finding_stores_evidence_flag():
+    assert _finding("SOP Agent", "Step 1: clean the socket.")["evidence"] is True
+    assert _finding("SOP Agent", "No relevant SOPs", evidence=False)["evidence"] is False
+
+
+def test_findings_without_evidence_are_not_useful():
+    failed = _finding("Aries Data Agent", "(Sources: lot=4V56656R)\n[Aries Oracle] Query failed", False)
+    assert not useful_finding(failed)
+    assert not useful_finding(_finding("Issue Agent", "Some LLM text", evidence=False))
+
+
+def test_failure_and_skip_notes_are_not_useful_without_a_flag():
+    for text in (
+        "Analysis failed: timeout",
+        "(Sources: lot=4V56656R)\nLLM analysis failed: boom",
+        "[Stains Detective] Traceback failed: no CSV",
+        "[Stains Detective] Skipped — only 3s left in the request time budget.",
+        "[Stains Detective] Missing uploads directory — which VID?",
+        "No relevant documents or lot data found for this issue query.",
+        "   ",
+    ):
+        assert not useful_finding({"agent": "x", "text": text}), text
+
+
+def test_evidence_text_strips_sources_header():
+    finding = _finding("Aries Data Agent", "(Sources: lot=4V56656R, op=6262)\nYield is 98%.")
+    assert evidence_text(finding) == "Yield is 98%."
+    assert useful_finding(finding)
+
+
+def test_aries_failure_with_sources_header_is_not_sufficient():
+    failed = _finding("Aries Data Agent", "(Sources: lot=4V56656R)\n[Aries Oracle] Query failed: ORA-12170", False)
+    result = _check("what happened to lot 4V56656R", [failed])
+    assert result == {"sufficient": False, "reason": "no useful findings yet"}
+
+
+def test_identifiers_must_appear_in_the_evidence_body():
+    header_only = _finding("Aries Data Agent", "(Sources: lot=4V56656R)\nAll units passed final test.")
+    result = _check("what happened to lot 4V56656R", [header_only])
+    assert not result["sufficient"]
+    assert "4V56656R" in result["reason"]
+
+
+def test_covered_question_is_sufficient():
+    findings = [
+        _finding("Aries Data Agent", "(Sources: lot=4V56656R)\nLot 4V56656R: 12 units binned bad at op 6262."),
+        _finding("Issue Agent", "Known issue: socket wear causes these bin failures."),
+    ]
+    result = _check("why did lot 4V56656R fail at op 6262", findings)
+    assert result["sufficient"], result["reason"]
+
+
+def test_uncovered_intent_is_not_sufficient():
+    findings = [_finding("Issue Agent", "Known issue: socket wear.")]
+    result = _check("what is the SOP for socket cleaning", findings)
+    assert result == {"sufficient": False, "reason": "no findings for procedure"}
+
+
+def test_prior_turn_findings_need_something_to_match():
+    findings = [_finding("Issue Agent", "Known issue: socket wear.")]
+    result = _check("thanks, anything else?", findings, iteration=0)
+    assert not result["sufficient"]
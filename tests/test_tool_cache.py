@@ -0,0 +1,138 @@
+"""Tool result cache and single-flight (src/tools/cache.py)."""
+import threading
+import time
+
+import pytest
+
+from src.tools.base_tool import tool_deadline
+from src.tools.cache import ToolResultCache
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> None:
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "timed out waiting for condition"
+        time.sleep(0.005)
+
+
+def _counters(cache: ToolResultCache, tool: str) -> dict:
+    return cache.stats()["by_tool"].get(tool, {})
+
+
+def test_hit_within_ttl():
+    cache, calls = ToolResultCache(), []
+
+    def fn():
+        calls.append(1)
+        return {"rows": [1, 2]}
+
+    assert cache.get_or_call("aries", {"lot": " 4V56656R "}, fn, ttl=60) == {"rows": [1, 2]}
+    assert cache.get_or_call("aries", {"lot": "4V56656R"}, fn, ttl=60) == {"rows": [1, 2]}
+    assert len(calls) == 1
+    assert _counters(cache, "aries")["hits"] == 1
+
+
+def test_version_change_is_a_miss():
+    cache, calls = ToolResultCache(), []
+    for version in (1, 2):
+        cache.get_or_call("lot_unit_xml", {"lot_dir": "x"}, lambda: calls.append(1) or {}, ttl=60, version=version)
+    assert len(calls) == 2
+
+
+def test_errors_are_returned_but_not_stored():
+    cache, calls = ToolResultCache(), []
+
+    def fn():
+        calls.append(1)
+        return {"error": "ORA-12170"}
+
+    for _ in range(2):
+        assert cache.get_or_call("aries", {}, fn, ttl=60) == {"error": "ORA-12170"}
+    assert len(calls) == 2
+
+
+def test_lru_evicts_oldest():
+    cache = ToolResultCache(max_entries=2)
+    for lot in ("a", "b", "c"):
+        cache.get_or_call("aries", {"lot": lot}, lambda: {}, ttl=60)
+    assert cache.stats()["entries"] == 2
+
+
+def _start_leader(cache: ToolResultCache, release: threading.Event, results: dict) -> threading.Thread:
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {"rows": ["leader"]}
+
+    def run():
+        results["leader"] = cache.get_or_call("lamas", {"tester": "HXV123"}, slow, ttl=60)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(5)
+    return thread
+
+
+def test_concurrent_follower_shares_the_leader_result():
+    cache, release, results, follower_calls = ToolResultCache(), threading.Event(), {}, []
+    leader = _start_leader(cache, release, results)
+
+    def follow():
+        results["follower"] = cache.get_or_call(
+            "lamas", {"tester": "HXV123"}, lambda: follower_calls.append(1) or {"rows": ["own"]}, ttl=60
+        )
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    _wait_until(lambda: _counters(cache, "lamas").get("coalesced") == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert results["leader"] is results["follower"]
+    assert follower_calls == []
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_follower_gets_the_leader_error():
+    cache, started, release, errors = ToolResultCache(), threading.Event(), threading.Event(), []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("backend down")
+
+    def call(fn):
+        try:
+            cache.get_or_call("aries", {}, fn, ttl=60)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call, args=(failing,))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call, args=(lambda: pytest.fail("follower must not call fn"),))
+    follower.start()
+    _wait_until(lambda: _counters(cache, "aries").get("coalesced") == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["backend down", "backend down"]
+
+
+def test_follower_stops_waiting_at_its_deadline():
+    cache, release, results = ToolResultCache(), threading.Event(), {}
+    leader = _start_leader(cache, release, results)
+    try:
+        started = time.monotonic()
+        with tool_deadline(time.time() + 0.2):
+            result = cache.get_or_call("lamas", {"tester": "HXV123"}, lambda: {"rows": ["own"]}, ttl=60)
+        assert result == {"rows": ["own"]}
+        assert time.monotonic() - started < 2.0
+        assert _counters(cache, "lamas")["wait_timeouts"] == 1
+    finally:
+        release.set()
+        leader.join(5)
+    assert results["leader"] == {"rows": ["leader"]}